@@ -19,7 +19,13 @@ if _root not in sys.path:
 
 from aiogram import Bot, Dispatcher
 
-from .handlers import commands, messages, callbacks
+from core.catalog_index import get_catalog_index
+from core.http_pool import close_http_client
+from core.faq_cache import get_faq_cache
+from core.intent_classifier import get_intent_classifier
+from llm.warmup import start_keep_warm, stop_keep_warm
+
+from .handlers import commands, messages, callbacks, inline
 from .storage import SQLiteStorage
 
 logging.basicConfig(
@@ -41,6 +47,24 @@ async def main() -> None:
     dp.include_router(commands.router)
     dp.include_router(messages.router)
     dp.include_router(callbacks.router)
+    dp.include_router(inline.router)
+
+    # Индекс для inline-автодополнения строится до приёма апдейтов
+    try:
+        await asyncio.to_thread(get_catalog_index().load)
+    except Exception as e:
+        logger.warning("Catalog index not loaded: %s", e)
+    # Классификатор intent (если обучен) — до первого запроса, а не на нём
+    await asyncio.to_thread(get_intent_classifier)
+    # FAQ-кэш общих вопросов: индекс строится до первого вопроса
+    await asyncio.to_thread(get_faq_cache)
+
+    # Модель грузится в фоне до первого пользователя и не выгружается в часы трафика
+    start_keep_warm()
+    dp.shutdown.register(stop_keep_warm)
+
+    # Общий пул соединений к Ollama закрывается вместе с ботом
+    dp.shutdown.register(close_http_client)
 
     logger.info("Telegram bot starting...")
     await dp.start_polling(bot)
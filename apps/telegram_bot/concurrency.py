@@ -0,0 +1,21 @@
+"""Сериализация обработки сообщений одного чата."""
+from __future__ import annotations
+
+import asyncio
+import weakref
+
+from core import metrics
+
+# Lock живёт, пока его кто-то держит или ждёт; простаивающие чаты не копятся в памяти
+_chat_locks: weakref.WeakValueDictionary[int, asyncio.Lock] = weakref.WeakValueDictionary()
+
+
+def chat_lock(chat_id: int) -> asyncio.Lock:
+    """Один lock на чат: двойная отправка не запускает параллельные прогоны над одними FSM-данными."""
+    lock = _chat_locks.get(chat_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _chat_locks[chat_id] = lock
+    elif lock.locked():
+        metrics.incr("bot.chat_lock.contended")
+    return lock
@@ -107,3 +107,26 @@ def format_no_results(part_type: str) -> str:
         "• Уточнить бренд\n\n"
         "Или напишите /reset для нового поиска."
     )
+
+
+def format_page(
+    part_type: str,
+    items: list[Any],
+    page: int,
+    pages: int,
+    total: int,
+    filters: list[str] | None = None,
+    page_size: int = 5,
+) -> str:
+    """Страница полной выдачи (из кэша результатов)."""
+    lines = [f"📄 <b>Все варианты:</b> <i>{part_type}</i>"]
+    if filters:
+        lines.append("Фильтры: " + ", ".join(filters))
+    if not items:
+        lines.append("\n— нет позиций под выбранные фильтры")
+        return "\n".join(lines)
+    lines.append(f"Найдено: {total} · стр. {page + 1}/{pages}\n")
+    start = page * page_size
+    for i, item in enumerate(items, start + 1):
+        lines.append(format_item(item, i))
+    return "\n".join(lines)
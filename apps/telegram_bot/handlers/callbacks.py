@@ -2,8 +2,11 @@
 from __future__ import annotations
 
 import logging
+import math
+import time
 
 from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
 
@@ -11,8 +14,10 @@ from core.price_search import NOT_IN_PRICELIST
 from core.logger import log_event, log_event_to_db
 from core.feedback_utils import anonymize_user_id, get_error_class
 
+from ..formatter import format_page
 from ..menus import (
     SCENARIO_PROMPTS,
+    refine_keyboard,
     show_main_menu,
     show_feedback_request,
     like_category_keyboard,
@@ -21,6 +26,7 @@ from ..menus import (
     after_dislike_keyboard,
     skip_comment_keyboard,
 )
+from ..result_cache import PAGE_SIZE, SORT_LABELS, result_cache
 from ..states import PartsSearch
 from storage.feedback_repository import save_feedback, update_dialogue_cycle, Feedback
 
@@ -109,6 +115,63 @@ async def handle_tier(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
+@router.callback_query(F.data.startswith("res:"))
+@_safe_callback
+async def handle_refine(callback: CallbackQuery, state: FSMContext) -> None:
+    """Листание/фильтры/сортировка последней выдачи — только из кэша, без LLM и SQL."""
+    started = time.perf_counter()
+    parts = (callback.data or "").split(":")
+    action = parts[1] if len(parts) > 1 else ""
+    arg = parts[2] if len(parts) > 2 else ""
+    if action == "noop":
+        await callback.answer()
+        return
+
+    entry = result_cache.get(callback.message.chat.id)
+    if entry is None:
+        await callback.answer("Результаты устарели — повторите поиск", show_alert=True)
+        return
+
+    view = entry.view
+    if action == "open":
+        view.page = 0
+    elif action == "page":
+        view.page = max(int(arg or 0), 0)
+    elif action == "stock":
+        view.in_stock_only = not view.in_stock_only
+        view.page = 0
+    elif action == "max":
+        view.max_price = float(arg) if arg and float(arg) > 0 else None
+        view.page = 0
+    elif action == "sort" and arg in SORT_LABELS:
+        view.sort = arg
+        view.page = 0
+
+    items = entry.apply()
+    pages = max(math.ceil(len(items) / PAGE_SIZE), 1)
+    view.page = min(view.page, pages - 1)
+    page_items = items[view.page * PAGE_SIZE:(view.page + 1) * PAGE_SIZE]
+    filters = []
+    if view.in_stock_only:
+        filters.append("в наличии")
+    if view.max_price is not None:
+        filters.append(f"до {view.max_price:,.0f} ₽".replace(",", " "))
+    text = format_page(entry.part_type, page_items, view.page, pages, len(items), filters, page_size=PAGE_SIZE)
+    keyboard = refine_keyboard(
+        view.page, pages, view.in_stock_only, view.max_price, view.sort, entry.price_steps(), SORT_LABELS
+    )
+
+    if action == "open":
+        await callback.message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+    else:
+        try:
+            await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+        except TelegramBadRequest:
+            pass  # содержимое не изменилось
+    await callback.answer()
+    logger.debug("refine %s served from cache in %.1f ms", callback.data, (time.perf_counter() - started) * 1000)
+
+
 @router.callback_query(F.data == "feedback_like")
 @_safe_callback
 async def handle_feedback_like(callback: CallbackQuery, state: FSMContext) -> None:
@@ -206,6 +269,7 @@ async def _save_dislike_and_finish(
 @_safe_callback
 async def handle_reset(callback: CallbackQuery, state: FSMContext) -> None:
     await state.clear()
+    result_cache.drop(callback.message.chat.id)
     await callback.message.answer("🔄 Сброс. Напишите новый запрос.")
     await show_main_menu(callback)
     await callback.answer()
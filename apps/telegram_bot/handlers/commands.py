@@ -8,6 +8,7 @@ from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
 from ..menus import START_MESSAGE, show_main_menu
+from ..result_cache import result_cache
 
 router = Router()
 ADMIN_TG_ID = os.getenv("ADMIN_TG_ID", "")
@@ -42,6 +43,7 @@ async def cmd_help(message: Message) -> None:
 @router.message(Command("reset"))
 async def cmd_reset(message: Message, state: FSMContext) -> None:
     await state.clear()
+    result_cache.drop(message.chat.id)
     await message.answer("🔄 Контекст сброшен. Начните новый поиск — напишите запрос.")
     await show_main_menu(message)
 
@@ -63,6 +65,26 @@ async def cmd_debug(message: Message) -> None:
             lines.append(f"✅ Ollama: доступна ({h.get('configured_model', '?')})")
         else:
             lines.append(f"⚠️ Ollama: {h.get('error', 'модель не загружена')}")
+        if h.get("missing_models"):
+            lines.append(f"⚠️ Не скачаны модели: {', '.join(h['missing_models'])}")
+        backends = h.get("backends") or []
+        if len(backends) > 1:
+            for b in backends:
+                ewma = f"{b['ewma_ms']:.0f} мс" if b.get("ewma_ms") is not None else "—"
+                state = f", circuit {b['circuit']}" if b.get("circuit", "closed") != "closed" else ""
+                pause = f", пауза {b['cooldown_s']:.0f} с" if b.get("cooldown_s") else ""
+                lines.append(
+                    f"   • {b['url']}: в работе {b['outstanding']}/{b['max_concurrency']}, EWMA {ewma}, "
+                    f"ошибок {b['errors']}{pause}{state}"
+                )
+        circuit = h.get("circuit") or {}
+        if circuit:
+            icon = {"closed": "✅", "half_open": "🟡"}.get(circuit.get("state"), "⛔")
+            lines.append(
+                f"{icon} Circuit breaker: {circuit.get('state')}, ошибок {circuit.get('error_rate', 0):.0%}, "
+                f"p95 {circuit.get('p95_ms', 0):.0f} мс"
+                + (f", повтор через {circuit.get('open_for_s', 0):.0f} с" if circuit.get("state") == "open" else "")
+            )
     except Exception as e:
         lines.append(f"❌ Ollama: {e}")
 
@@ -84,4 +106,50 @@ async def cmd_debug(message: Message) -> None:
     else:
         lines.append("❌ БД не найдена")
 
+    # Очередь к LLM
+    from core import metrics
+    snap = metrics.snapshot()
+    gauges, counters = snap["gauges"], snap["counters"]
+    wait = snap["distributions"].get("llm.queue.wait_ms", {})
+    lines.append(
+        f"📊 LLM: активно {gauges.get('llm.active', 0):.0f}, в очереди {gauges.get('llm.queue.depth', 0):.0f}, "
+        f"ожидание p50/p95 {wait.get('p50', 0):.0f}/{wait.get('p95', 0):.0f} мс, "
+        f"отказов {counters.get('llm.queue.rejected', 0) + counters.get('llm.queue.timeout', 0)}"
+    )
+    lines.append(
+        f"🔥 Загрузка модели: холодных у пользователей {counters.get('llm.cold_load', 0)}, "
+        f"при прогреве {counters.get('llm.warmup.cold_load', 0)}, пингов {counters.get('llm.warmup.ping', 0)}, "
+        f"ошибок прогрева {counters.get('llm.warmup.failed', 0)}"
+    )
+    from core.llm_adapter import TASK_MODELS
+    dists = snap["distributions"]
+    task_lines = []
+    for task, model in TASK_MODELS.items():
+        d = dists.get(f"llm.task.{task}.latency_ms")
+        if d:
+            task_lines.append(f"{task} ({model}) p50/p95 {d.get('p50', 0):.0f}/{d.get('p95', 0):.0f} мс")
+    if task_lines:
+        lines.append("🧠 Модели по задачам: " + "; ".join(task_lines))
+    from core.intent import RULE_FASTPATH_THRESHOLD, llm_avoidance_rate
+    lines.append(
+        f"⚡ Извлечение: правила {counters.get('intent.path.rules', 0)}, "
+        f"классификатор {counters.get('intent.path.classifier', 0)}, кэш {counters.get('intent.path.cache', 0)}, "
+        f"LLM {counters.get('intent.path.llm', 0)}, fallback {counters.get('intent.path.fallback', 0)}, "
+        f"дозаполнение уточнений {counters.get('intent.path.slot_fill', 0)}+{counters.get('intent.path.slot_fill_llm', 0)} LLM; "
+        f"без LLM {llm_avoidance_rate():.0%} (порог {RULE_FASTPATH_THRESHOLD:g})"
+    )
+    from core.faq_cache import get_faq_cache
+    faq = get_faq_cache()
+    if faq is not None:
+        f = faq.snapshot()
+        lines.append(
+            f"📚 FAQ-кэш: записей {f['entries']}, попаданий {f['hits']}, промахов {f['misses']}, hit rate {f['hit_rate']:.0%}; "
+            f"вопросов про конкретное авто (не кэшируются) {f['skipped']}"
+        )
+    spec_hit, spec_miss = counters.get("speculation.hit", 0), counters.get("speculation.miss", 0)
+    lines.append(
+        f"🔮 Спекулятивный поиск: попаданий {spec_hit}, промахов {spec_miss}, "
+        f"hit rate {metrics.ratio('speculation.hit', 'speculation.hit', 'speculation.miss'):.0%}"
+    )
+
     await message.answer("\n".join(lines), parse_mode="HTML")
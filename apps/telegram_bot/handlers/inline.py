@@ -0,0 +1,54 @@
+"""Inline-режим: @bot <часть артикула или названия> — подсказки из in-memory индекса."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from aiogram import Router
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+
+from core.catalog_index import get_catalog_index
+from core.price_search import NOT_IN_PRICELIST
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+MIN_QUERY_LEN = 2
+MAX_SUGGESTIONS = 20
+
+_refresh_task: asyncio.Task | None = None
+
+
+def _schedule_refresh() -> None:
+    """Проверить новый импорт прайса в фоне — ответ на inline-запрос не ждёт перестройки."""
+    global _refresh_task
+    index = get_catalog_index()
+    if not index.needs_check() or (_refresh_task and not _refresh_task.done()):
+        return
+    _refresh_task = asyncio.create_task(asyncio.to_thread(index.refresh_if_changed))
+
+
+@router.inline_query()
+async def handle_inline_query(query: InlineQuery) -> None:
+    started = time.perf_counter()
+    text = (query.query or "").strip()
+    _schedule_refresh()
+    if len(text) < MIN_QUERY_LEN:
+        await query.answer([], cache_time=60, is_personal=False)
+        return
+
+    results = []
+    for e in get_catalog_index().lookup(text, limit=MAX_SUGGESTIONS):
+        price = f"{e.price:,.0f} ₽".replace(",", " ") if e.price and e.price > 0 else NOT_IN_PRICELIST
+        defect = " · некондиция" if e.is_defect else ""
+        results.append(
+            InlineQueryResultArticle(
+                id=f"{'d' if e.is_defect else 'p'}{e.id}",
+                title=f"{e.brand} {e.article}".strip() or e.nomenclature[:60],
+                description=f"{e.nomenclature[:80]}\n{price}{defect}",
+                input_message_content=InputTextMessageContent(message_text=f"Артикул {e.article}"),
+            )
+        )
+    await query.answer(results, cache_time=30, is_personal=False)
+    logger.debug("inline '%s': %d hits in %.1f ms", text, len(results), (time.perf_counter() - started) * 1000)
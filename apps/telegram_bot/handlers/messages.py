@@ -1,29 +1,34 @@
 """Обработка текстовых сообщений (поиск только по прайсам)."""
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import os
+import time
 import uuid
 
 from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
-from core.intent import extract_intent_and_slots, extract_sku_from_message
+from core import metrics
+from core.faq_cache import GENERAL_QUESTION_SYSTEM, get_faq_cache
+from core.intent import extract_intent_and_slots, extract_sku_from_message, fill_missing_slots, rule_extract
 from core.price_search import build_tiers, search
 from core.feedback_utils import anonymize_user_id, get_error_class
-
-GENERAL_QUESTION_SYSTEM = (
-    "Ты — опытный автомеханик и эксперт по запчастям. Отвечаешь кратко и по делу на русском языке. "
-    "Если вопрос про подбор запчастей — предложи воспользоваться поиском по прайсу. "
-    "Не выдумывай цены и наличие — их ты не знаешь."
-)
+from core.llm_adapter import TASK_GENERAL, get_last_call_stats, set_last_call_stats
+from core.llm_admission import PRIORITY_CLARIFICATION, PRIORITY_GENERAL, PRIORITY_NEW_QUERY
 from core.pii_masker import mask_pii
 from core.logger import log_event, log_event_to_db
+from core.singleflight import SingleFlight, make_key
 
+from ..concurrency import chat_lock
 from ..formatter import format_clarification, format_no_results, format_results
 from ..menus import results_keyboard, show_main_menu, show_feedback_request
+from ..result_cache import result_cache
 from ..states import PartsSearch
+from ..streaming import answer_streaming
 from storage.feedback_repository import (
     DialogueCycle,
     save_dialogue_cycle,
@@ -33,6 +38,122 @@ from storage.feedback_repository import (
 router = Router()
 logger = logging.getLogger(__name__)
 
+# Одинаковые запросы (популярный OEM в чатах) в пике выполняются один раз на всех
+_intent_flight = SingleFlight("intent")
+_search_flight = SingleFlight("search")
+
+
+def _car_key(car_context: dict) -> dict:
+    """Нормализованный контекст авто для ключа коалесинга."""
+    return {k: str(v).strip().lower() for k, v in (car_context or {}).items() if v}
+
+
+async def _coalesced_extract(
+    masked_text: str,
+    car_context: dict,
+    clarification_answers: list[str] | None,
+    priority: int = PRIORITY_NEW_QUERY,
+) -> dict:
+    """extract_intent_and_slots с объединением одновременных одинаковых запросов."""
+    key = make_key(masked_text.strip().lower(), _car_key(car_context), clarification_answers or [])
+    return await _intent_flight.do(
+        key,
+        lambda: extract_intent_and_slots(
+            query=masked_text,
+            car_context=dict(car_context),
+            clarification_answers=clarification_answers,
+            priority=priority,
+        ),
+    )
+
+
+async def _coalesced_search(**params) -> list:
+    """search() в отдельном потоке с объединением одновременных одинаковых запросов."""
+    return await _search_flight.do(make_key(params), lambda: asyncio.to_thread(search, **params))
+
+
+# Спекулятивный поиск по rule-based слотам параллельно с извлечением intent
+SPECULATIVE_SEARCH = os.getenv("SPECULATIVE_SEARCH", "true").lower() in ("1", "true", "yes")
+SPECULATIVE_MIN_CONFIDENCE = float(os.getenv("SPECULATIVE_MIN_CONFIDENCE", "0.6"))
+
+
+def _search_params(result: dict, raw_text: str, masked_text: str, car_context: dict) -> dict:
+    """Параметры search() из слотов: общие для спекулятивного и основного поиска."""
+    # Приоритет: нормализованный part_type, иначе part_query. Для ТО — из maintenance_logic.
+    search_query = result.get("part_type") or result.get("part_query") or masked_text
+    if result.get("intent") == "maintenance_parts":
+        from core.maintenance_logic import build_maintenance_search_queries
+        maintenance_parts = build_maintenance_search_queries("full", car_context)
+        if maintenance_parts:
+            first_term = maintenance_parts[0].get("search_terms", ["масляный фильтр"])[0]
+            if not search_query or search_query in ("полное то", "расходники", "то", "обслуживание"):
+                search_query = first_term
+    article = result.get("article") or ""
+    oem = result.get("oem_number") or ""
+    brand_pref = result.get("brand_pref")
+    brand = "" if brand_pref in ("oem", "analog", None) else str(brand_pref or "")
+
+    sku = extract_sku_from_message(raw_text)
+    if sku:
+        article = sku
+        oem = sku
+    return {"query": search_query, "article": article, "oem": oem, "brand": brand, "max_results": 50}
+
+
+def _start_speculative_search(
+    raw_text: str,
+    masked_text: str,
+    car_context: dict,
+    clarification_answers: list[str] | None,
+) -> tuple[asyncio.Task, dict] | None:
+    """
+    Запустить поиск по rule-based слотам, пока LLM извлекает intent.
+    Только если в сообщении есть артикул или узнаваемая деталь (уверенность правил ≥ порога).
+    """
+    if not SPECULATIVE_SEARCH:
+        return None
+    guess, confidence = rule_extract(masked_text, car_context, clarification_answers)
+    if guess.get("intent") != "parts_search" or confidence < SPECULATIVE_MIN_CONFIDENCE:
+        return None
+    car = {**car_context, **{k: v for k, v in (guess.get("car_context") or {}).items() if v}}
+    params = _search_params(guess, raw_text, masked_text, car)
+    task = asyncio.create_task(_coalesced_search(**params))
+    # Результат может не понадобиться — исключение не должно остаться «never retrieved»
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    metrics.incr("speculation.launched")
+    return task, params
+
+
+def _discard_speculation(speculation: tuple[asyncio.Task, dict] | None) -> None:
+    """Слоты LLM разошлись с rule-based — спекулятивный поиск не нужен."""
+    if speculation is None:
+        return
+    speculation[0].cancel()
+    metrics.incr("speculation.miss")
+
+
+async def _answer_from_faq(message: Message, user_id: int, masked_text: str) -> bool:
+    """Похожий общий вопрос уже отвечен — ответ из FAQ-кэша без генерации (только для intent general_question)."""
+    faq = get_faq_cache()
+    if faq is None:
+        return False
+    hit = await asyncio.to_thread(faq.lookup, masked_text)
+    if hit is None:
+        return False
+    entry, score = hit
+    await message.answer(entry.answer)
+    await log_event_to_db(
+        "general_answer",
+        {"tg_user_id": user_id, "query": masked_text, "source": "faq", "faq_id": entry.id, "score": round(score, 3)},
+    )
+    return True
+
+
+def _cycle_messages(original_query: str, data: dict, raw_text: str) -> list[str]:
+    """Сообщения цикла по порядку: исходный запрос первым (на нём обучается классификатор), затем ответы."""
+    messages = [original_query, *(data.get("clarification_answers") or []), raw_text]
+    return [m for i, m in enumerate(messages) if m and (i == 0 or m != messages[i - 1])]
+
 
 def _normalize_questions(questions: list) -> list[str]:
     """Нормализация questions: dict {text} или строка."""
@@ -52,7 +173,8 @@ def _normalize_questions(questions: list) -> list[str]:
 @router.message(F.text)
 async def handle_message(message: Message, state: FSMContext) -> None:
     try:
-        await _handle_message_impl(message, state)
+        async with chat_lock(message.chat.id):
+            await _handle_message_impl(message, state)
     except Exception as e:
         logger.error("Необработанная ошибка в handle_message: %s", e, exc_info=True)
         await message.answer(
@@ -65,6 +187,7 @@ async def _handle_message_impl(message: Message, state: FSMContext) -> None:
     raw_text = (message.text or "").strip()
     if not raw_text:
         return
+    started = time.perf_counter()
 
     current_state = await state.get_state()
     data = await state.get_data()
@@ -110,19 +233,33 @@ async def _handle_message_impl(message: Message, state: FSMContext) -> None:
         await state.update_data(original_query=original_query)
 
     car_context = dict(data.get("car_context") or {})
+    speculation = None
 
+    set_last_call_stats(None)
     try:
-        result = await extract_intent_and_slots(
-            query=masked_text,
-            car_context=car_context,
-            clarification_answers=clarification_answers if clarification_answers else None,
-        )
+        # Ответ на уточнение: дозаполнить недостающие слоты прошлого разбора, без полного извлечения
+        result = None
+        if is_waiting_clarification and data.get("last_result"):
+            result = await fill_missing_slots(data["last_result"], masked_text, car_context)
+        if result is None:
+            speculation = _start_speculative_search(
+                raw_text, masked_text, car_context, clarification_answers if clarification_answers else None
+            )
+            result = await _coalesced_extract(
+                masked_text,
+                car_context,
+                clarification_answers if clarification_answers else None,
+                priority=PRIORITY_CLARIFICATION if is_waiting_clarification else PRIORITY_NEW_QUERY,
+            )
     except Exception as e:
         logger.exception("Intent extraction failed: %s", e)
+        _discard_speculation(speculation)
         await message.answer(
             "⚠️ Не удалось обработать запрос. Попробуйте переформулировать или напишите /reset"
         )
         return
+    # Статистика вызова LLM (None — ответ из правил/кэша или запрос присоединился к чужому вызову)
+    llm_stats = get_last_call_stats()
 
     if result.get("car_context"):
         for k, v in result["car_context"].items():
@@ -130,19 +267,36 @@ async def _handle_message_impl(message: Message, state: FSMContext) -> None:
                 car_context[k] = v
         await state.update_data(car_context=car_context)
 
-    # general_question — ответ через LLM как эксперта-автомеханика
+    # general_question — ответ через LLM как эксперта-автомеханика; частый вопрос — из FAQ-кэша
     if result.get("intent") == "general_question":
+        _discard_speculation(speculation)
+        if await _answer_from_faq(message, user_id, masked_text):
+            await show_main_menu(message)
+            return
         try:
             try:
-                from llm import generate as llm_generate
+                from llm import generate_stream as llm_generate_stream
             except ImportError:
-                from core.llm_adapter import call_llm as llm_generate
-            reply = await llm_generate(
-                prompt=masked_text,
-                system=GENERAL_QUESTION_SYSTEM,
-                timeout=25,
+                from core.llm_adapter import stream_llm as llm_generate_stream
+            reply = await answer_streaming(
+                message,
+                llm_generate_stream(
+                    prompt=masked_text,
+                    system=GENERAL_QUESTION_SYSTEM,
+                    timeout=25,
+                    priority=PRIORITY_GENERAL,
+                    task=TASK_GENERAL,
+                ),
+            )
+            if not reply.text:
+                await message.answer("Не удалось сформировать ответ.")
+            elif reply.completed:  # оборванный поток не кэшируем
+                faq = get_faq_cache()
+                if faq is not None:
+                    await asyncio.to_thread(faq.store, masked_text, reply.text)
+            await log_event_to_db(
+                "general_answer", {"tg_user_id": user_id, "query": masked_text, "source": "llm"}
             )
-            await message.answer(reply.strip() or "Не удалось сформировать ответ.")
         except Exception as e:
             logger.warning("LLM for general_question failed: %s", e)
             await message.answer(
@@ -179,6 +333,7 @@ async def _handle_message_impl(message: Message, state: FSMContext) -> None:
             cycle_id=cycle_id,
         )
         await state.set_state(PartsSearch.waiting_clarification)
+        _discard_speculation(speculation)
         log_event("clarification_asked", {"tg_user_id": user_id, "questions": questions})
         summary = result.get("summary", "") or f"Подбираю {part_type}."
         await message.answer(format_clarification(summary, questions_for_display), parse_mode="HTML")
@@ -194,43 +349,23 @@ async def _handle_message_impl(message: Message, state: FSMContext) -> None:
             tg_user_hash=tg_user_hash,
             intent=result.get("intent"),
             slots_json=json.dumps(result, ensure_ascii=False),
-            all_messages_json=json.dumps(
-                (data.get("clarification_answers") or []) + [raw_text],
-                ensure_ascii=False,
-            ),
+            all_messages_json=json.dumps(_cycle_messages(original_query, data, raw_text), ensure_ascii=False),
         )
         await save_dialogue_cycle(cycle)
         await state.update_data(cycle_id=cycle_id)
 
     await message.bot.send_chat_action(message.chat.id, "typing")
 
-    # Приоритет: нормализованный part_type, иначе part_query. Для ТО — из maintenance_logic.
-    search_query = result.get("part_type") or result.get("part_query") or masked_text
-    if result.get("intent") == "maintenance_parts":
-        from core.maintenance_logic import build_maintenance_search_queries
-        maintenance_parts = build_maintenance_search_queries("full", car_context)
-        if maintenance_parts:
-            first_term = maintenance_parts[0].get("search_terms", ["масляный фильтр"])[0]
-            if not search_query or search_query in ("полное то", "расходники", "то", "обслуживание"):
-                search_query = first_term
-    article = result.get("article") or ""
-    oem = result.get("oem_number") or ""
-    brand_pref = result.get("brand_pref")
-    brand = "" if brand_pref in ("oem", "analog", None) else str(brand_pref or "")
-
-    sku = extract_sku_from_message(raw_text)
-    if sku:
-        article = sku
-        oem = sku
-
+    params = _search_params(result, raw_text, masked_text, car_context)
+    search_query = params["query"]
     try:
-        items = search(
-            query=search_query,
-            article=article,
-            oem=oem,
-            brand=brand,
-            max_results=50,
-        )
+        if speculation is not None and speculation[1] == params:
+            # LLM подтвердил rule-based слоты — поиск уже идёт (или закончен)
+            metrics.incr("speculation.hit")
+            items = await speculation[0]
+        else:
+            _discard_speculation(speculation)
+            items = await _coalesced_search(**params)
     except Exception as e:
         logger.exception("Search failed: %s", e)
         await message.answer(
@@ -250,6 +385,7 @@ async def _handle_message_impl(message: Message, state: FSMContext) -> None:
         return
 
     tiers = build_tiers(items)
+    result_cache.put(message.chat.id, items, part_type or search_query)
 
     attempt_count = data.get("cycle_attempt_count", 0) + 1
     prompt_version = "1.0.0"
@@ -259,19 +395,22 @@ async def _handle_message_impl(message: Message, state: FSMContext) -> None:
     except Exception:
         pass
     llm_model = "ollama"
-    try:
-        from llm import health_check
-        h = await health_check()
-        llm_model = "ollama" if h.get("available") else "fallback"
-    except Exception:
-        llm_model = "llm"
+    if llm_stats:
+        llm_model = llm_stats.get("model") or llm_model
+    else:
+        try:
+            from llm import health_check
+            h = await health_check()
+            llm_model = "ollama" if h.get("available") else "fallback"
+        except Exception:
+            llm_model = "llm"
 
     tiers_dict = {
         "economy": [i.to_dict() for i in tiers["economy"]],
         "optimal": [i.to_dict() for i in tiers["optimal"]],
         "oem": [i.to_dict() for i in tiers["oem"]],
     }
-    all_messages = (data.get("clarification_answers") or []) + [raw_text]
+    all_messages = _cycle_messages(data.get("original_query") or raw_text, data, raw_text)
     all_bot_responses = data.get("cycle_bot_responses") or []
 
     await update_dialogue_cycle(
@@ -283,6 +422,9 @@ async def _handle_message_impl(message: Message, state: FSMContext) -> None:
         tiers_shown_json=json.dumps(tiers_dict, ensure_ascii=False),
         llm_model=llm_model,
         prompt_version=prompt_version,
+        llm_input_safe=mask_pii(llm_stats["prompt"]) if llm_stats else None,
+        llm_output_raw=llm_stats["response"] if llm_stats else None,
+        total_latency_ms=int((time.perf_counter() - started) * 1000),
     )
 
     summary = result.get("summary", "") or f"Нашёл варианты {part_type}."
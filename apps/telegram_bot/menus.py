@@ -64,6 +64,7 @@ def results_keyboard() -> InlineKeyboardMarkup:
                 InlineKeyboardButton(text="🟡 Оптимум", callback_data="tier_optimal"),
                 InlineKeyboardButton(text="🔵 OEM", callback_data="tier_oem"),
             ],
+            [InlineKeyboardButton(text="📄 Все варианты и фильтры", callback_data="res:open")],
             [
                 InlineKeyboardButton(text="🔄 Уточнить запрос", callback_data="reset"),
                 InlineKeyboardButton(text="🆕 Новый поиск", callback_data="reset"),
@@ -72,6 +73,47 @@ def results_keyboard() -> InlineKeyboardMarkup:
     )
 
 
+def refine_keyboard(
+    page: int,
+    pages: int,
+    in_stock_only: bool,
+    max_price: float | None,
+    sort: str,
+    price_steps: list[int],
+    sort_labels: dict[str, str],
+) -> InlineKeyboardMarkup:
+    """Листание, фильтры и сортировка выдачи из кэша (callback_data res:*)."""
+    rows: list[list[InlineKeyboardButton]] = []
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="◀️", callback_data=f"res:page:{page - 1}"))
+    nav.append(InlineKeyboardButton(text=f"{page + 1}/{max(pages, 1)}", callback_data="res:noop"))
+    if page + 1 < pages:
+        nav.append(InlineKeyboardButton(text="▶️", callback_data=f"res:page:{page + 1}"))
+    rows.append(nav)
+    rows.append([
+        InlineKeyboardButton(
+            text=("✅ Только в наличии" if in_stock_only else "☐ Только в наличии"),
+            callback_data="res:stock",
+        )
+    ])
+    if price_steps:
+        price_row = [
+            InlineKeyboardButton(
+                text=(("✅ " if max_price == p else "") + f"≤{p:,} ₽".replace(",", " ")),
+                callback_data=f"res:max:{p}",
+            )
+            for p in price_steps
+        ]
+        price_row.append(InlineKeyboardButton(text="Любая цена", callback_data="res:max:0"))
+        rows.append(price_row)
+    rows.append([
+        InlineKeyboardButton(text=("✅ " if key == sort else "") + label, callback_data=f"res:sort:{key}")
+        for key, label in sort_labels.items()
+    ])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
 def feedback_request_keyboard() -> InlineKeyboardMarkup:
     """Кнопки оценки подбора. cycle_id берётся из FSM state."""
     return InlineKeyboardMarkup(
@@ -0,0 +1,118 @@
+"""Кэш последней выдачи по чату: листание и фильтры без LLM и SQL."""
+from __future__ import annotations
+
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from core.price_search import PriceItem, rank_items
+
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "1800"))
+RESULT_CACHE_MAX_CHATS = int(os.getenv("RESULT_CACHE_MAX_CHATS", "2000"))
+# Ограничение памяти: суммарное число позиций во всех чатах
+RESULT_CACHE_MAX_ITEMS = int(os.getenv("RESULT_CACHE_MAX_ITEMS", "50000"))
+RESULT_CACHE_ITEMS_PER_CHAT = int(os.getenv("RESULT_CACHE_ITEMS_PER_CHAT", "200"))
+PAGE_SIZE = 5
+
+SORT_OPTIMAL = "optimal"
+SORT_PRICE = "price"
+SORT_DELIVERY = "delivery"
+SORT_LABELS = {SORT_OPTIMAL: "⚖️ Оптимум", SORT_PRICE: "💰 Цена", SORT_DELIVERY: "🚚 Срок"}
+
+
+@dataclass
+class ResultView:
+    """Текущее представление выдачи: страница, фильтры, сортировка."""
+    page: int = 0
+    in_stock_only: bool = False
+    max_price: float | None = None
+    sort: str = SORT_OPTIMAL
+
+
+@dataclass
+class CachedResults:
+    items: list[PriceItem]
+    part_type: str
+    created_at: float = field(default_factory=time.monotonic)
+    view: ResultView = field(default_factory=ResultView)
+
+    def apply(self) -> list[PriceItem]:
+        """Отфильтровать и отсортировать по текущему view (без страницы)."""
+        v = self.view
+        out = self.items
+        if v.in_stock_only:
+            out = [i for i in out if "✓" in i.display_stock]
+        if v.max_price is not None:
+            out = [i for i in out if i.price is not None and 0 < i.price <= v.max_price]
+        if v.sort == SORT_PRICE:
+            out = sorted(out, key=lambda i: (i.price if i.price and i.price > 0 else math.inf))
+        elif v.sort == SORT_DELIVERY:
+            out = sorted(
+                out,
+                key=lambda i: (i.delivery_days if i.delivery_days is not None and i.delivery_days >= 0 else math.inf),
+            )
+        return out
+
+    def price_steps(self) -> list[int]:
+        """Пороги «дешевле X» по квартилям цен выдачи, округлённые до сотен."""
+        prices = sorted(i.price for i in self.items if i.price and i.price > 0)
+        if len(prices) < 4:
+            return []
+        steps: list[int] = []
+        for q in (0.25, 0.5, 0.75):
+            val = int(math.ceil(prices[int(q * (len(prices) - 1))] / 100.0) * 100)
+            if val not in steps:
+                steps.append(val)
+        return steps
+
+
+class ResultCache:
+    """LRU по чатам с TTL и общим лимитом позиций."""
+
+    def __init__(
+        self,
+        ttl: int = RESULT_CACHE_TTL,
+        max_chats: int = RESULT_CACHE_MAX_CHATS,
+        max_items: int = RESULT_CACHE_MAX_ITEMS,
+    ) -> None:
+        self.ttl = ttl
+        self.max_chats = max_chats
+        self.max_items = max_items
+        self._data: OrderedDict[int, CachedResults] = OrderedDict()
+        self._total_items = 0
+
+    def put(self, chat_id: int, items: list[PriceItem], part_type: str) -> CachedResults:
+        self.drop(chat_id)
+        entry = CachedResults(items=rank_items(items)[:RESULT_CACHE_ITEMS_PER_CHAT], part_type=part_type)
+        self._data[chat_id] = entry
+        self._total_items += len(entry.items)
+        self._evict()
+        return entry
+
+    def get(self, chat_id: int) -> CachedResults | None:
+        entry = self._data.get(chat_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.created_at > self.ttl:
+            self.drop(chat_id)
+            return None
+        self._data.move_to_end(chat_id)
+        return entry
+
+    def drop(self, chat_id: int) -> None:
+        entry = self._data.pop(chat_id, None)
+        if entry is not None:
+            self._total_items -= len(entry.items)
+
+    def _evict(self) -> None:
+        while self._data and (len(self._data) > self.max_chats or self._total_items > self.max_items):
+            _, entry = self._data.popitem(last=False)
+            self._total_items -= len(entry.items)
+
+    def stats(self) -> dict[str, int]:
+        return {"chats": len(self._data), "items": self._total_items}
+
+
+result_cache = ResultCache()
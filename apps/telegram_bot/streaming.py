@@ -0,0 +1,80 @@
+"""Потоковый ответ LLM в Telegram: первое сообщение по первым токенам, дальше — правки."""
+from __future__ import annotations
+
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+
+logger = logging.getLogger(__name__)
+
+# Telegram ограничивает частоту правок одного сообщения — не чаще ~1 раза в секунду
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+# Не отправлять сообщение из 1–2 символов: ждём осмысленный первый фрагмент
+STREAM_MIN_FIRST_CHARS = int(os.getenv("STREAM_MIN_FIRST_CHARS", "20"))
+TELEGRAM_MAX_TEXT = 4096
+
+
+@dataclass(frozen=True)
+class StreamedReply:
+    """Показанный пользователю текст и дошёл ли поток до конца (оборванный ответ нельзя кэшировать)."""
+    text: str
+    completed: bool
+
+
+async def _edit(message: Message, sent: Message, text: str) -> None:
+    try:
+        await message.bot.edit_message_text(
+            text=text[:TELEGRAM_MAX_TEXT],
+            chat_id=sent.chat.id,
+            message_id=sent.message_id,
+        )
+    except TelegramBadRequest as e:
+        # "message is not modified" и т.п. — не ошибка для пользователя
+        logger.debug("edit_message_text skipped: %s", e)
+
+
+async def answer_streaming(message: Message, chunks: AsyncIterator[str]) -> StreamedReply:
+    """
+    Отправить ответ по мере генерации. Возвращает итоговый текст и признак завершения потока;
+    оборванный на середине ответ показывается с « …» и completed=False.
+    Если поток оборвался до первого фрагмента — исключение пробрасывается вызывающему.
+    """
+    completed = True
+    text = ""
+    sent: Message | None = None
+    shown = ""
+    last_edit = 0.0
+    try:
+        async for piece in chunks:
+            text += piece
+            stripped = text.strip()
+            if sent is None:
+                if len(stripped) >= STREAM_MIN_FIRST_CHARS:
+                    sent = await message.answer(stripped[:TELEGRAM_MAX_TEXT])
+                    shown = stripped
+                    last_edit = time.monotonic()
+                continue
+            if time.monotonic() - last_edit >= STREAM_EDIT_INTERVAL and stripped != shown:
+                await _edit(message, sent, stripped)
+                shown = stripped
+                last_edit = time.monotonic()
+    except Exception as e:
+        if sent is None and not text.strip():
+            raise
+        logger.warning("LLM stream interrupted: %s", e)
+        completed = False
+        text = text.rstrip() + " …"
+
+    final = text.strip()
+    if sent is None:
+        if final:
+            await message.answer(final[:TELEGRAM_MAX_TEXT])
+        return StreamedReply(final, completed)
+    if final != shown:
+        await _edit(message, sent, final)
+    return StreamedReply(final, completed)
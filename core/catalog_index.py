@@ -0,0 +1,181 @@
+"""In-memory префиксный индекс по артикулам, OEM и словам номенклатуры (автодополнение)."""
+from __future__ import annotations
+
+import heapq
+import logging
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+
+from core.price_search import get_connection, normalize_article
+
+logger = logging.getLogger(__name__)
+
+# Как часто проверять import_runs на новый импорт (сек)
+REFRESH_CHECK_INTERVAL = 30.0
+# Сколько ключей максимум просматривать на один префикс — ограничивает время ответа
+MAX_SCAN_PER_PREFIX = 5000
+
+_TOKEN_RE = re.compile(r"[0-9a-zа-яё]+", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    id: int
+    is_defect: bool
+    article: str
+    brand: str
+    nomenclature: str
+    price: float | None
+    in_stock: str
+    article_key: str = ""
+
+
+def _name_tokens(text: str) -> set[str]:
+    return {t for t in _TOKEN_RE.findall((text or "").lower()) if len(t) > 1}
+
+
+class CatalogIndex:
+    """
+    Отсортированный массив (ключ, номер позиции) + bisect.
+    Ключи артикулов/OEM — normalize_article (верхний регистр), слова номенклатуры — нижний регистр,
+    поэтому оба вида живут в одном массиве без пересечений.
+    """
+
+    def __init__(self) -> None:
+        self._keys: list[str] = []
+        self._postings: list[int] = []
+        self._entries: list[IndexEntry] = []
+        self._import_version: int | None = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _current_import_version(conn: sqlite3.Connection) -> int | None:
+        try:
+            row = conn.execute("SELECT MAX(id) FROM import_runs").fetchone()
+            return row[0] if row else None
+        except sqlite3.OperationalError:
+            return None
+
+    def load(self) -> None:
+        """Построить индекс из products / products_defect."""
+        started = time.perf_counter()
+        entries: list[IndexEntry] = []
+        pairs: list[tuple[str, int]] = []
+        conn = get_connection()
+        try:
+            version = self._current_import_version(conn)
+            for table, is_def in [("products", False), ("products_defect", True)]:
+                try:
+                    rows = conn.execute(
+                        f"SELECT id, article, article_raw, oem_number, catalog_number, nomenclature, brand, "
+                        f"price, in_stock FROM {table}"
+                    ).fetchall()
+                except sqlite3.OperationalError:
+                    continue
+                for r in rows:
+                    idx = len(entries)
+                    entries.append(
+                        IndexEntry(
+                            id=r["id"],
+                            is_defect=is_def,
+                            article=str(r["article_raw"] or r["article"] or ""),
+                            brand=str(r["brand"] or ""),
+                            nomenclature=str(r["nomenclature"] or r["article"] or ""),
+                            price=float(r["price"]) if r["price"] is not None else None,
+                            in_stock=str(r["in_stock"] or ""),
+                            article_key=normalize_article(r["article_raw"] or r["article"] or ""),
+                        )
+                    )
+                    keys = {normalize_article(r[c]) for c in ("article", "article_raw", "oem_number", "catalog_number")}
+                    keys |= _name_tokens(r["nomenclature"] or "")
+                    keys |= _name_tokens(r["brand"] or "")
+                    pairs.extend((k, idx) for k in keys if k)
+        finally:
+            conn.close()
+        pairs.sort()
+        with self._lock:
+            self._keys = [k for k, _ in pairs]
+            self._postings = [i for _, i in pairs]
+            self._entries = entries
+            self._import_version = version
+            self._last_check = time.monotonic()
+        logger.info(
+            "Catalog index: %d items, %d keys, %.0f ms",
+            len(entries), len(pairs), (time.perf_counter() - started) * 1000,
+        )
+
+    def needs_check(self) -> bool:
+        return time.monotonic() - self._last_check >= REFRESH_CHECK_INTERVAL
+
+    def refresh_if_changed(self) -> bool:
+        """Перестроить индекс, если с момента загрузки был новый импорт прайса."""
+        self._last_check = time.monotonic()
+        conn = get_connection()
+        try:
+            version = self._current_import_version(conn)
+        finally:
+            conn.close()
+        if version == self._import_version:
+            return False
+        logger.info("Catalog index: import %s → %s, rebuilding", self._import_version, version)
+        self.load()
+        return True
+
+    def _prefix(self, keys: list[str], postings: list[int], prefix: str) -> set[int]:
+        found: set[int] = set()
+        i = bisect_left(keys, prefix)
+        end = min(len(keys), i + MAX_SCAN_PER_PREFIX)
+        while i < end and keys[i].startswith(prefix):
+            found.add(postings[i])
+            i += 1
+        return found
+
+    def lookup(self, query: str, limit: int = 20) -> list[IndexEntry]:
+        """Позиции, у которых каждое слово запроса — префикс артикула/OEM или слова названия."""
+        with self._lock:
+            keys, postings, entries = self._keys, self._postings, self._entries
+        words = [w for w in (query or "").split() if w.strip()]
+        if not words or not keys:
+            return []
+        matched: set[int] | None = None
+        for w in words:
+            hits = set()
+            art = normalize_article(w)
+            if art:
+                hits |= self._prefix(keys, postings, art)
+            for tok in _name_tokens(w):
+                hits |= self._prefix(keys, postings, tok)
+            matched = hits if matched is None else matched & hits
+            if not matched:
+                return []
+        # Точное совпадение артикула выше, затем позиции с ценой по возрастанию
+        exact = normalize_article(query)
+
+        def rank(i: int) -> tuple:
+            e = entries[i]
+            return (
+                e.article_key != exact,
+                e.is_defect,
+                e.price is None or e.price <= 0,
+                e.price or 0,
+            )
+
+        return [entries[i] for i in heapq.nsmallest(limit, matched or (), key=rank)]
+
+
+_index: CatalogIndex | None = None
+
+
+def get_catalog_index() -> CatalogIndex:
+    global _index
+    if _index is None:
+        _index = CatalogIndex()
+    return _index
@@ -0,0 +1,194 @@
+"""
+Circuit breaker для вызовов LLM: скользящее окно ошибок/латентности, open/half-open, адаптивный таймаут.
+Копия в services/core-api (app/llm) — `make sync-llm-shared`; импорты только относительные.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+LLM_CB_WINDOW = int(os.getenv("LLM_CB_WINDOW", "20"))
+LLM_CB_WINDOW_SECONDS = float(os.getenv("LLM_CB_WINDOW_SECONDS", "120"))
+LLM_CB_MIN_CALLS = int(os.getenv("LLM_CB_MIN_CALLS", "5"))
+LLM_CB_ERROR_RATE = float(os.getenv("LLM_CB_ERROR_RATE", "0.5"))
+LLM_CB_CONSECUTIVE_FAILURES = int(os.getenv("LLM_CB_CONSECUTIVE_FAILURES", "3"))
+LLM_CB_OPEN_SECONDS = float(os.getenv("LLM_CB_OPEN_SECONDS", "30"))
+# Адаптивный таймаут: p95 успешных вызовов × коэффициент, но не меньше минимума и не больше запрошенного
+LLM_TIMEOUT_P95_FACTOR = float(os.getenv("LLM_TIMEOUT_P95_FACTOR", "3"))
+LLM_TIMEOUT_MIN = float(os.getenv("LLM_TIMEOUT_MIN", "20"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+_STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(RuntimeError):
+    """LLM считается недоступной — вызов не выполняется, нужен fallback."""
+
+
+class CircuitBreaker:
+    """
+    closed → open: доля ошибок в окне ≥ error_rate (при min_calls вызовах) или подряд consecutive_failures ошибок.
+    open → half_open: через open_seconds; пропускается один пробный вызов.
+    half_open → closed при успехе пробы, → open при ошибке.
+    """
+
+    def __init__(
+        self,
+        name: str = "llm",
+        window: int = LLM_CB_WINDOW,
+        window_seconds: float = LLM_CB_WINDOW_SECONDS,
+        min_calls: int = LLM_CB_MIN_CALLS,
+        error_rate: float = LLM_CB_ERROR_RATE,
+        consecutive_failures: int = LLM_CB_CONSECUTIVE_FAILURES,
+        open_seconds: float = LLM_CB_OPEN_SECONDS,
+        timeout_factor: float = LLM_TIMEOUT_P95_FACTOR,
+        timeout_min: float = LLM_TIMEOUT_MIN,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate
+        self.consecutive_threshold = consecutive_failures
+        self.open_seconds = open_seconds
+        self.timeout_factor = timeout_factor
+        self.timeout_min = timeout_min
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes: deque[tuple[float, bool]] = deque(maxlen=window)
+        self._latencies: deque[float] = deque(maxlen=100)
+        self._consecutive = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._opened_total = 0
+
+    # --- состояние ---
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            logger.warning("LLM circuit %s: %s → %s", self.name, self._state, state)
+            self._state = state
+        metrics.set_gauge(f"{self.name}.circuit.state", _STATE_CODES[state])
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._set_state(HALF_OPEN)
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _error_rate(self) -> float:
+        now = self._clock()
+        recent = [ok for ts, ok in self._outcomes if now - ts <= self.window_seconds]
+        if len(recent) < self.min_calls:
+            return 0.0
+        return recent.count(False) / len(recent)
+
+    def _trip(self) -> None:
+        self._opened_at = self._clock()
+        self._probe_in_flight = False
+        self._opened_total += 1
+        metrics.incr(f"{self.name}.circuit.opened")
+        self._set_state(OPEN)
+
+    # --- протокол вызова ---
+
+    def before_call(self) -> None:
+        """Проверить, можно ли звать LLM. Открыт — CircuitOpen; в half_open пропускается одна проба."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+        metrics.incr(f"{self.name}.circuit.short_circuited")
+        raise CircuitOpen(f"LLM circuit is {state}")
+
+    def record_success(self, latency_ms: float | None = None) -> None:
+        with self._lock:
+            self._outcomes.append((self._clock(), True))
+            self._consecutive = 0
+            if latency_ms is not None:
+                self._latencies.append(latency_ms)
+                metrics.observe(f"{self.name}.latency_ms", latency_ms)
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+                self._outcomes.clear()
+                self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._outcomes.append((self._clock(), False))
+            self._consecutive += 1
+            metrics.incr(f"{self.name}.errors")
+            if self._state == HALF_OPEN:
+                self._trip()
+            elif self._state == CLOSED and (
+                self._consecutive >= self.consecutive_threshold
+                or self._error_rate() >= self.error_rate_threshold > 0
+            ):
+                self._trip()
+
+    def release(self) -> None:
+        """Вызов не состоялся (отмена, отказ очереди) — не считается ни успехом, ни ошибкой."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    # --- таймаут ---
+
+    def timeout_for(self, requested: float) -> float:
+        """
+        Таймаут конкретного вызова: при достаточной статистике — p95 × коэффициент.
+        Пробный вызов в half_open получает полный запрошенный таймаут (модель может загружаться заново).
+        """
+        with self._lock:
+            if self._state == HALF_OPEN or len(self._latencies) < self.min_calls:
+                return requested
+            p95_s = metrics.percentile(list(self._latencies), 0.95) / 1000
+        adaptive = min(requested, max(self.timeout_min, p95_s * self.timeout_factor))
+        metrics.set_gauge(f"{self.name}.timeout_s", round(adaptive, 1))
+        return adaptive
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            p95 = metrics.percentile(list(self._latencies), 0.95)
+            return {
+                "state": state,
+                "error_rate": round(self._error_rate(), 2),
+                "consecutive_failures": self._consecutive,
+                "p95_ms": round(p95, 1),
+                "open_for_s": round(max(0.0, self.open_seconds - (self._clock() - self._opened_at)), 1)
+                if state == OPEN
+                else 0.0,
+                "opened_total": self._opened_total,
+            }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str = "llm") -> CircuitBreaker:
+    """Breaker по имени: "llm" — основной инстанс Ollama, у каждого бэкенда роутера — свой (llm.backend.<host>)."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
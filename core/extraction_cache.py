@@ -0,0 +1,232 @@
+"""
+Кэш результатов извлечения intent/слотов: LRU в памяти + таблица SQLite.
+Чтение ничего не пишет: попадания копятся в памяти и сохраняются в hits вместе со следующей записью
+(или пачкой, когда их набралось EXTRACTION_CACHE_HITS_FLUSH). Из async-кода — aget/aput: SQLite в потоке.
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv("DB_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "parts.db"))
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "2000"))
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Сколько накопленных попаданий сбрасывать в SQLite без ожидания следующей записи
+EXTRACTION_CACHE_HITS_FLUSH = int(os.getenv("EXTRACTION_CACHE_HITS_FLUSH", "100"))
+
+_lock = threading.Lock()  # память
+_disk_lock = threading.Lock()  # запись в SQLite и _pending_hits
+_memory: OrderedDict[str, dict[str, Any]] = OrderedDict()
+_pending_hits: dict[str, int] = {}
+_table_ready = False
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def make_cache_key(
+    masked_query: str,
+    car_context: dict | None,
+    clarification_answers: list[str] | None,
+    prompt_version: str,
+    model: str,
+) -> str:
+    """Ключ: запрос, контекст авто, ответы на уточнения, версия промпта и модель."""
+    car = {k: _normalize_text(str(v)) for k, v in (car_context or {}).items() if v}
+    answers = [_normalize_text(a) for a in (clarification_answers or [])]
+    raw = json.dumps(
+        [_normalize_text(masked_query), car, answers, prompt_version, model],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _table_ready
+    os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(DB_PATH)
+    if not _table_ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_extraction_cache (
+                key TEXT PRIMARY KEY,
+                prompt_version TEXT,
+                model TEXT,
+                result_json TEXT NOT NULL,
+                hits INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+        _table_ready = True
+    return conn
+
+
+def _remember(key: str, result: dict[str, Any]) -> None:
+    with _lock:
+        _memory[key] = result
+        _memory.move_to_end(key)
+        while len(_memory) > EXTRACTION_CACHE_SIZE:
+            _memory.popitem(last=False)
+
+
+def _count_hit(key: str) -> bool:
+    """Учесть попадание в памяти; True — пора сбросить накопленное в SQLite."""
+    with _disk_lock:
+        _pending_hits[key] = _pending_hits.get(key, 0) + 1
+        return sum(_pending_hits.values()) >= EXTRACTION_CACHE_HITS_FLUSH
+
+
+def _get_memory(key: str) -> dict[str, Any] | None:
+    with _lock:
+        hit = _memory.get(key)
+        if hit is not None:
+            _memory.move_to_end(key)
+    if hit is None:
+        return None
+    metrics.incr("intent.cache.hit_memory")
+    return copy.deepcopy(hit)
+
+
+def _get_disk(key: str) -> dict[str, Any] | None:
+    """Только SELECT: попадание поднимается в память, счётчик hits — в _pending_hits."""
+    try:
+        conn = _get_conn()
+        try:
+            row = conn.execute("SELECT result_json FROM llm_extraction_cache WHERE key = ?", (key,)).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning("extraction cache read failed: %s", e)
+        return None
+    if not row:
+        metrics.incr("intent.cache.miss")
+        return None
+    try:
+        result = json.loads(row[0])
+    except json.JSONDecodeError:
+        return None
+    _remember(key, result)
+    metrics.incr("intent.cache.hit_db")
+    return copy.deepcopy(result)
+
+
+def get(key: str) -> dict[str, Any] | None:
+    """Результат из кэша (копия) или None."""
+    if not EXTRACTION_CACHE_ENABLED:
+        return None
+    result = _get_memory(key)
+    if result is None:
+        result = _get_disk(key)
+    if result is not None and _count_hit(key):
+        flush_hits()
+    return result
+
+
+async def aget(key: str) -> dict[str, Any] | None:
+    """Как get, но SQLite читается в отдельном потоке; накопленные hits сбрасываются в фоне."""
+    if not EXTRACTION_CACHE_ENABLED:
+        return None
+    result = _get_memory(key)
+    if result is None:
+        result = await asyncio.to_thread(_get_disk, key)
+    if result is not None and _count_hit(key):
+        asyncio.get_running_loop().run_in_executor(None, flush_hits)
+    return result
+
+
+def _flush_pending(conn: sqlite3.Connection) -> None:
+    """Записать накопленные попадания (без commit, под _disk_lock)."""
+    if _pending_hits:
+        conn.executemany(
+            "UPDATE llm_extraction_cache SET hits = hits + ? WHERE key = ?",
+            [(n, k) for k, n in _pending_hits.items()],
+        )
+        _pending_hits.clear()
+
+
+def flush_hits() -> None:
+    """Сохранить накопленные попадания в SQLite."""
+    with _disk_lock:
+        if not _pending_hits:
+            return
+        try:
+            conn = _get_conn()
+            try:
+                _flush_pending(conn)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning("extraction cache hits flush failed: %s", e)
+
+
+def _put_disk(key: str, result: dict[str, Any], prompt_version: str, model: str) -> None:
+    with _disk_lock:
+        try:
+            conn = _get_conn()
+            try:
+                conn.execute(
+                    """INSERT OR REPLACE INTO llm_extraction_cache (key, prompt_version, model, result_json)
+                       VALUES (?, ?, ?, ?)""",
+                    (key, prompt_version, model, json.dumps(result, ensure_ascii=False)),
+                )
+                _flush_pending(conn)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning("extraction cache write failed: %s", e)
+
+
+def put(key: str, result: dict[str, Any], prompt_version: str, model: str) -> None:
+    if not EXTRACTION_CACHE_ENABLED:
+        return
+    _remember(key, copy.deepcopy(result))
+    _put_disk(key, result, prompt_version, model)
+
+
+async def aput(key: str, result: dict[str, Any], prompt_version: str, model: str) -> None:
+    """Как put: в память сразу, в SQLite — в отдельном потоке."""
+    if not EXTRACTION_CACHE_ENABLED:
+        return
+    result = copy.deepcopy(result)
+    _remember(key, result)
+    await asyncio.to_thread(_put_disk, key, result, prompt_version, model)
+
+
+def invalidate(keep_version: str | None = None) -> None:
+    """
+    Сбросить кэш после смены версии промпта.
+    Записи keep_version (новой активной версии) в SQLite сохраняются — например, при откате на неё.
+    """
+    with _lock:
+        _memory.clear()
+    with _disk_lock:
+        _pending_hits.clear()
+    try:
+        conn = _get_conn()
+        try:
+            if keep_version is None:
+                conn.execute("DELETE FROM llm_extraction_cache")
+            else:
+                conn.execute("DELETE FROM llm_extraction_cache WHERE prompt_version != ?", (keep_version,))
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning("extraction cache invalidate failed: %s", e)
+    logger.info("Extraction cache invalidated (active version: %s)", keep_version or "-")
@@ -0,0 +1,310 @@
+"""
+Кэш ответов на общие вопросы (general_question): «как часто менять масло», «что такое ГРМ».
+Вопрос (с маскированием PII) индексируется TF-IDF по символьным n-граммам; похожий вопрос выше порога
+получает сохранённый ответ без генерации. Вопросы с маркой, моделью или годом не кэшируются и не ищутся:
+n-граммы почти не различают «camry 2008» и «camry 2015», а ответ для них разный.
+Ответы LLM живут FAQ_TTL_DAYS; записи оператора (scripts/faq_cache.py) не истекают и не перезаписываются.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from core import metrics
+from core.intent import get_nlu_lexicon
+from core.lexicon import KIND_BRAND, KIND_MODEL
+from core.text_similarity import TfidfIndex, normalize
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv("DB_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "parts.db"))
+FAQ_CACHE_ENABLED = os.getenv("FAQ_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Косинус TF-IDF, начиная с которого вопрос считается тем же (ниже — другой вопрос, идём в LLM)
+FAQ_SIMILARITY_THRESHOLD = float(os.getenv("FAQ_SIMILARITY_THRESHOLD", "0.8"))
+FAQ_TTL_DAYS = float(os.getenv("FAQ_TTL_DAYS", "30"))
+# Как часто перечитывать таблицу (правки оператора из другого процесса), сек
+FAQ_REFRESH_SECONDS = float(os.getenv("FAQ_REFRESH_SECONDS", "30"))
+# Длинные сообщения — не FAQ: в них почти всегда есть детали, меняющие ответ
+FAQ_MAX_QUESTION_CHARS = 200
+_YEAR_RE = re.compile(r"\b(19[5-9]\d|20\d{2})\b")
+
+SOURCE_LLM = "llm"
+SOURCE_OPERATOR = "operator"
+SOURCE_PREPOPULATED = "prepopulated"
+
+GENERAL_QUESTION_SYSTEM = (
+    "Ты — опытный автомеханик и эксперт по запчастям. Отвечаешь кратко и по делу на русском языке. "
+    "Если вопрос про подбор запчастей — предложи воспользоваться поиском по прайсу. "
+    "Не выдумывай цены и наличие — их ты не знаешь."
+)
+
+
+def question_key(text: str) -> str:
+    """Вопрос для индекса: нижний регистр, без пунктуации («Что такое ГРМ?» = «что такое грм»)."""
+    return normalize(re.sub(r"[^\w\s]+", " ", text or ""))
+
+
+def mentions_car(text: str) -> bool:
+    """В вопросе есть марка, модель или год — ответ про конкретную машину, а не FAQ."""
+    hits = get_nlu_lexicon().scan(text or "")
+    return hits.has(KIND_BRAND) or hits.has(KIND_MODEL) or bool(_YEAR_RE.search(text or ""))
+
+
+@dataclass(frozen=True)
+class FaqEntry:
+    id: int
+    question: str
+    answer: str
+    source: str
+    hits: int
+    expires_at: str | None
+
+
+class FaqCache:
+    """Записи faq_answers в памяти + индекс TF-IDF по вопросам; перестраивается при изменении таблицы."""
+
+    def __init__(
+        self,
+        db_path: str = DB_PATH,
+        threshold: float = FAQ_SIMILARITY_THRESHOLD,
+        ttl_days: float = FAQ_TTL_DAYS,
+    ) -> None:
+        self.db_path = db_path
+        self.threshold = threshold
+        self.ttl_days = ttl_days
+        self._entries: list[FaqEntry] = []
+        self._index = TfidfIndex([])
+        self._version: tuple | None = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS faq_answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question TEXT NOT NULL UNIQUE,
+                answer TEXT NOT NULL,
+                source TEXT NOT NULL DEFAULT 'llm',
+                hits INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP
+            )
+        """)
+        return conn
+
+    @staticmethod
+    def _table_version(conn: sqlite3.Connection) -> tuple:
+        return conn.execute("SELECT COUNT(*), MAX(id), MAX(updated_at) FROM faq_answers").fetchone()
+
+    def load(self) -> int:
+        """Перечитать неистёкшие записи и перестроить индекс. Возвращает число записей."""
+        conn = self._connect()
+        try:
+            version = self._table_version(conn)
+            rows = conn.execute(
+                """SELECT id, question, answer, source, hits, expires_at FROM faq_answers
+                   WHERE expires_at IS NULL OR expires_at > datetime('now')
+                   ORDER BY id"""
+            ).fetchall()
+        finally:
+            conn.close()
+        entries = [FaqEntry(*row) for row in rows]
+        index = TfidfIndex([e.question for e in entries])
+        with self._lock:
+            self._entries, self._index, self._version = entries, index, version
+            self._last_check = time.monotonic()
+        metrics.set_gauge("faq.entries", len(entries))
+        return len(entries)
+
+    def _maybe_reload(self) -> None:
+        if self._version is not None and time.monotonic() - self._last_check < FAQ_REFRESH_SECONDS:
+            return
+        conn = self._connect()
+        try:
+            version = self._table_version(conn)
+        finally:
+            conn.close()
+        if version != self._version:
+            self.load()
+        else:
+            self._last_check = time.monotonic()
+
+    def lookup(self, question: str, count_hit: bool = True) -> tuple[FaqEntry, float] | None:
+        """
+        Самая похожая запись не ниже порога и не истёкшая — (запись, косинус), иначе None.
+        Вопрос про конкретную машину — всегда None (счётчик faq.skipped, не промах).
+        count_hit=False — только проверить (без счётчиков и hits), для скриптов.
+        """
+        q = question_key(question)
+        if not q or len(q) > FAQ_MAX_QUESTION_CHARS:
+            return None
+        if mentions_car(q):
+            if count_hit:
+                metrics.incr("faq.skipped")
+            return None
+        try:
+            self._maybe_reload()
+        except sqlite3.Error as e:
+            logger.warning("faq cache reload failed: %s", e)
+        with self._lock:
+            entries, index = self._entries, self._index
+        best = index.most_similar(q, k=1, min_score=self.threshold)
+        if not best:
+            if count_hit:
+                metrics.incr("faq.miss")
+            return None
+        entry, score = entries[best[0][0]], best[0][1]
+        if not count_hit:
+            return entry, score
+        metrics.incr("faq.hit")
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("UPDATE faq_answers SET hits = hits + 1 WHERE id = ?", (entry.id,))
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning("faq hit update failed: %s", e)
+        return entry, score
+
+    def store(self, question: str, answer: str, source: str = SOURCE_LLM) -> None:
+        """
+        Сохранить ответ LLM на вопрос (с TTL). Запись оператора с тем же вопросом не трогается.
+        Вопрос про конкретную машину не сохраняется.
+        """
+        q, answer = question_key(question), (answer or "").strip()
+        if not q or not answer or len(q) > FAQ_MAX_QUESTION_CHARS or mentions_car(q):
+            return
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    """INSERT INTO faq_answers (question, answer, source, expires_at)
+                       VALUES (?, ?, ?, datetime('now', ?))
+                       ON CONFLICT(question) DO UPDATE SET
+                           answer = excluded.answer, source = excluded.source,
+                           updated_at = CURRENT_TIMESTAMP, expires_at = excluded.expires_at
+                       WHERE faq_answers.source != 'operator'""",
+                    (q, answer, source, f"+{self.ttl_days:g} days"),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning("faq store failed: %s", e)
+            return
+        metrics.incr("faq.stored")
+        self.load()
+
+    # --- правки оператора ---
+
+    def put_operator(self, question: str, answer: str) -> int:
+        """Добавить или заменить ответ оператора: без TTL, LLM его не перезапишет. Возвращает id."""
+        q = question_key(question)
+        if not q or not (answer or "").strip():
+            raise ValueError("question and answer must not be empty")
+        conn = self._connect()
+        try:
+            conn.execute(
+                """INSERT INTO faq_answers (question, answer, source, expires_at) VALUES (?, ?, 'operator', NULL)
+                   ON CONFLICT(question) DO UPDATE SET
+                       answer = excluded.answer, source = 'operator',
+                       updated_at = CURRENT_TIMESTAMP, expires_at = NULL""",
+                (q, answer.strip()),
+            )
+            conn.commit()
+            entry_id = conn.execute("SELECT id FROM faq_answers WHERE question = ?", (q,)).fetchone()[0]
+        finally:
+            conn.close()
+        self.load()
+        return entry_id
+
+    def edit(self, entry_id: int, answer: str) -> bool:
+        """Исправить ответ записи: она становится записью оператора (без TTL)."""
+        conn = self._connect()
+        try:
+            cur = conn.execute(
+                """UPDATE faq_answers SET answer = ?, source = 'operator', updated_at = CURRENT_TIMESTAMP,
+                          expires_at = NULL
+                   WHERE id = ?""",
+                (answer.strip(), entry_id),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        self.load()
+        return cur.rowcount > 0
+
+    def delete(self, entry_id: int) -> bool:
+        conn = self._connect()
+        try:
+            cur = conn.execute("DELETE FROM faq_answers WHERE id = ?", (entry_id,))
+            conn.commit()
+        finally:
+            conn.close()
+        self.load()
+        return cur.rowcount > 0
+
+    def purge_expired(self) -> int:
+        conn = self._connect()
+        try:
+            cur = conn.execute("DELETE FROM faq_answers WHERE expires_at IS NOT NULL AND expires_at <= datetime('now')")
+            conn.commit()
+        finally:
+            conn.close()
+        self.load()
+        return cur.rowcount
+
+    def all_entries(self, include_expired: bool = False) -> list[FaqEntry]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"""SELECT id, question, answer, source, hits, expires_at FROM faq_answers
+                    {"" if include_expired else "WHERE expires_at IS NULL OR expires_at > datetime('now')"}
+                    ORDER BY hits DESC, id"""
+            ).fetchall()
+        finally:
+            conn.close()
+        return [FaqEntry(*row) for row in rows]
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": metrics.get_counter("faq.hit"),
+            "misses": metrics.get_counter("faq.miss"),
+            "skipped": metrics.get_counter("faq.skipped"),
+            "hit_rate": metrics.ratio("faq.hit", "faq.hit", "faq.miss"),
+        }
+
+
+_cache: FaqCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_faq_cache() -> FaqCache | None:
+    """Общий кэш (загружается при первом обращении); FAQ_CACHE_ENABLED=false — None."""
+    global _cache
+    if not FAQ_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            cache = FaqCache()
+            try:
+                cache.load()
+            except sqlite3.Error as e:
+                logger.warning("faq cache not loaded: %s", e)
+            _cache = cache
+        return _cache
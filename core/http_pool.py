@@ -0,0 +1,49 @@
+"""Общий на процесс httpx.AsyncClient с keep-alive для всех вызовов Ollama."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_POOL_MAX_CONNECTIONS = int(os.getenv("OLLAMA_POOL_MAX_CONNECTIONS", "10"))
+OLLAMA_POOL_MAX_KEEPALIVE = int(os.getenv("OLLAMA_POOL_MAX_KEEPALIVE", "5"))
+OLLAMA_POOL_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_POOL_KEEPALIVE_EXPIRY", "120"))
+# Таймаут по умолчанию; вызовы передают свой timeout= на каждый запрос
+OLLAMA_POOL_DEFAULT_TIMEOUT = float(os.getenv("OLLAMA_POOL_DEFAULT_TIMEOUT", "60"))
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Пул соединений живёт весь процесс: нет TCP-рукопожатия на каждый вызов LLM.
+    Соединения привязаны к event loop — при запуске в новом loop (скрипты) клиент пересоздаётся.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=OLLAMA_POOL_DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=OLLAMA_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=OLLAMA_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=OLLAMA_POOL_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _client_loop = loop
+        logger.debug("HTTP pool created (max_connections=%d)", OLLAMA_POOL_MAX_CONNECTIONS)
+    return _client
+
+
+async def close_http_client() -> None:
+    """Закрыть пул (shutdown бота/сервиса)."""
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
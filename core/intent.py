@@ -3,13 +3,29 @@ from __future__ import annotations
 
 import json
 import logging
+import os
 import re
+import time
 from typing import Any
 
+from core import extraction_cache, metrics
+from core.circuit_breaker import CircuitOpen
+from core.intent_classifier import INTENT_CLASSIFIER_THRESHOLD, get_intent_classifier
+from core.lexicon import KIND_BRAND, KIND_MODEL, PREFIX, WORD, Lexicon, add_vehicle_terms, load_vehicle_catalog
+from core.llm_admission import PRIORITY_CLARIFICATION, PRIORITY_NEW_QUERY, LLMSaturated
+from core.logger import log_event
 from core.pii_masker import mask_pii
 
 logger = logging.getLogger(__name__)
 
+# Уверенность rule-based разбора, начиная с которой LLM не вызывается (>1 — fast path выключен)
+RULE_FASTPATH_THRESHOLD = float(os.getenv("RULE_FASTPATH_THRESHOLD", "0.85"))
+# Марки/модели для словаря rule-based разбора (demo-data/vehicle_catalog.csv; нет файла — встроенные марки)
+VEHICLE_CATALOG_PATH = os.getenv(
+    "VEHICLE_CATALOG_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "demo-data", "vehicle_catalog.csv"),
+)
+
 FALLBACK_RESULT = {
     "intent": "parts_search",
     "part_query": "",
@@ -28,6 +44,13 @@ def _parse_llm_response(raw: str) -> dict[str, Any]:
     """Надёжный парсинг JSON из ответа LLM."""
     if not raw or not isinstance(raw, str):
         return {}
+    # JSON-режим (format: "json") отдаёт чистый объект — регулярки не нужны
+    try:
+        result = json.loads(raw)
+        if isinstance(result, dict):
+            return result
+    except json.JSONDecodeError:
+        pass
     text = raw.strip()
     text = re.sub(r"^```json\s*", "", text, flags=re.MULTILINE)
     text = re.sub(r"^```\s*", "", text, flags=re.MULTILINE)
@@ -47,6 +70,7 @@ def _parse_llm_response(raw: str) -> dict[str, Any]:
                 return result
         except json.JSONDecodeError:
             pass
+    metrics.incr("intent.parse_failed")
     logger.warning("Не удалось распарсить ответ LLM: %s", text[:200] if text else "(empty)")
     return {}
 
@@ -60,14 +84,33 @@ try:
 except ImportError:
     get_prompt_manager = None
 
+from core.llm_adapter import TASK_CLARIFICATION, TASK_EXTRACTION, model_for_task
+
 
 async def extract_intent_and_slots(
     query: str,
     car_context: dict[str, Any] | None = None,
     clarification_answers: list[str] | None = None,
+    priority: int = PRIORITY_NEW_QUERY,
 ) -> dict[str, Any]:
-    """Вызвать LLM (Ollama) для извлечения intent и слотов."""
+    """
+    Вызвать LLM (Ollama) для извлечения intent и слотов.
+    priority — место в очереди допуска к LLM (ответы на уточнения раньше новых запросов).
+    """
     masked = mask_pii(query)
+
+    rule_result, confidence = rule_extract(masked, car_context, clarification_answers)
+    if confidence >= RULE_FASTPATH_THRESHOLD:
+        _record_path("rules", rule_result, confidence)
+        return rule_result
+
+    # Вторая ступень: обученный классификатор (уточнения — только через LLM, там важен весь контекст)
+    if not clarification_answers:
+        classified = _classifier_extract(masked, rule_result)
+        if classified is not None:
+            _record_path("classifier", classified, confidence)
+            return classified
+
     context_str = ""
     if car_context:
         context_str = f"\nКонтекст авто: {car_context}"
@@ -77,17 +120,49 @@ async def extract_intent_and_slots(
     full_query = f"Запрос пользователя: {masked}{context_str}"
 
     system_prompt = "Ты — эксперт по автозапчастям. Извлекаешь intent и слоты. Отвечай только JSON."
+    prompt_version = "builtin"
     if get_prompt_manager:
-        system_prompt, _ = get_prompt_manager().get_active_prompt()
+        system_prompt, prompt_version = get_prompt_manager().get_active_prompt(query=masked)
+
+    # Короткий структурированный разбор — на малую модель (TASK_MODELS)
+    task = TASK_CLARIFICATION if clarification_answers else TASK_EXTRACTION
+    model_name = model_for_task(task)
+    cache_key = extraction_cache.make_cache_key(
+        masked, car_context, clarification_answers, prompt_version, model_name
+    )
+    cached = await extraction_cache.aget(cache_key)
+    if cached is not None:
+        _record_path("cache", cached, confidence)
+        return cached
 
     try:
-        raw = await llm_generate(prompt=full_query, system=system_prompt, timeout=45)
+        raw = await llm_generate(
+            prompt=full_query,
+            system=system_prompt,
+            timeout=45,
+            priority=priority,
+            json_mode=True,
+            prompt_version=prompt_version,
+            task=task,
+        )
+    except CircuitOpen as e:
+        metrics.incr("intent.fallback.circuit_open")
+        logger.info("LLM circuit открыт (%s). Используем rule-based fallback.", e)
+        _record_path("fallback", rule_result, confidence)
+        return _fallback_extract(query, car_context, clarification_answers)
+    except LLMSaturated as e:
+        metrics.incr("intent.fallback.saturated")
+        logger.warning("Очередь LLM переполнена: %s. Используем rule-based fallback.", e)
+        _record_path("fallback", rule_result, confidence)
+        return _fallback_extract(query, car_context, clarification_answers)
     except Exception as e:
         logger.warning("Ollama недоступна: %s. Используем rule-based fallback.", e)
+        _record_path("fallback", rule_result, confidence)
         return _fallback_extract(query, car_context, clarification_answers)
 
     raw = str(raw).strip() if raw else ""
     result = _parse_llm_response(raw)
+    parsed_ok = bool(result)
     if not result:
         result = dict(FALLBACK_RESULT)
         result["part_query"] = query
@@ -119,11 +194,242 @@ async def extract_intent_and_slots(
         if fallback_questions:
             result["questions"] = fallback_questions[:2]
 
+    # Кэшируем только осмысленный ответ LLM; заглушку при ошибке парсинга — нет
+    if parsed_ok:
+        await extraction_cache.aput(cache_key, result, prompt_version, model_name)
+    _record_path("llm", result, confidence, rule_intent=rule_result.get("intent"))
     return result
 
 
+def _classifier_extract(query: str, rule_result: dict[str, Any]) -> dict[str, Any] | None:
+    """
+    intent и part_type от локального классификатора, авто и артикул — из rule-based разбора.
+    None — классификатора нет, у головы intent один класс (вероятность всегда 1.0) или он не уверен
+    (intent или part_type ниже INTENT_CLASSIFIER_THRESHOLD).
+    """
+    clf = get_intent_classifier()
+    if clf is None or len(clf.heads["intent"].classes) < 2:
+        return None
+    started = time.perf_counter()
+    pred = clf.predict(query)
+    metrics.observe("intent.classifier_ms", (time.perf_counter() - started) * 1000)
+    intent, prob = pred["intent"]
+    if prob < INTENT_CLASSIFIER_THRESHOLD:
+        return None
+    result = dict(rule_result)
+    result["intent"] = intent
+    if intent == "general_question":
+        result.update(part_query=query, part_type="", missing_critical=[], questions=[], summary="Общий вопрос")
+        return result
+    part_type, part_prob = pred.get("part_type") or ("", 0.0)
+    if not part_type or part_prob < INTENT_CLASSIFIER_THRESHOLD:
+        return None
+    result.update(part_type=part_type, part_query=part_type, summary=f"Подбираю {part_type}.")
+    car = result.get("car_context") or {}
+    if car.get("brand") or car.get("model") or result.get("article"):
+        result.update(missing_critical=[], questions=[])
+    else:
+        result["missing_critical"] = ["brand", "model"]
+        result["questions"] = [{"id": "q1", "text": "Для точного подбора укажите: марка, модель и год автомобиля?"}]
+    return result
+
+
+# Слоты, которые дозаполняются из ответа на уточнение без полного разбора, и их описание для LLM
+FILLABLE_SLOTS = {
+    "brand": "марка автомобиля",
+    "model": "модель автомобиля",
+    "year": "год выпуска (число)",
+    "part_type": "название детали",
+}
+SLOT_FILL_SYSTEM = (
+    "Ты извлекаешь из ответа пользователя только перечисленные поля. "
+    "Отвечай только JSON-объектом с этими ключами; если поля в ответе нет — null."
+)
+
+
+def _unfilled_slots(missing: list[str], car: dict[str, Any], part_type: str | None) -> list[str]:
+    """Что из missing ещё не известно. Марка или модель — достаточно одной (как в rule-based разборе)."""
+    remaining = []
+    for slot in missing:
+        if slot in ("brand", "model"):
+            known = car.get("brand") or car.get("model")
+        elif slot == "part_type":
+            known = part_type
+        else:
+            known = car.get(slot)
+        if not known:
+            remaining.append(slot)
+    return remaining
+
+
+async def _llm_fill_slots(answer: str, slots: list[str], priority: int) -> dict[str, str]:
+    """Короткий промпт к малой модели только по недостающим полям; ошибка LLM — пустой результат."""
+    fields = "\n".join(f"- {slot}: {FILLABLE_SLOTS[slot]}" for slot in slots)
+    try:
+        raw = await llm_generate(
+            prompt=f"Поля:\n{fields}\nОтвет пользователя: {answer}",
+            system=SLOT_FILL_SYSTEM,
+            timeout=20,
+            priority=priority,
+            json_mode=True,
+            prompt_version="slot_fill",
+            task=TASK_CLARIFICATION,
+        )
+    except Exception as e:
+        logger.info("Дозаполнение слотов через LLM не удалось: %s", e)
+        return {}
+    parsed = _parse_llm_response(str(raw or ""))
+    filled = {}
+    for slot in slots:
+        value = parsed.get(slot)
+        if isinstance(value, bool) or not isinstance(value, (str, int)):
+            continue  # null, списки и объекты вместо значения — поле не заполнено
+        value = str(value).strip()
+        if value and value.lower() not in ("null", "none"):
+            filled[slot] = value
+    if "year" in filled and not re.fullmatch(r"(19|20)\d{2}", filled["year"]):
+        del filled["year"]
+    return filled
+
+
+async def fill_missing_slots(
+    last_result: dict[str, Any] | None,
+    answer: str,
+    car_context: dict[str, Any] | None = None,
+    priority: int = PRIORITY_CLARIFICATION,
+) -> dict[str, Any] | None:
+    """
+    Ответ на уточнение («Kia Rio 2017») — дозаполнить только недостающие слоты прошлого разбора
+    (missing_critical в last_result) вместо полного извлечения: сначала правила (авто из текста,
+    синонимы деталей), остальное — коротким промптом к малой модели.
+    None — дозаполнить нельзя (не только авто/деталь, ответ похож на новый запрос, поля не нашлись):
+    нужен полный разбор extract_intent_and_slots.
+    """
+    missing = [s for s in (last_result or {}).get("missing_critical") or [] if s]
+    if not missing or any(s not in FILLABLE_SLOTS for s in missing):
+        return None
+    masked = mask_pii(answer)
+    car = {k: v for k, v in {**(car_context or {}), **(last_result.get("car_context") or {})}.items() if v}
+
+    hits = get_nlu_lexicon().scan(masked)
+    part_hit = hits.best("part_type")
+    if part_hit and "part_type" not in missing and part_hit.value != last_result.get("part_type"):
+        return None  # в ответе другая деталь — это новый запрос
+    part_type = part_hit.value if part_hit and "part_type" in missing else None
+    for k, v in _extract_car_from_text(masked).items():
+        if v and not car.get(k):
+            car[k] = v
+
+    path = "slot_fill"
+    remaining = _unfilled_slots(missing, car, part_type)
+    if remaining:
+        filled = await _llm_fill_slots(masked, remaining, priority)
+        part_type = filled.pop("part_type", None) or part_type
+        car.update(filled)
+        if _unfilled_slots(missing, car, part_type):
+            metrics.incr("intent.slot_fill.miss")
+            return None
+        path = "slot_fill_llm"
+
+    result = {**last_result, "car_context": car, "missing_critical": [], "questions": []}
+    if part_type:
+        result.update(part_type=part_type, part_query=part_type, summary=f"Подбираю {part_type}.")
+    _record_path(path, result, 0.0, filled=sorted(missing))
+    return result
+
+
+def _record_path(path: str, result: dict[str, Any], confidence: float, **extra: Any) -> None:
+    """Какой путь выбран (rules/classifier/cache/llm/fallback/slot_fill…) — для подбора порогов."""
+    metrics.incr(f"intent.path.{path}")
+    log_event(
+        "intent_path",
+        {"path": path, "intent": result.get("intent"), "rule_confidence": round(confidence, 2), **extra},
+    )
+
+
+def llm_avoidance_rate() -> float:
+    """Доля извлечений, обошедшихся без вызова LLM (rule fast path, классификатор, кэш, дозаполнение правилами)."""
+    paths = (
+        "intent.path.rules",
+        "intent.path.classifier",
+        "intent.path.cache",
+        "intent.path.slot_fill",
+        "intent.path.llm",
+        "intent.path.slot_fill_llm",
+        "intent.path.fallback",
+    )
+    return sum(metrics.ratio(p, *paths) for p in paths[:4])
+
+
+# Разговорные названия деталей → нормализованный part_type
+PART_TYPE_SYNONYMS = {
+    "колодк": "тормозные колодки",
+    "тормоз": "тормозные колодки",
+    "тормоза": "тормозные колодки",
+    "фильтр масл": "масляный фильтр",
+    "масляник": "масляный фильтр",
+    "масляный фильтр": "масляный фильтр",
+    "масл": "масляный фильтр",
+    "фильтр воздуш": "воздушный фильтр",
+    "грм": "комплект ГРМ",
+    "свеч": "свечи зажигания",
+    "ходовк": "подвеска",
+    "ходовая": "подвеска",
+    "расходник": "расходные материалы",
+}
+# Общие основы: «тормоз» есть и в «тормозных дисках», «масл» — и в «моторном масле».
+# Деталь по ним угадывается, но для разбора без LLM этого мало
+GENERIC_PART_STEMS = frozenset({"тормоз", "тормоза", "масл", "ходовк", "ходовая", "расходник"})
+# general_question — приветствия, вопросы про бота, общие вопросы про авто
+# (приветствия — отдельно, GREETING_TERMS: общим вопросом считаются, только если нет детали и авто)
+GENERAL_TRIGGERS = (
+    "как ты", "что умеешь", "что можешь", "ии работа", "бот работа",
+    "как работаешь", "помощь", "помоги", "подскажи",
+    "как часто", "что такое грм", "что такое дроссель", "что такое",
+)
+# Признаки подбора детали (вместе с маркой/моделью или «для/на» — не общий вопрос)
+PARTS_SEARCH_PATTERNS = ("колодк", "фильтр", "свеч", "стойк", "артикул", "oem")
+PARTS_SEARCH_CONTEXT = ("для", "на ", "подбор")
+# Названа деталь — без уточнения «что именно нужно»
+PART_WORDS = ("колодк", "тормоз", "фильтр", "свеч", "грм", "масл", "диск", "стойк", "аморт")
+# Приветствия и благодарности: короткие — целым словом («хай», но не «хайлендер»), остальные — с начала слова
+GREETING_TERMS = (
+    ("привет", PREFIX), ("здравствуй", PREFIX), ("здрасьте", WORD), ("добрый", WORD), ("доброе", WORD),
+    ("хай", WORD), ("салют", WORD), ("спасибо", WORD), ("благодар", PREFIX),
+)
+
+_lexicon: Lexicon | None = None
+
+
+def get_nlu_lexicon() -> Lexicon:
+    """Словарь rule-based разбора: синонимы деталей, триггеры, марки и модели — один проход по сообщению."""
+    global _lexicon
+    if _lexicon is None:
+        lexicon = Lexicon()
+        for text, part_type in PART_TYPE_SYNONYMS.items():
+            lexicon.add(text, "part_type", part_type)
+        lexicon.add_many(GENERAL_TRIGGERS, "general")
+        lexicon.add_many(PARTS_SEARCH_PATTERNS, "parts_search")
+        lexicon.add_many(PARTS_SEARCH_CONTEXT, "parts_context")
+        lexicon.add_many(PART_WORDS, "part_word")
+        for text, mode in GREETING_TERMS:
+            lexicon.add(text, "greeting", mode=mode)
+        add_vehicle_terms(lexicon, load_vehicle_catalog(VEHICLE_CATALOG_PATH))
+        lexicon.build()
+        _lexicon = lexicon
+    return _lexicon
+
+
+def _mentions_parts(hits) -> bool:
+    """В сообщении есть деталь, признак подбора, марка или модель."""
+    return any(hits.has(kind) for kind in ("part_type", "part_word", "parts_search", KIND_BRAND, KIND_MODEL))
+
+
 def _extract_car_from_text(text: str) -> dict[str, str | None]:
-    """Извлекает brand, model, year из текста: 'Kia Rio 2017', '1. Kia, Rio, 2017'."""
+    """
+    Извлекает brand, model, year из текста: 'Kia Rio 2017', '1. Kia, Rio, 2017', 'камри 2015'.
+    Марка и модель — по словарю (каноническое написание); модель не из каталога — слово после марки.
+    """
     if not text or not text.strip():
         return {}
     t = re.sub(r"^\d+\.\s*", "", text.strip())
@@ -132,30 +438,15 @@ def _extract_car_from_text(text: str) -> dict[str, str | None]:
     year_m = re.search(r"\b(19|20)\d{2}\b", t)
     if year_m:
         car["year"] = year_m.group(0)
-    brands = (
-        "kia toyota hyundai honda nissan mazda ford vw volkswagen bmw mercedes audi skoda "
-        "renault chevrolet mitsubishi suzuki lexus infiniti opel peugeot citroen fiat lada daewoo"
-    ).split()
-    # Regex "Brand Model Year" — надёжнее для "Kia Rio 2017"
-    brand_model_year = re.search(
-        r"([a-zа-яё]+)\s+([a-zа-яё0-9]+)\s+(19|20)\d{2}\b",
-        t,
-        re.IGNORECASE,
-    )
-    if brand_model_year:
-        b, m = brand_model_year.group(1), brand_model_year.group(2)
-        if b.lower() in brands:
-            car["brand"] = b
-            car["model"] = m
-    if not car.get("brand"):
-        words = t.split()
-        for i, w in enumerate(words):
-            wl = w.lower()
-            if wl in brands:
-                car["brand"] = w
-                if i + 1 < len(words) and not re.match(r"^\d{4}$", words[i + 1]):
-                    car["model"] = words[i + 1]
-                break
+    hits = get_nlu_lexicon().scan(t)
+    brand, model = hits.first(KIND_BRAND), hits.first(KIND_MODEL)
+    if model and (not brand or model.value[0] == brand.value):
+        car["brand"], car["model"] = model.value
+    elif brand:
+        car["brand"] = brand.value
+        next_word = re.match(r"\s+(\S+)", t[brand.end:])
+        if next_word and not re.match(r"^\d{4}$", next_word.group(1)):
+            car["model"] = next_word.group(1)
     return car
 
 
@@ -166,6 +457,7 @@ def _fallback_extract(
 ) -> dict[str, Any]:
     """Rule-based извлечение при недоступности LLM."""
     q = (query or "").lower().strip()
+    hits = get_nlu_lexicon().scan(q)
     car = dict(car_context or {})
     # Извлекаем авто из запроса и ответов на уточнения
     for src in [query] + (clarification_answers or []):
@@ -174,20 +466,12 @@ def _fallback_extract(
             if v and not car.get(k):
                 car[k] = v
     sku = extract_sku_from_message(query or "")
-    # general_question — приветствия, вопросы про бота, общие вопросы про авто
-    general_triggers = [
-        "привет", "здравствуй", "хай", "салют", "спасибо", "благодарю",
-        "как ты", "что умеешь", "что можешь", "ии работа", "бот работа",
-        "как работаешь", "помощь", "помоги", "подскажи",
-        "как часто", "что такое грм", "что такое дроссель", "что такое",
-    ]
-    q_lower = (query or "").lower().strip()
     # Короткие общие вопросы без артикула — general_question
-    parts_search_patterns = ["колодк", "фильтр", "свеч", "стойк", "артикул", "oem"]
-    looks_like_parts_search = any(p in q_lower for p in parts_search_patterns) and any(
-        c in q_lower for c in ["camry", "rio", "kia", "toyota", "веста", "для", "на ", "подбор"]
+    looks_like_parts_search = hits.has("parts_search") and (
+        hits.has("parts_context") or hits.has(KIND_BRAND) or hits.has(KIND_MODEL)
     )
-    if any(t in q_lower for t in general_triggers) and not sku and len(q_lower) < 80 and not looks_like_parts_search:
+    greeting_only = hits.has("greeting") and not _mentions_parts(hits)
+    if (hits.has("general") or greeting_only) and not sku and len(q) < 80 and not looks_like_parts_search:
         return {
             "intent": "general_question",
             "part_query": query,
@@ -210,34 +494,17 @@ def _fallback_extract(
         "questions": [],
         "summary": f"Ищу: {query[:50]}" if query else "Уточните запрос",
     }
-    synonyms = {
-        "колодк": "тормозные колодки",
-        "тормоз": "тормозные колодки",
-        "тормоза": "тормозные колодки",
-        "фильтр масл": "масляный фильтр",
-        "масляник": "масляный фильтр",
-        "масляный фильтр": "масляный фильтр",
-        "масл": "масляный фильтр",
-        "фильтр воздуш": "воздушный фильтр",
-        "грм": "комплект ГРМ",
-        "свеч": "свечи зажигания",
-        "ходовк": "подвеска",
-        "ходовая": "подвеска",
-        "расходник": "расходные материалы",
-    }
-    for k, v in synonyms.items():
-        if k in q:
-            result["part_type"] = v
-            result["part_query"] = v  # для поиска в прайсе
-            break
+    part_type = hits.best("part_type")  # при нескольких — первый по порядку PART_TYPE_SYNONYMS
+    if part_type:
+        result["part_type"] = part_type.value
+        result["part_query"] = part_type.value  # для поиска в прайсе
     if not car.get("brand") and not car.get("model") and not sku:
         result["missing_critical"] = ["brand", "model"]
         result["questions"] = [
             {"id": "q1", "text": "Для точного подбора укажите: марка, модель и год автомобиля?"},
         ]
     # Есть авто, но не указана деталь — спросить
-    part_synonyms = ["колодк", "тормоз", "фильтр", "свеч", "грм", "масл", "диск", "стойк", "аморт"]
-    has_part = any(p in q for p in part_synonyms) or sku
+    has_part = hits.has("part_word") or sku
     if car.get("brand") and not has_part:
         result["missing_critical"] = list(result.get("missing_critical", [])) + ["part_type"]
         if not result.get("questions"):
@@ -247,11 +514,99 @@ def _fallback_extract(
     return result
 
 
+# Слова, которые обычно окружают артикул и не меняют смысл запроса
+SKU_FILLER_WORDS = {
+    "артикул", "арт", "oem", "оем", "оe", "oe", "номер", "код", "каталожный", "оригинал", "есть", "ли",
+    "в", "наличии", "наличие", "цена", "сколько", "стоит", "нужен", "нужна", "нужно", "ищу", "найди",
+    "найти", "подбери", "по", "на", "для", "пожалуйста",
+}
+
+
+def _looks_like_article(sku: str | None) -> bool:
+    """Похоже на артикул/OEM, а не на слово: есть цифры и хотя бы 5 значимых символов."""
+    if not sku:
+        return False
+    compact = re.sub(r"[^A-Za-z0-9]", "", sku)
+    return len(compact) >= 5 and any(c.isdigit() for c in compact)
+
+
+def _find_article(query: str) -> str | None:
+    sku = extract_sku_from_message(query or "")
+    return sku if _looks_like_article(sku) else None
+
+
+def _specific_part_match(query: str) -> bool:
+    """Деталь названа однозначно: синоним не из GENERIC_PART_STEMS, совпавший с начала слова («колодки», не «подколодки»)."""
+    hits = get_nlu_lexicon().scan(query)
+    match = hits.best("part_type")
+    if match is None or match.term.text in GENERIC_PART_STEMS:
+        return False
+    return match.start == 0 or not query[match.start - 1].isalnum()
+
+
+def _rule_confidence(query: str, result: dict[str, Any]) -> float:
+    """Оценка уверенности rule-based разбора (0..1)."""
+    q = (query or "").lower().strip()
+    if not q:
+        return 0.0
+    words = re.findall(r"[a-zа-яё]+", q)
+    if result.get("intent") == "general_question":
+        # Короткое приветствие/благодарность без детали и авто — однозначно; «привет, нужны колодки»
+        # и «что такое …» оставляем классификатору/LLM
+        hits = get_nlu_lexicon().scan(q)
+        if len(words) <= 3 and hits.has("greeting") and not _mentions_parts(hits):
+            return 0.95
+        return 0.5
+
+    sku = _find_article(query)
+    if sku:
+        rest = [w for w in words if w not in SKU_FILLER_WORDS and w not in sku.lower()]
+        return 0.95 if len(rest) <= 1 else 0.7
+
+    car = result.get("car_context") or {}
+    has_part = result.get("part_type") in PART_TYPE_SYNONYMS.values()
+    # Быстрый путь без LLM — только при однозначно названной детали; общая основа остаётся ниже порога
+    specific = has_part and _specific_part_match(q)
+    if specific and car.get("brand") and car.get("model") and car.get("year"):
+        return 0.9
+    if specific and car.get("brand") and car.get("model"):
+        return 0.8
+    if has_part:
+        return 0.6
+    return 0.3
+
+
+def rule_extract(
+    query: str,
+    car_context: dict[str, Any] | None = None,
+    clarification_answers: list[str] | None = None,
+) -> tuple[dict[str, Any], float]:
+    """
+    Первая ступень: rule-based разбор и его уверенность.
+    Выше RULE_FASTPATH_THRESHOLD результат используется без LLM (артикул, «Kia Rio 2017 колодки», приветствие).
+    """
+    result = _fallback_extract(query, car_context, clarification_answers)
+    confidence = _rule_confidence(query, result)
+    sku = _find_article(query)
+    if result.get("intent") == "parts_search" and sku and confidence >= 0.9:
+        # Запрос по артикулу: ищем по самому артикулу, а не по тексту сообщения
+        if result.get("part_type") not in PART_TYPE_SYNONYMS.values():
+            result["part_type"] = ""
+            result["part_query"] = sku
+        result["summary"] = f"Ищу по артикулу {sku}"
+    return result, confidence
+
+
+_SKU_RE = re.compile(
+    r"\b([A-Z0-9]{4,}[-][A-Z0-9]+|[0-9]{4,}[-][0-9]+|[A-Z0-9]{5,})\b",
+    re.IGNORECASE,
+)
+
+
 def extract_sku_from_message(message: str) -> str | None:
-    """Извлекает артикул/OEM из сообщения."""
-    m = re.search(
-        r"\b([A-Z0-9]{4,}[-][A-Z0-9]+|[0-9]{4,}[-][0-9]+|[A-Z0-9]{5,})\b",
-        message,
-        re.IGNORECASE,
-    )
-    return m.group(0) if m else None
+    """Извлекает артикул/OEM из сообщения. Кандидат с цифрами важнее слова («Toyota 04152-YZZA1»)."""
+    candidates = [m.group(0) for m in _SKU_RE.finditer(message)]
+    for c in candidates:
+        if _looks_like_article(c):
+            return c
+    return candidates[0] if candidates else None
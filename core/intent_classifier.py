@@ -0,0 +1,260 @@
+"""
+Локальный классификатор intent и part_type: логистическая регрессия (softmax) по символьным n-граммам.
+Обучается офлайн на dialogue_cycles и общих вопросах из debug_logs (scripts/train_intent_classifier.py),
+артефакт — JSON. Голова intent с одним классом всегда уверена на 100% — такую не обучаем и не загружаем.
+Предсказание — словарные суммы по ~100 n-граммам запроса, доли миллисекунды на CPU без numpy.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import random
+import time
+from collections import Counter
+from typing import Any
+
+from core.text_similarity import NGRAM_SIZES, char_ngrams
+
+logger = logging.getLogger(__name__)
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTENT_CLASSIFIER_PATH = os.getenv(
+    "INTENT_CLASSIFIER_PATH", os.path.join(_root, "data", "models", "intent_classifier.json")
+)
+# Уверенность (softmax), начиная с которой ответ классификатора используется без LLM
+INTENT_CLASSIFIER_THRESHOLD = float(os.getenv("INTENT_CLASSIFIER_THRESHOLD", "0.8"))
+
+ARTIFACT_VERSION = 1
+
+
+def featurize(text: str, sizes: tuple[int, ...] = NGRAM_SIZES) -> dict[str, float]:
+    """Бинарные признаки n-грамм, нормированные по L2 (длина запроса не влияет на масштаб)."""
+    grams = char_ngrams(text, sizes)
+    if not grams:
+        return {}
+    value = 1.0 / math.sqrt(len(grams))
+    return {g: value for g in grams}
+
+
+def _softmax(scores: list[float]) -> list[float]:
+    top = max(scores)
+    exps = [math.exp(s - top) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+class LinearHead:
+    """Одна голова: классы, смещения и веса признак → вектор по классам (хранятся только ненулевые признаки)."""
+
+    def __init__(self, classes: list[str], bias: list[float], weights: dict[str, list[float]]) -> None:
+        self.classes = classes
+        self.bias = bias
+        self.weights = weights
+
+    def probabilities(self, features: dict[str, float]) -> list[float]:
+        scores = list(self.bias)
+        n = len(scores)
+        for g, x in features.items():
+            w = self.weights.get(g)
+            if w is not None:
+                for c in range(n):
+                    scores[c] += w[c] * x
+        return _softmax(scores)
+
+    def predict(self, features: dict[str, float]) -> tuple[str, float]:
+        probs = self.probabilities(features)
+        best = max(range(len(probs)), key=probs.__getitem__)
+        return self.classes[best], probs[best]
+
+    @classmethod
+    def fit(
+        cls,
+        samples: list[dict[str, float]],
+        labels: list[str],
+        epochs: int = 15,
+        lr: float = 0.5,
+        l2: float = 1e-4,
+        seed: int = 13,
+    ) -> "LinearHead":
+        """
+        SGD по кросс-энтропии с L2. Признаки, встретившиеся в одном примере, отбрасываются заранее.
+        Обновляются только классы с заметной ошибкой — на разреженных данных это ускоряет обучение в разы.
+        """
+        classes = sorted(set(labels))
+        index = {c: i for i, c in enumerate(classes)}
+        n = len(classes)
+        df = Counter(g for s in samples for g in s)
+        weights: dict[str, list[float]] = {g: [0.0] * n for g, k in df.items() if k >= 2}
+        bias = [0.0] * n
+        order = list(range(len(samples)))
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            step = lr / (1 + epoch * 0.5)
+            decay = 1 - step * l2
+            for i in order:
+                feats = {g: x for g, x in samples[i].items() if g in weights}
+                probs = LinearHead(classes, bias, weights).probabilities(feats)
+                target = index[labels[i]]
+                for c in range(n):
+                    err = probs[c] - (1.0 if c == target else 0.0)
+                    if abs(err) < 1e-3:
+                        continue
+                    bias[c] -= step * err
+                    for g, x in feats.items():
+                        w = weights[g]
+                        w[c] = w[c] * decay - step * err * x
+        # Веса, которые так и остались около нуля, в артефакт не пишем
+        weights = {g: [round(v, 5) for v in w] for g, w in weights.items() if max(abs(v) for v in w) > 1e-4}
+        return cls(classes, [round(b, 5) for b in bias], weights)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"classes": self.classes, "bias": self.bias, "weights": self.weights}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "LinearHead":
+        return cls(list(data["classes"]), list(data["bias"]), dict(data["weights"]))
+
+
+class IntentClassifier:
+    """Голова intent и голова part_type (обучается только на запросах деталей с известным part_type)."""
+
+    def __init__(self, heads: dict[str, LinearHead], meta: dict[str, Any] | None = None) -> None:
+        self.heads = heads
+        self.meta = meta or {}
+        self.sizes = tuple(self.meta.get("ngram_sizes") or NGRAM_SIZES)
+
+    def predict(self, text: str) -> dict[str, tuple[str, float]]:
+        """{"intent": (метка, вероятность), "part_type": (...)} для присутствующих голов."""
+        features = featurize(text, self.sizes)
+        return {name: head.predict(features) for name, head in self.heads.items()}
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        data = {
+            "version": ARTIFACT_VERSION,
+            "meta": {**self.meta, "ngram_sizes": list(self.sizes)},
+            "heads": {name: head.to_dict() for name, head in self.heads.items()},
+        }
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != ARTIFACT_VERSION:
+            raise ValueError(f"unsupported intent classifier artifact version: {data.get('version')}")
+        heads = {name: LinearHead.from_dict(h) for name, h in data["heads"].items()}
+        intent_head = heads.get("intent")
+        if intent_head is None or len(intent_head.classes) < 2:
+            raise ValueError(f"intent head needs at least 2 classes, got {intent_head.classes if intent_head else None}")
+        return cls(heads, data.get("meta") or {})
+
+
+def train(
+    samples: list[dict[str, str]],
+    min_part_count: int = 3,
+    epochs: int = 15,
+    sizes: tuple[int, ...] = NGRAM_SIZES,
+) -> IntentClassifier:
+    """
+    samples: [{"text", "intent", "part_type"}]. Редкие part_type (< min_part_count) в голову не попадают.
+    ValueError — в выборке меньше двух intent.
+    """
+    intents = sorted({s["intent"] for s in samples})
+    if len(intents) < 2:
+        raise ValueError(f"intent classifier needs at least 2 intent classes, got {intents}")
+    features = [featurize(s["text"], sizes) for s in samples]
+    heads = {"intent": LinearHead.fit(features, [s["intent"] for s in samples], epochs=epochs)}
+    part_counts = Counter(s["part_type"] for s in samples if s.get("part_type"))
+    part_idx = [i for i, s in enumerate(samples) if part_counts.get(s.get("part_type") or "", 0) >= min_part_count]
+    if len({samples[i]["part_type"] for i in part_idx}) >= 2:
+        heads["part_type"] = LinearHead.fit(
+            [features[i] for i in part_idx], [samples[i]["part_type"] for i in part_idx], epochs=epochs
+        )
+    meta = {
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "samples": len(samples),
+        "intent_classes": heads["intent"].classes,
+        "part_types": len(heads["part_type"].classes) if "part_type" in heads else 0,
+        "ngram_sizes": list(sizes),
+    }
+    return IntentClassifier(heads, meta)
+
+
+def evaluate(clf: IntentClassifier, samples: list[dict[str, str]], threshold: float = INTENT_CLASSIFIER_THRESHOLD) -> dict:
+    """
+    Точность на отложенных циклах: общая, по классам (precision/recall), и при пороге уверенности —
+    какая доля запросов обошлась бы без LLM (coverage) и насколько точны именно они.
+    """
+    report: dict[str, Any] = {"samples": len(samples), "threshold": threshold}
+    latencies: list[float] = []
+    preds = []
+    for s in samples:
+        started = time.perf_counter()
+        preds.append(clf.predict(s["text"]))
+        latencies.append((time.perf_counter() - started) * 1000)
+    for head in clf.heads:
+        pairs = [
+            (s.get(head) or "", p[head])
+            for s, p in zip(samples, preds)
+            if head == "intent" or s.get("part_type") in clf.heads[head].classes
+        ]
+        if not pairs:
+            continue
+        correct = sum(1 for gold, (label, _) in pairs if gold == label)
+        confident = [(gold, label) for gold, (label, prob) in pairs if prob >= threshold]
+        per_class = {}
+        for c in clf.heads[head].classes:
+            tp = sum(1 for gold, (label, _) in pairs if gold == c and label == c)
+            predicted = sum(1 for _, (label, _) in pairs if label == c)
+            actual = sum(1 for gold, _ in pairs if gold == c)
+            if actual or predicted:
+                per_class[c] = {
+                    "precision": round(tp / predicted, 3) if predicted else 0.0,
+                    "recall": round(tp / actual, 3) if actual else 0.0,
+                    "support": actual,
+                }
+        report[head] = {
+            "evaluated": len(pairs),
+            "accuracy": round(correct / len(pairs), 3),
+            "coverage_at_threshold": round(len(confident) / len(pairs), 3),
+            "accuracy_at_threshold": (
+                round(sum(1 for gold, label in confident if gold == label) / len(confident), 3) if confident else None
+            ),
+            "per_class": per_class,
+        }
+    if latencies:
+        latencies.sort()
+        report["latency_ms_p50"] = round(latencies[len(latencies) // 2], 4)
+        report["latency_ms_p99"] = round(latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)], 4)
+    return report
+
+
+_classifier: IntentClassifier | None = None
+_loaded = False
+
+
+def get_intent_classifier() -> IntentClassifier | None:
+    """Классификатор из артефакта (загружается один раз); нет файла — None, извлечение идёт без него."""
+    global _classifier, _loaded
+    if not _loaded:
+        _loaded = True
+        if os.path.exists(INTENT_CLASSIFIER_PATH):
+            try:
+                _classifier = IntentClassifier.load(INTENT_CLASSIFIER_PATH)
+                logger.info(
+                    "Intent classifier loaded: %s (%s samples)",
+                    INTENT_CLASSIFIER_PATH,
+                    _classifier.meta.get("samples"),
+                )
+            except Exception as e:
+                logger.warning("Intent classifier not loaded (%s): %s", INTENT_CLASSIFIER_PATH, e)
+        else:
+            logger.info("Intent classifier artifact not found: %s", INTENT_CLASSIFIER_PATH)
+    return _classifier
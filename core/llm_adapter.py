@@ -1,63 +1,433 @@
 """LLM-адаптер: только Ollama (async, httpx, tenacity)."""
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
 import os
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import AsyncIterator
+from urllib.parse import urlparse
 
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+from core.circuit_breaker import CircuitBreaker, get_circuit_breaker
+from core import metrics
+from core.http_pool import get_http_client
+from core.json_stream import JsonObjectScanner
+from core.logger import log_event_to_db
+from core.llm_admission import PRIORITY_NEW_QUERY, LLMSaturated, get_admission_queue
 
 logger = logging.getLogger(__name__)
 
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5:7b")
 OLLAMA_TIMEOUT = int(os.getenv("OLLAMA_TIMEOUT", "60"))
+# Маршрутизация по типу задачи: короткий структурированный разбор — малая модель, свободный ответ — большая.
+# Пустые значения — OLLAMA_MODEL (малую модель нужно заранее скачать: ollama pull qwen2.5:1.5b)
+TASK_EXTRACTION = "extraction"
+TASK_CLARIFICATION = "clarification"
+TASK_GENERAL = "general"
+OLLAMA_MODEL_SMALL = os.getenv("OLLAMA_MODEL_SMALL", "") or OLLAMA_MODEL
+TASK_MODELS = {
+    TASK_EXTRACTION: os.getenv("LLM_MODEL_EXTRACTION", "") or OLLAMA_MODEL_SMALL,
+    TASK_CLARIFICATION: os.getenv("LLM_MODEL_CLARIFICATION", "") or OLLAMA_MODEL_SMALL,
+    TASK_GENERAL: os.getenv("LLM_MODEL_GENERAL", "") or OLLAMA_MODEL,
+}
+# Потолок токенов для JSON-режима: ответ извлечения — короткий объект, генерация обрывается на его «}»
+OLLAMA_JSON_NUM_PREDICT = int(os.getenv("OLLAMA_JSON_NUM_PREDICT", "512"))
+# Сколько Ollama держит модель в памяти после запроса ("30m", "-1" — всегда); прогрев — llm.warmup
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# load_duration выше порога — модель загружалась в память (холодный старт)
+LLM_COLD_LOAD_MS = float(os.getenv("LLM_COLD_LOAD_MS", "1000"))
+
+# (base_url, model) -> time.monotonic() последнего вызова: прогрев не пингует модель, которая и так в работе
+_last_used: dict[tuple[str, str], float] = {}
+
+# Статистика последнего вызова LLM в текущем контексте (задаче) — для dialogue_cycles
+_last_call_stats: ContextVar[dict | None] = ContextVar("llm_last_call_stats", default=None)
+
+
+def get_last_call_stats() -> dict | None:
+    """Статистика последнего вызова LLM в этой задаче: тайминги Ollama, prompt и ответ."""
+    return _last_call_stats.get()
+
+
+def set_last_call_stats(stats: dict | None) -> None:
+    _last_call_stats.set(stats)
+
+
+def model_for_task(task: str) -> str:
+    return TASK_MODELS.get(task) or OLLAMA_MODEL
+
+
+def breaker_for(base_url: str | None = None) -> CircuitBreaker:
+    """Circuit breaker инстанса Ollama: отказ одного бэкенда не отключает остальные."""
+    url = (base_url or OLLAMA_BASE_URL).rstrip("/")
+    if url == OLLAMA_BASE_URL.rstrip("/"):
+        return get_circuit_breaker("llm")
+    return get_circuit_breaker(f"llm.backend.{urlparse(url).netloc or url}")
+
+
+def last_used(base_url: str, model: str) -> float | None:
+    return _last_used.get((base_url.rstrip("/"), model))
+
+
+def _ns_to_ms(value) -> float | None:
+    return round(value / 1e6, 1) if isinstance(value, (int, float)) else None
+
+
+def _timing_stats(data: dict) -> dict:
+    """Счётчики токенов и тайминги из финального ответа Ollama (durations — в наносекундах)."""
+    stats = {
+        "prompt_eval_count": data.get("prompt_eval_count"),
+        "prompt_eval_ms": _ns_to_ms(data.get("prompt_eval_duration")),
+        "eval_count": data.get("eval_count"),
+        "eval_ms": _ns_to_ms(data.get("eval_duration")),
+        "load_ms": _ns_to_ms(data.get("load_duration")),
+        "total_ms": _ns_to_ms(data.get("total_duration")),
+    }
+    if stats["eval_count"] and stats["eval_ms"]:
+        stats["tokens_per_s"] = round(stats["eval_count"] / (stats["eval_ms"] / 1000), 2)
+    if stats["prompt_eval_count"] and stats["prompt_eval_ms"]:
+        stats["prompt_tokens_per_s"] = round(stats["prompt_eval_count"] / (stats["prompt_eval_ms"] / 1000), 2)
+    return {k: v for k, v in stats.items() if v is not None}
+
+
+async def _record_call(stats: dict, prompt: str = "", response: str = "") -> None:
+    """Метрики + событие llm_call в debug_logs; полная статистика (с текстами) — в контекст задачи."""
+    stats["cold_load"] = (stats.get("load_ms") or 0) >= LLM_COLD_LOAD_MS
+    _last_used[(stats["base_url"].rstrip("/"), stats["model"])] = time.monotonic()
+    task = stats.get("task")
+    if task and not stats.get("error") and stats.get("latency_ms") is not None:
+        metrics.incr(f"llm.task.{task}.calls")
+        metrics.observe(f"llm.task.{task}.latency_ms", stats["latency_ms"])
+    if stats.get("tokens_per_s"):
+        metrics.observe("llm.tokens_per_s", stats["tokens_per_s"])
+    if stats.get("prompt_eval_ms") is not None:
+        metrics.observe("llm.prompt_eval_ms", stats["prompt_eval_ms"])
+    if stats["cold_load"]:
+        metrics.incr("llm.cold_load")
+    set_last_call_stats({**stats, "prompt": prompt, "response": response})
+    await log_event_to_db("llm_call", stats, llm_backend=stats.get("model"), latency_ms=stats.get("latency_ms"))
 
 
 async def health_check() -> dict:
     """Проверить доступность Ollama."""
     try:
-        async with httpx.AsyncClient(timeout=5) as client:
-            r = await client.get(f"{OLLAMA_BASE_URL.rstrip('/')}/api/tags")
-            r.raise_for_status()
-            models = [m["name"] for m in r.json().get("models", [])]
-            model_available = any(OLLAMA_MODEL.split(":")[0] in m for m in models)
-            return {
-                "available": True,
-                "model_available": model_available,
-                "model_loaded": model_available,
-                "models": models,
-                "configured_model": OLLAMA_MODEL,
-            }
+        r = await get_http_client().get(f"{OLLAMA_BASE_URL.rstrip('/')}/api/tags", timeout=5)
+        r.raise_for_status()
+        models = [m["name"] for m in r.json().get("models", [])]
+        model_available = any(OLLAMA_MODEL.split(":")[0] in m for m in models)
+        missing = sorted({m for m in TASK_MODELS.values() if m not in models and f"{m}:latest" not in models})
+        return {
+            "available": True,
+            "model_available": model_available,
+            "model_loaded": model_available,
+            "models": models,
+            "configured_model": OLLAMA_MODEL,
+            "task_models": TASK_MODELS,
+            "missing_models": missing,
+            "circuit": breaker_for().snapshot(),
+        }
+    except Exception as e:
+        return {
+            "available": False,
+            "error": str(e),
+            "configured_model": OLLAMA_MODEL,
+            "circuit": breaker_for().snapshot(),
+        }
+
+
+async def call_llm(
+    prompt: str,
+    system: str = "",
+    timeout: int | None = None,
+    priority: int = PRIORITY_NEW_QUERY,
+    json_mode: bool = False,
+    base_url: str | None = None,
+    prompt_version: str | None = None,
+    task: str = TASK_GENERAL,
+    admit: bool = True,
+) -> str:
+    """
+    Единственная точка вызова LLM — только Ollama.
+    Вызов проходит через circuit breaker инстанса (открыт — сразу CircuitOpen) и глобальную очередь допуска
+    (переполнена — LLMSaturated). Таймаут адаптивный: по p95 недавних вызовов, не больше timeout.
+    admit=False — слот допуска уже занят вызывающим (llm.router берёт его раньше бэкенда).
+    json_mode — format: "json" и потоковое чтение до закрытия объекта (см. _call_llm_json).
+    base_url — конкретный инстанс Ollama (выбирает llm.router), по умолчанию OLLAMA_BASE_URL.
+    Тайминги Ollama пишутся в debug_logs (llm_call) с prompt_version и доступны через get_last_call_stats().
+    task — тип задачи (TASK_*): по нему выбирается модель (TASK_MODELS).
+    """
+    breaker = breaker_for(base_url)
+    breaker.before_call()
+    call = _call_llm_json if json_mode else _call_llm
+    stats: dict = {
+        "model": model_for_task(task),
+        "task": task,
+        "base_url": base_url or OLLAMA_BASE_URL,
+        "kind": "json" if json_mode else "text",
+        "prompt_version": prompt_version,
+    }
+    started = time.perf_counter()
+    try:
+        async with get_admission_queue().slot(priority) if admit else nullcontext():
+            started = time.perf_counter()
+            result = await call(
+                prompt,
+                system,
+                breaker.timeout_for(timeout or OLLAMA_TIMEOUT),
+                base_url or OLLAMA_BASE_URL,
+                stats,
+                stats["model"],
+            )
+    except LLMSaturated:
+        breaker.release()
+        raise
     except Exception as e:
-        return {"available": False, "error": str(e), "configured_model": OLLAMA_MODEL}
+        breaker.record_failure()
+        stats.update(latency_ms=int((time.perf_counter() - started) * 1000), error=type(e).__name__)
+        await _record_call(stats, prompt)
+        raise
+    except BaseException:
+        breaker.release()
+        raise
+    latency_ms = (time.perf_counter() - started) * 1000
+    breaker.record_success(latency_ms)
+    stats["latency_ms"] = int(latency_ms)
+    await _record_call(stats, prompt, result)
+    return result
 
 
-@retry(stop=stop_after_attempt(2), wait=wait_exponential(min=1, max=3))
-async def call_llm(prompt: str, system: str = "", timeout: int | None = None) -> str:
-    """Единственная точка вызова LLM — только Ollama."""
+# Повтор только при обрыве соединения: таймаут на перегруженной модели повторять бессмысленно
+@retry(
+    stop=stop_after_attempt(2),
+    wait=wait_exponential(min=1, max=3),
+    retry=retry_if_exception_type((httpx.ConnectError, httpx.RemoteProtocolError)),
+    reraise=True,
+)
+async def _call_llm(
+    prompt: str,
+    system: str = "",
+    timeout: float | None = None,
+    base_url: str = OLLAMA_BASE_URL,
+    stats: dict | None = None,
+    model: str = OLLAMA_MODEL,
+) -> str:
     full_prompt = f"{system}\n\n{prompt}" if system else prompt
-    t = max(timeout or OLLAMA_TIMEOUT, 90)
+    t = timeout or OLLAMA_TIMEOUT
 
     try:
-        async with httpx.AsyncClient(timeout=t) as client:
-            r = await client.post(
-                f"{OLLAMA_BASE_URL.rstrip('/')}/api/generate",
-                json={
-                    "model": OLLAMA_MODEL,
-                    "prompt": full_prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.1,
-                        "top_p": 0.9,
-                        "num_predict": 1024,
-                    },
+        r = await get_http_client().post(
+            f"{base_url.rstrip('/')}/api/generate",
+            json={
+                "model": model,
+                "prompt": full_prompt,
+                "keep_alive": OLLAMA_KEEP_ALIVE,
+                "stream": False,
+                "options": {
+                    "temperature": 0.1,
+                    "top_p": 0.9,
+                    "num_predict": 1024,
                 },
-            )
+            },
+            timeout=t,
+        )
+        r.raise_for_status()
+        data = r.json()
+        result = data.get("response", "")
+        if stats is not None:
+            stats.update(_timing_stats(data))
+        logger.debug("Ollama response length: %d", len(result))
+        return result
+    except Exception as e:
+        logger.error("Ollama error: %s", e)
+        raise
+
+
+@retry(
+    stop=stop_after_attempt(2),
+    wait=wait_exponential(min=1, max=3),
+    retry=retry_if_exception_type((httpx.ConnectError, httpx.RemoteProtocolError)),
+    reraise=True,
+)
+async def _call_llm_json(
+    prompt: str,
+    system: str = "",
+    timeout: float | None = None,
+    base_url: str = OLLAMA_BASE_URL,
+    stats: dict | None = None,
+    model: str = OLLAMA_MODEL,
+) -> str:
+    """
+    Структурированный вывод: Ollama format: "json", ответ читается потоком.
+    Как только закрылся верхнеуровневый объект, поток закрывается — Ollama прекращает генерацию,
+    лишние токены (пояснения после JSON) не генерируются.
+    """
+    full_prompt = f"{system}\n\n{prompt}" if system else prompt
+    t = timeout or OLLAMA_TIMEOUT
+    scanner = JsonObjectScanner()
+    info = stats if stats is not None else {}
+
+    async def read() -> str:
+        chunks = 0
+        sent = time.perf_counter()
+        async with get_http_client().stream(
+            "POST",
+            f"{base_url.rstrip('/')}/api/generate",
+            json={
+                "model": model,
+                "prompt": full_prompt,
+                "keep_alive": OLLAMA_KEEP_ALIVE,
+                "stream": True,
+                "format": "json",
+                "options": {
+                    "temperature": 0.1,
+                    "top_p": 0.9,
+                    "num_predict": OLLAMA_JSON_NUM_PREDICT,
+                },
+            },
+            timeout=httpx.Timeout(t, connect=10),
+        ) as r:
             r.raise_for_status()
-            result = r.json().get("response", "")
-            logger.debug("Ollama response length: %d", len(result))
-            return result
+            async for line in r.aiter_lines():
+                if not line.strip():
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if chunk.get("error"):
+                    raise RuntimeError(f"Ollama error: {chunk['error']}")
+                chunks += 1
+                if chunks == 1:
+                    # Время до первого токена ≈ загрузка модели + prompt eval (при раннем обрыве других данных нет)
+                    info["first_token_ms"] = round((time.perf_counter() - sent) * 1000, 1)
+                if chunk.get("done"):
+                    info.update(_timing_stats(chunk))
+                obj = scanner.feed(chunk.get("response", ""))
+                if obj is not None:
+                    if not chunk.get("done"):
+                        metrics.incr("llm.json.early_stop")
+                        info.update(eval_count=chunks, early_stop=True)
+                    metrics.observe("llm.json.chunks", chunks)
+                    return obj
+                if chunk.get("done"):
+                    break
+        # Поток закончился, а объект не закрылся (упёрлись в num_predict) — отдаём как есть
+        metrics.incr("llm.json.truncated")
+        metrics.observe("llm.json.chunks", chunks)
+        return scanner.partial
+
+    try:
+        # Таймаут на весь ответ, а не на паузу между фрагментами — как у обычного вызова
+        result = await asyncio.wait_for(read(), timeout=t)
+        logger.debug("Ollama JSON response length: %d", len(result))
+        return result
     except Exception as e:
         logger.error("Ollama error: %s", e)
         raise
+
+
+async def stream_llm(
+    prompt: str,
+    system: str = "",
+    timeout: int | None = None,
+    priority: int = PRIORITY_NEW_QUERY,
+    base_url: str | None = None,
+    prompt_version: str | None = None,
+    task: str = TASK_GENERAL,
+    admit: bool = True,
+) -> AsyncIterator[str]:
+    """
+    Потоковая генерация (Ollama stream: true): отдаёт фрагменты текста по мере генерации.
+    timeout — ожидание между фрагментами, а не на весь ответ: первый токен приходит за секунды.
+    Слот очереди допуска удерживается до конца потока; circuit breaker учитывает исход потока.
+    admit=False — слот допуска уже занят вызывающим (llm.router).
+    """
+    full_prompt = f"{system}\n\n{prompt}" if system else prompt
+    t = httpx.Timeout(timeout or OLLAMA_TIMEOUT, connect=10)
+
+    breaker = breaker_for(base_url)
+    breaker.before_call()
+    stats: dict = {
+        "model": model_for_task(task),
+        "task": task,
+        "base_url": base_url or OLLAMA_BASE_URL,
+        "kind": "stream",
+        "prompt_version": prompt_version,
+    }
+    pieces: list[str] = []
+    started = time.perf_counter()
+    try:
+        async for piece in _stream_llm(
+            full_prompt, t, priority, base_url or OLLAMA_BASE_URL, stats, stats["model"], admit
+        ):
+            pieces.append(piece)
+            yield piece
+    except LLMSaturated:
+        breaker.release()
+        raise
+    except Exception as e:
+        breaker.record_failure()
+        stats.update(latency_ms=int((time.perf_counter() - started) * 1000), error=type(e).__name__)
+        await _record_call(stats, prompt)
+        raise
+    except BaseException:
+        breaker.release()
+        raise
+    breaker.record_success()
+    stats["latency_ms"] = int((time.perf_counter() - started) * 1000)
+    await _record_call(stats, prompt, "".join(pieces))
+
+
+async def _stream_llm(
+    full_prompt: str,
+    t: httpx.Timeout,
+    priority: int,
+    base_url: str,
+    stats: dict,
+    model: str = OLLAMA_MODEL,
+    admit: bool = True,
+) -> AsyncIterator[str]:
+    async with get_admission_queue().slot(priority) if admit else nullcontext():
+        sent = time.perf_counter()
+        async with get_http_client().stream(
+            "POST",
+            f"{base_url.rstrip('/')}/api/generate",
+            json={
+                "model": model,
+                "prompt": full_prompt,
+                "keep_alive": OLLAMA_KEEP_ALIVE,
+                "stream": True,
+                "options": {
+                    "temperature": 0.1,
+                    "top_p": 0.9,
+                    "num_predict": 1024,
+                },
+            },
+            timeout=t,
+        ) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line.strip():
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.debug("Ollama stream: skip non-JSON line: %s", line[:100])
+                    continue
+                if chunk.get("error"):
+                    raise RuntimeError(f"Ollama stream error: {chunk['error']}")
+                if "first_token_ms" not in stats:
+                    stats["first_token_ms"] = round((time.perf_counter() - sent) * 1000, 1)
+                piece = chunk.get("response", "")
+                if piece:
+                    yield piece
+                if chunk.get("done"):
+                    stats.update(_timing_stats(chunk))
+                    break
@@ -0,0 +1,121 @@
+"""Глобальная очередь допуска к LLM: лимит параллельных вызовов Ollama и приоритеты."""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Меньше — важнее. Ответ на уточнение продолжает начатый диалог и идёт раньше новых запросов.
+PRIORITY_CLARIFICATION = 0
+PRIORITY_NEW_QUERY = 1
+PRIORITY_GENERAL = 2
+
+# 0 — по сумме лимитов бэкендов роутера (OLLAMA_BASE_URLS, см. llm.backends); до его создания — 2
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "0"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "20"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "20"))
+
+
+class LLMSaturated(RuntimeError):
+    """Очередь к LLM переполнена или ожидание слота истекло — нужен rule-based fallback."""
+
+
+class AdmissionQueue:
+    """Семафор с приоритетной очередью ожидающих и ограничением её длины."""
+
+    def __init__(self, max_concurrency: int, max_queue: int, max_wait: float) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    @property
+    def depth(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge("llm.queue.depth", self.depth)
+        metrics.set_gauge("llm.active", self._active)
+
+    async def _acquire(self, priority: int) -> None:
+        if self._active < self.max_concurrency and not self.depth:
+            self._active += 1
+            return
+        if self.depth >= self.max_queue:
+            metrics.incr("llm.queue.rejected")
+            raise LLMSaturated(f"LLM queue is full ({self.max_queue})")
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        self._update_gauges()
+        try:
+            # Слот передаётся из _release вместе с результатом future
+            await asyncio.wait_for(asyncio.shield(fut), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                return  # слот выдали в момент таймаута — используем
+            fut.cancel()
+            metrics.incr("llm.queue.timeout")
+            raise LLMSaturated(f"LLM queue wait exceeded {self.max_wait:g}s") from None
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self._release()
+            else:
+                fut.cancel()
+            raise
+        finally:
+            self._update_gauges()
+
+    def resize(self, max_concurrency: int) -> None:
+        """Изменить лимит на лету: при увеличении слоты сразу достаются ожидающим."""
+        self.max_concurrency = max(1, max_concurrency)
+        while self._active < self.max_concurrency and self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                self._active += 1
+        self._update_gauges()
+
+    def _release(self) -> None:
+        while self._active <= self.max_concurrency and self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)  # слот переходит ожидающему, _active не меняется
+                self._update_gauges()
+                return
+        self._active -= 1
+        self._update_gauges()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_NEW_QUERY) -> AsyncIterator[None]:
+        started = time.perf_counter()
+        await self._acquire(priority)
+        wait_ms = (time.perf_counter() - started) * 1000
+        metrics.observe("llm.queue.wait_ms", wait_ms)
+        metrics.incr("llm.admitted")
+        if wait_ms > 1000:
+            logger.info("LLM slot granted after %.0f ms (priority=%d)", wait_ms, priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+
+_queue: AdmissionQueue | None = None
+
+
+def get_admission_queue() -> AdmissionQueue:
+    global _queue
+    if _queue is None:
+        _queue = AdmissionQueue(LLM_MAX_CONCURRENCY or 2, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT)
+    return _queue
@@ -7,6 +7,8 @@ import os
 import sqlite3
 from datetime import datetime
 
+from core.pii_masker import mask_pii
+
 logger = logging.getLogger("parts_assistant")
 
 DB_PATH = os.getenv("DB_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "parts.db"))
@@ -31,13 +33,13 @@ def _ensure_debug_logs():
 
 
 def log_event(event_type: str, data: dict) -> None:
-    """Логировать событие в файл/stdout."""
+    """Логировать событие в файл/stdout (с маскированием PII)."""
     entry = {
         "timestamp": datetime.utcnow().isoformat(),
         "event": event_type,
         **data,
     }
-    logger.info(json.dumps(entry, ensure_ascii=False))
+    logger.info(mask_pii(json.dumps(entry, ensure_ascii=False)))
 
 
 async def log_event_to_db(
@@ -47,7 +49,7 @@ async def log_event_to_db(
     llm_backend: str | None = None,
     latency_ms: int | None = None,
 ) -> None:
-    """Сохранить событие в таблицу debug_logs."""
+    """Сохранить событие в таблицу debug_logs (payload — с маскированием PII)."""
     try:
         _ensure_debug_logs()
         conn = sqlite3.connect(DB_PATH)
@@ -58,7 +60,7 @@ async def log_event_to_db(
                 session_id,
                 data.get("tg_user_id"),
                 event_type,
-                json.dumps(data, ensure_ascii=False),
+                mask_pii(json.dumps(data, ensure_ascii=False)),
                 llm_backend,
                 latency_ms,
             ),
@@ -185,6 +185,20 @@ def search(
     return unique
 
 
+def optimal_score(item: PriceItem) -> float:
+    """Баланс цены, срока и наличия (меньше — лучше). Используется для тира Optimal."""
+    price_score = (item.price / 1000) if item.price and item.price > 0 else 999.0
+    delivery_score = (item.delivery_days * 0.5) if item.delivery_days is not None and item.delivery_days >= 0 else 30.0
+    stock_bonus = -2 if "✓" in item.display_stock else 0
+    defect_penalty = 1 if item.is_defect else 0
+    return price_score + delivery_score + stock_bonus + defect_penalty
+
+
+def rank_items(items: list[PriceItem]) -> list[PriceItem]:
+    """Полный ранжированный список кандидатов (порядок тира Optimal)."""
+    return sorted(items, key=optimal_score)
+
+
 def build_tiers(items: list[PriceItem]) -> dict[str, list[PriceItem]]:
     """
     Собирает 3 тира из списка найденных позиций.
@@ -216,13 +230,6 @@ def build_tiers(items: list[PriceItem]) -> dict[str, list[PriceItem]]:
         key=lambda x: (x.price, x.delivery_days if x.delivery_days is not None else math.inf),
     )
 
-    def optimal_score(item: PriceItem) -> float:
-        price_score = (item.price / 1000) if item.price and item.price > 0 else 999.0
-        delivery_score = (item.delivery_days * 0.5) if item.delivery_days is not None and item.delivery_days >= 0 else 30.0
-        stock_bonus = -2 if "✓" in item.display_stock else 0
-        defect_penalty = 1 if item.is_defect else 0
-        return price_score + delivery_score + stock_bonus + defect_penalty
-
     optimal_pool = sorted(items, key=optimal_score)
 
     return {
@@ -0,0 +1,85 @@
+"""Single-flight: объединение одновременных одинаковых запросов в один вызов."""
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def make_key(*parts: Any) -> str:
+    """Стабильный ключ из JSON-совместимых частей (ключи dict сортируются)."""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    """Общий вызов: задача и число тех, кто ещё ждёт её результат."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Пока вызов с ключом выполняется, повторные вызовы с тем же ключом
+    не запускают новую работу, а ждут общий результат.
+    Общий вызов идёт отдельной задачей: отмена любого из ожидающих (в том числе первого) его не прерывает;
+    задача отменяется, только когда ждать её больше некому.
+    Каждому вызывающему отдаётся своя копия результата — рендеринг остаётся per-user.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._inflight: dict[str, _Call] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        call = self._inflight.get(key)
+        joined = call is not None
+        if not joined:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._inflight[key] = call
+            call.task.add_done_callback(lambda task: self._finished(key, call))
+        else:
+            self.shared += 1
+            logger.debug("singleflight[%s]: joined in-flight call", self.name)
+        call.waiters += 1
+        try:
+            result = await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.cancelled():
+                raise  # отменили этого вызывающего, общий вызов продолжается для остальных
+            retry = True
+        else:
+            retry = False
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()  # результат больше никому не нужен
+        if retry:
+            # Общий вызов отменён изнутри — считаем сами
+            self.calls -= 1
+            self.shared -= joined
+            return await self.do(key, fn)
+        return copy.deepcopy(result)
+
+    def _finished(self, key: str, call: _Call) -> None:
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+        if not call.task.cancelled():
+            call.task.exception()  # ошибку получили ожидающие; если их не осталось — не шуметь в лог
+
+    def stats(self) -> dict[str, int]:
+        return {"calls": self.calls, "shared": self.shared, "inflight": len(self._inflight)}
@@ -0,0 +1,59 @@
+"""Дешёвое локальное сходство текстов: TF-IDF по символьным n-граммам (опечатки и словоформы не мешают)."""
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter, defaultdict
+
+NGRAM_SIZES = (3, 4)
+
+
+def normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", (text or "").lower().replace("ё", "е")).strip()
+
+
+def char_ngrams(text: str, sizes: tuple[int, ...] = NGRAM_SIZES) -> Counter:
+    """Символьные n-граммы с границами слов: «колодки» и «колодок» получают общие граммы."""
+    padded = f" {normalize(text)} "
+    grams: Counter = Counter()
+    for n in sizes:
+        for i in range(len(padded) - n + 1):
+            grams[padded[i : i + n]] += 1
+    return grams
+
+
+class TfidfIndex:
+    """Индекс коротких текстов (примеры, FAQ) с косинусной близостью; строится за миллисекунды."""
+
+    def __init__(self, docs: list[str], sizes: tuple[int, ...] = NGRAM_SIZES) -> None:
+        self.sizes = sizes
+        self.size = len(docs)
+        counts = [char_ngrams(d, sizes) for d in docs]
+        df: Counter = Counter()
+        for c in counts:
+            df.update(c.keys())
+        self._idf = {g: math.log((1 + self.size) / (1 + n)) + 1 for g, n in df.items()}
+        self._unknown_idf = math.log(1 + self.size) + 1
+        self._postings: dict[str, list[tuple[int, float]]] = defaultdict(list)
+        for i, c in enumerate(counts):
+            for g, w in self._weights(c).items():
+                self._postings[g].append((i, w))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _weights(self, counts: Counter) -> dict[str, float]:
+        vec = {g: (1 + math.log(tf)) * self._idf.get(g, self._unknown_idf) for g, tf in counts.items()}
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        return {g: w / norm for g, w in vec.items()}
+
+    def most_similar(self, text: str, k: int = 3, min_score: float = 0.0) -> list[tuple[int, float]]:
+        """До k пар (индекс документа, косинус) по убыванию близости."""
+        if not self.size or k <= 0:
+            return []
+        scores: dict[int, float] = defaultdict(float)
+        for g, qw in self._weights(char_ngrams(text, self.sizes)).items():
+            for i, dw in self._postings.get(g, ()):
+                scores[i] += qw * dw
+        ranked = sorted(((i, s) for i, s in scores.items() if s >= min_score), key=lambda p: (-p[1], p[0]))
+        return ranked[:k]
@@ -1,4 +1,4 @@
 """LLM слой: только Ollama."""
-from .router import generate, health_check
+from .router import generate, generate_stream, health_check
 
-__all__ = ["generate", "health_check"]
+__all__ = ["generate", "generate_stream", "health_check"]
@@ -0,0 +1,208 @@
+"""
+Пул Ollama-бэкендов: лимит на бэкенд, EWMA латентности, выбор по наименьшему числу запросов в работе.
+Ошибка бэкенда штрафует его EWMA и отправляет на паузу (cooldown); бэкенд с открытым circuit breaker
+не выбирается вовсе.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from urllib.parse import urlparse
+
+from core import metrics
+from core.circuit_breaker import OPEN, CircuitBreaker, CircuitOpen
+from core.llm_admission import LLM_MAX_CONCURRENCY, LLMSaturated, get_admission_queue
+from core.llm_adapter import OLLAMA_BASE_URL, breaker_for
+
+logger = logging.getLogger(__name__)
+
+# Список через запятую; у адреса можно указать свой лимит: "http://cpu1:11434|2,http://cpu2:11434|1"
+OLLAMA_BASE_URLS = os.getenv("OLLAMA_BASE_URLS", "")
+OLLAMA_BACKEND_MAX_CONCURRENCY = int(os.getenv("OLLAMA_BACKEND_MAX_CONCURRENCY", "2"))
+LLM_EWMA_ALPHA = float(os.getenv("LLM_EWMA_ALPHA", "0.3"))
+# Hedging: повторить запрос на другом бэкенде, если первый не ответил за p90 латентности
+LLM_HEDGE = os.getenv("LLM_HEDGE", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_MIN_DELAY_MS = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "500"))
+# Пауза бэкенда после ошибки (сек): удваивается с каждой ошибкой подряд, не больше MAX
+LLM_BACKEND_COOLDOWN_S = float(os.getenv("LLM_BACKEND_COOLDOWN_S", "5"))
+LLM_BACKEND_COOLDOWN_MAX_S = float(os.getenv("LLM_BACKEND_COOLDOWN_MAX_S", "60"))
+# Ошибка учитывается в EWMA как ответ такой длительности (мс)
+LLM_BACKEND_FAILURE_PENALTY_MS = float(os.getenv("LLM_BACKEND_FAILURE_PENALTY_MS", "30000"))
+
+
+class Backend:
+    """Один инстанс Ollama и его статистика."""
+
+    def __init__(self, url: str, max_concurrency: int) -> None:
+        self.url = url.rstrip("/")
+        self.name = urlparse(self.url).netloc or self.url
+        self.max_concurrency = max(1, max_concurrency)
+        self.outstanding = 0
+        self.ewma_ms: float | None = None
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+        self._latencies: deque[float] = deque(maxlen=200)
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.outstanding < self.max_concurrency
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return breaker_for(self.url)
+
+    @property
+    def available(self) -> bool:
+        """Circuit breaker бэкенда не открыт (в half_open пропускается проба)."""
+        return self.breaker.state != OPEN
+
+    @property
+    def cooling(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+
+    def _update_ewma(self, value_ms: float) -> None:
+        if self.ewma_ms is None:
+            self.ewma_ms = value_ms
+        else:
+            self.ewma_ms = LLM_EWMA_ALPHA * value_ms + (1 - LLM_EWMA_ALPHA) * self.ewma_ms
+        metrics.set_gauge(f"llm.backend.{self.name}.ewma_ms", round(self.ewma_ms, 1))
+
+    def observe(self, latency_ms: float) -> None:
+        self._latencies.append(latency_ms)
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+        self._update_ewma(latency_ms)
+
+    def observe_failure(self) -> None:
+        """Ошибка: штраф в EWMA (в p90 для hedging не идёт) и пауза, растущая с каждой ошибкой подряд."""
+        self.errors += 1
+        self.consecutive_errors += 1
+        cooldown = min(LLM_BACKEND_COOLDOWN_MAX_S, LLM_BACKEND_COOLDOWN_S * 2 ** (self.consecutive_errors - 1))
+        self.cooldown_until = time.monotonic() + cooldown
+        self._update_ewma(LLM_BACKEND_FAILURE_PENALTY_MS)
+        metrics.incr(f"llm.backend.{self.name}.errors")
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "outstanding": self.outstanding,
+            "max_concurrency": self.max_concurrency,
+            "ewma_ms": round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            "errors": self.errors,
+            "cooldown_s": round(max(0.0, self.cooldown_until - time.monotonic()), 1),
+            "circuit": self.breaker.state,
+        }
+
+
+def parse_backends(spec: str, default_url: str, default_cap: int) -> list[Backend]:
+    backends = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, cap = item.partition("|")
+        backends.append(Backend(url.strip(), int(cap) if cap.strip().isdigit() else default_cap))
+    return backends or [Backend(default_url, default_cap)]
+
+
+class BackendPool:
+    """
+    Выбор бэкенда: сначала не на паузе после ошибки, затем наименьшее число запросов в работе,
+    при равенстве — меньшая EWMA (бэкенд без статистики пробуем первым). Бэкенды с открытым
+    circuit breaker пропускаются; открыты у всех — CircuitOpen. Если все заняты по лимиту — ждём освобождения.
+    Бэкенд арендуется уже после слота очереди допуска (llm.router): приоритеты и лимиты очереди действуют
+    и здесь, а ожидание аренды ограничено сроком допуска.
+    """
+
+    def __init__(self, backends: list[Backend]) -> None:
+        self.backends = backends
+        self._changed: asyncio.Condition | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._changed is None or self._loop is not loop:
+            self._changed = asyncio.Condition()
+            self._loop = loop
+        return self._changed
+
+    @property
+    def capacity(self) -> int:
+        """Сколько запросов пул выполняет одновременно — сумма лимитов бэкендов."""
+        return sum(b.max_concurrency for b in self.backends)
+
+    def usable(self, exclude: tuple[Backend, ...] = ()) -> bool:
+        """Есть ли бэкенд (кроме exclude) с не открытым circuit breaker — занятый тоже считается."""
+        return any(b.available for b in self.backends if b not in exclude)
+
+    def pick(self, exclude: tuple[Backend, ...] = ()) -> Backend | None:
+        """Лучший доступный бэкенд со свободным слотом (или None)."""
+        free = [b for b in self.backends if b.has_capacity and b not in exclude and b.available]
+        if not free:
+            return None
+        return min(free, key=lambda b: (b.cooling, b.outstanding, b.ewma_ms if b.ewma_ms is not None else -1.0))
+
+    @asynccontextmanager
+    async def lease(
+        self,
+        backend: Backend | None = None,
+        exclude: tuple[Backend, ...] = (),
+        timeout: float | None = None,
+    ) -> AsyncIterator[Backend]:
+        """
+        Занять слот бэкенда на время запроса (backend=None — выбрать, кроме exclude, и при необходимости дождаться).
+        CircuitOpen — у всех подходящих бэкендов открыт circuit breaker; LLMSaturated — за timeout сек
+        бэкенд не освободился.
+        """
+        cond = self._condition()
+        if backend is None:
+            loop = asyncio.get_running_loop()
+            deadline = None if timeout is None else loop.time() + timeout
+            async with cond:
+                while (backend := self.pick(exclude)) is None:
+                    if not self.usable(exclude):
+                        metrics.incr("llm.backends.all_open")
+                        raise CircuitOpen("LLM circuit is open on every backend")
+                    remaining = None if deadline is None else deadline - loop.time()
+                    if remaining is not None and remaining <= 0:
+                        metrics.incr("llm.backends.lease_timeout")
+                        raise LLMSaturated(f"no LLM backend freed up within {timeout:g}s")
+                    try:
+                        await asyncio.wait_for(cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass  # следующая итерация: бэкенд освободился или срок вышел
+        backend.outstanding += 1
+        try:
+            yield backend
+        finally:
+            backend.outstanding -= 1
+            async with cond:
+                cond.notify()
+
+    def hedge_delay(self) -> float:
+        """Задержка hedged-запроса (сек): p90 латентности по всем бэкендам, не меньше минимума."""
+        samples = [v for b in self.backends for v in b._latencies]
+        p90 = metrics.percentile(samples, 0.9) if len(samples) >= 10 else 0.0
+        return max(LLM_HEDGE_MIN_DELAY_MS, p90) / 1000
+
+    def snapshot(self) -> list[dict]:
+        return [b.snapshot() for b in self.backends]
+
+
+_pool: BackendPool | None = None
+
+
+def get_backend_pool() -> BackendPool:
+    global _pool
+    if _pool is None:
+        _pool = BackendPool(parse_backends(OLLAMA_BASE_URLS, OLLAMA_BASE_URL, OLLAMA_BACKEND_MAX_CONCURRENCY))
+        # Общая очередь допуска не должна ограничивать пул сильнее, чем лимиты самих бэкендов
+        get_admission_queue().resize(LLM_MAX_CONCURRENCY or _pool.capacity)
+        logger.info("LLM backends: %s", ", ".join(b.url for b in _pool.backends))
+    return _pool
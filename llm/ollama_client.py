@@ -5,9 +5,10 @@ import logging
 import os
 import time
 
-import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from core.http_pool import get_http_client
+
 logger = logging.getLogger(__name__)
 
 OLLAMA_BASE = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
@@ -17,22 +18,21 @@ OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5:7b")
 async def health_check() -> dict:
     """Проверить доступность Ollama и модели."""
     try:
-        async with httpx.AsyncClient(timeout=5) as client:
-            r = await client.get(f"{OLLAMA_BASE.rstrip('/')}/api/tags")
-            r.raise_for_status()
-            data = r.json()
-            models = [m["name"] for m in data.get("models", [])]
-            model_base = OLLAMA_MODEL.split(":")[0]
-            available = (
-                OLLAMA_MODEL in models
-                or any(model_base in m for m in models)
-            )
-            return {
-                "available": True,
-                "model_loaded": available,
-                "models": models,
-                "configured_model": OLLAMA_MODEL,
-            }
+        r = await get_http_client().get(f"{OLLAMA_BASE.rstrip('/')}/api/tags", timeout=5)
+        r.raise_for_status()
+        data = r.json()
+        models = [m["name"] for m in data.get("models", [])]
+        model_base = OLLAMA_MODEL.split(":")[0]
+        available = (
+            OLLAMA_MODEL in models
+            or any(model_base in m for m in models)
+        )
+        return {
+            "available": True,
+            "model_loaded": available,
+            "models": models,
+            "configured_model": OLLAMA_MODEL,
+        }
     except Exception as e:
         return {"available": False, "error": str(e), "configured_model": OLLAMA_MODEL}
 
@@ -53,10 +53,9 @@ async def generate(
         "stream": False,
         "options": {"temperature": temperature, "top_p": 0.9},
     }
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        r = await client.post(f"{OLLAMA_BASE.rstrip('/')}/api/generate", json=payload)
-        r.raise_for_status()
-        result = r.json().get("response", "")
-        latency = time.time() - start
-        logger.debug("Ollama latency: %.1fs, len: %d", latency, len(result))
-        return result.strip()
+    r = await get_http_client().post(f"{OLLAMA_BASE.rstrip('/')}/api/generate", json=payload, timeout=timeout)
+    r.raise_for_status()
+    result = r.json().get("response", "")
+    latency = time.time() - start
+    logger.debug("Ollama latency: %.1fs, len: %d", latency, len(result))
+    return result.strip()
@@ -5,11 +5,15 @@ import json
 import logging
 import os
 import sqlite3
+import time
 import uuid
 from pathlib import Path
 
 import yaml
 
+from core import extraction_cache, metrics
+from core.text_similarity import TfidfIndex
+
 logger = logging.getLogger(__name__)
 
 _root = Path(__file__).resolve().parent.parent
@@ -17,6 +21,12 @@ CONFIG_DIR = Path(os.getenv("CONFIG_DIR", _root / "config"))
 CORE_PATH = CONFIG_DIR / "prompt_core.txt"
 OVERLAY_PATH = CONFIG_DIR / "prompt_overlay.yaml"
 DB_PATH = os.getenv("DB_PATH", str(_root / "data" / "parts.db"))
+# Как часто (сек) сверять mtime/inode файлов промпта с закэшированным результатом
+PROMPT_CACHE_CHECK_INTERVAL = float(os.getenv("PROMPT_CACHE_CHECK_INTERVAL", "1.0"))
+# Динамические few-shot: k самых похожих на запрос примеров и общий бюджет системного промпта (токены)
+PROMPT_FEW_SHOT_K = int(os.getenv("PROMPT_FEW_SHOT_K", "3"))
+PROMPT_FEW_SHOT_MIN_SCORE = float(os.getenv("PROMPT_FEW_SHOT_MIN_SCORE", "0.1"))
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1200"))
 
 
 def _get_conn() -> sqlite3.Connection:
@@ -39,6 +49,15 @@ def _load_overlay() -> dict:
     return {"version": "1.0.0", "overlay": {}}
 
 
+def _file_signature(path: Path) -> tuple[int, int, int] | None:
+    """(mtime_ns, inode, size): меняется и при записи на месте, и при атомарной замене файла."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_ino, st.st_size
+
+
 def _save_overlay(data: dict) -> None:
     """Сохранить overlay в YAML."""
     OVERLAY_PATH.parent.mkdir(parents=True, exist_ok=True)
@@ -46,42 +65,56 @@ def _save_overlay(data: dict) -> None:
         yaml.dump(data, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
 
 
-def _render_overlay(overlay: dict) -> str:
-    """Преобразовать overlay dict в текст для промпта."""
-    parts = []
+def _estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов (кириллица в qwen — около 3 символов на токен)."""
+    return len(text) // 3 + 1
+
+
+def _overlay_body(overlay: dict) -> dict:
     ov = overlay.get("overlay", overlay) if isinstance(overlay.get("overlay"), dict) else overlay
-    if not isinstance(ov, dict):
-        return ""
+    return ov if isinstance(ov, dict) else {}
+
+
+def _synonym_entries(ov: dict) -> list[tuple[list[str], str]]:
+    """Синонимы overlay: (сырые формы в нижнем регистре, строка для промпта)."""
+    entries = []
+    for s in ov.get("synonyms", []) or []:
+        if not isinstance(s, dict):
+            continue
+        raw = s.get("raw", [])
+        norm = s.get("normalized", "")
+        if isinstance(raw, str):
+            raw = [raw]
+        if raw and norm:
+            entries.append(([str(r).lower() for r in raw], f"- {raw} → {norm}"))
+    return entries
+
+
+def _example_entries(ov: dict) -> list[tuple[str, str]]:
+    """Few-shot примеры: (текст запроса для индекса, строки для промпта)."""
+    entries = []
+    for ex in ov.get("few_shot_examples", []) or []:
+        if isinstance(ex, dict):
+            q = str(ex.get("query", ex.get("text", str(ex))))
+            line = f"  Запрос: {q}"
+            expected = ex.get("expected") or ex.get("result")
+            if expected:
+                answer = json.dumps(expected, ensure_ascii=False) if isinstance(expected, (dict, list)) else expected
+                line += f"\n  Ответ: {answer}"
+            entries.append((q, line))
+        else:
+            entries.append((str(ex), f"  {ex}"))
+    return entries
 
-    # Синонимы
-    syn = ov.get("synonyms", [])
-    if syn:
-        parts.append("\nДополнительные синонимы:")
-        for s in syn:
-            raw = s.get("raw", [])
-            norm = s.get("normalized", "")
-            if isinstance(raw, str):
-                raw = [raw]
-            if raw and norm:
-                parts.append(f"- {raw} → {norm}")
-
-    # Few-shot примеры
-    examples = ov.get("few_shot_examples", [])
-    if examples:
-        parts.append("\nПримеры хороших запросов:")
-        for ex in examples[:5]:
-            if isinstance(ex, dict):
-                q = ex.get("query", ex.get("text", str(ex)))
-                parts.append(f"  Запрос: {q}")
-            else:
-                parts.append(f"  {ex}")
 
+def _templates_line(ov: dict) -> str:
     # Clarification templates (информационно)
     ct = ov.get("clarification_templates", {})
-    if ct:
-        parts.append("\nШаблоны уточнений: " + ", ".join(f"{k}={v[:30]}..." if len(str(v)) > 30 else f"{k}={v}" for k, v in list(ct.items())[:3]))
-
-    return "\n".join(parts) if parts else ""
+    if not ct or not isinstance(ct, dict):
+        return ""
+    return "\nШаблоны уточнений: " + ", ".join(
+        f"{k}={v[:30]}..." if len(str(v)) > 30 else f"{k}={v}" for k, v in list(ct.items())[:3]
+    )
 
 
 class PromptManager:
@@ -90,6 +123,17 @@ class PromptManager:
     def __init__(self) -> None:
         self._core = _load_core()
         self._overlay = _load_overlay()
+        self._cached_prompt: tuple[str, str] | None = None
+        self._cached_signature: tuple | None = None
+        self._checked_at = 0.0
+        self._synonyms: list[tuple[list[str], str]] = []
+        self._examples: list[tuple[str, str]] = []
+        self._example_index = TfidfIndex([])
+        self._templates = ""
+
+    def invalidate(self) -> None:
+        """Сбросить собранный промпт — следующий get_active_prompt перечитает файлы."""
+        self._cached_prompt = None
 
     def _ensure_prompt_versions(self) -> None:
         """Создать таблицу и начальную запись при необходимости."""
@@ -125,17 +169,90 @@ class PromptManager:
         finally:
             conn.close()
 
-    def get_active_prompt(self) -> tuple[str, str]:
-        """Вернуть (system_prompt, version)."""
+    def _refresh(self) -> None:
+        """
+        Перечитать core/overlay и перестроить индекс примеров, если файлы изменились.
+        Файлы сверяются по mtime/inode/size не чаще PROMPT_CACHE_CHECK_INTERVAL.
+        """
+        now = time.monotonic()
+        if self._cached_prompt is not None and now - self._checked_at < PROMPT_CACHE_CHECK_INTERVAL:
+            return
+        signature = (_file_signature(CORE_PATH), _file_signature(OVERLAY_PATH))
+        self._checked_at = now
+        if self._cached_prompt is not None and signature == self._cached_signature:
+            return
+
         self._core = _load_core()
         self._overlay = _load_overlay()
-        overlay_text = _render_overlay(self._overlay)
+        ov = _overlay_body(self._overlay)
+        self._synonyms = _synonym_entries(ov)
+        self._examples = _example_entries(ov)
+        self._example_index = TfidfIndex([q for q, _ in self._examples])
+        self._templates = _templates_line(ov)
         version = str(self._overlay.get("version", "1.0.0"))
-        if overlay_text:
-            full = f"{self._core}\n\n{overlay_text}"
+        self._cached_prompt = (self._assemble(None), version)
+        self._cached_signature = signature
+        logger.debug("Prompt assembled (version %s, %d examples)", version, len(self._examples))
+
+    def _assemble(self, query: str | None) -> str:
+        """
+        Ядро + overlay в пределах PROMPT_TOKEN_BUDGET.
+        Порядок заполнения: ядро, шаблоны уточнений, синонимы из запроса,
+        k похожих на запрос примеров (без запроса — первые k), остальные синонимы.
+        """
+        budget = PROMPT_TOKEN_BUDGET - _estimate_tokens(self._core)
+        if budget <= 0:
+            logger.warning("prompt_core.txt exceeds PROMPT_TOKEN_BUDGET (%d tokens)", PROMPT_TOKEN_BUDGET)
+
+        def fits(text: str) -> bool:
+            nonlocal budget
+            cost = _estimate_tokens(text)
+            if cost > budget:
+                return False
+            budget -= cost
+            return True
+
+        templates = self._templates if self._templates and fits(self._templates) else ""
+        q = (query or "").lower()
+        synonyms: set[int] = set()
+        for i, (raw, line) in enumerate(self._synonyms):
+            if q and any(r in q for r in raw) and fits(line):
+                synonyms.add(i)
+
+        if query:
+            ranked = [i for i, _ in self._example_index.most_similar(query, PROMPT_FEW_SHOT_K, PROMPT_FEW_SHOT_MIN_SCORE)]
         else:
-            full = self._core
-        return full, version
+            ranked = list(range(min(PROMPT_FEW_SHOT_K, len(self._examples))))
+        examples = [self._examples[i][1] for i in ranked if fits(self._examples[i][1])]
+
+        for i, (_, line) in enumerate(self._synonyms):
+            if i not in synonyms and fits(line):
+                synonyms.add(i)
+
+        parts = []
+        if synonyms:
+            parts.append("\nДополнительные синонимы:")
+            parts.extend(line for i, (_, line) in enumerate(self._synonyms) if i in synonyms)
+        if examples:
+            parts.append("\nПримеры хороших запросов:")
+            parts.extend(examples)
+        if templates:
+            parts.append(templates)
+        overlay_text = "\n".join(parts)
+        return f"{self._core}\n\n{overlay_text}" if overlay_text else self._core
+
+    def get_active_prompt(self, query: str | None = None) -> tuple[str, str]:
+        """
+        Вернуть (system_prompt, version).
+        С query в промпт попадают только похожие на запрос few-shot примеры (TF-IDF по символьным n-граммам)
+        и весь промпт укладывается в PROMPT_TOKEN_BUDGET. Без query — закэшированный промпт с первыми примерами.
+        """
+        self._refresh()
+        if query is None:
+            return self._cached_prompt
+        prompt = self._assemble(query)
+        metrics.observe("prompt.tokens_est", _estimate_tokens(prompt))
+        return prompt, self._cached_prompt[1]
 
     def create_new_version(
         self,
@@ -213,6 +330,8 @@ class PromptManager:
                         raise
         finally:
             conn.close()
+        self.invalidate()
+        extraction_cache.invalidate(keep_version=new_ver)
         return new_ver
 
     def rollback_to_version(self, version: str) -> None:
@@ -241,6 +360,8 @@ class PromptManager:
             conn.commit()
         finally:
             conn.close()
+        self.invalidate()
+        extraction_cache.invalidate(keep_version=str(data.get("version", version)))
 
     def get_version_history(self) -> list[dict]:
         """Список всех версий overlay."""
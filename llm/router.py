@@ -1,16 +1,229 @@
-"""Роутер LLM: только Ollama."""
+"""
+Роутер LLM: только Ollama, один или несколько инстансов (см. llm.backends).
+Модель выбирается по типу задачи (task): извлечение и уточнения — малая, свободные ответы — большая.
+"""
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
-from core.llm_adapter import call_llm, health_check
+import httpx
+
+from core import metrics
+from core.circuit_breaker import CircuitOpen
+from core.llm_adapter import (
+    TASK_GENERAL,
+    call_llm,
+    get_last_call_stats,
+    health_check as _adapter_health_check,
+    set_last_call_stats,
+    stream_llm,
+)
+from core.llm_admission import PRIORITY_NEW_QUERY, LLMSaturated, get_admission_queue
+
+from .backends import LLM_HEDGE, Backend, BackendPool, get_backend_pool
 
 logger = logging.getLogger(__name__)
 
+# Бэкенд недоступен, запрос до модели не дошёл — такой вызов один раз повторяем на другом бэкенде
+FAILOVER_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+
+async def health_check() -> dict:
+    """Состояние Ollama (основной адрес) и нагрузка по всем бэкендам."""
+    h = await _adapter_health_check()
+    h["backends"] = get_backend_pool().snapshot()
+    return h
+
+
+@asynccontextmanager
+async def _admitted(priority: int) -> AsyncIterator[float]:
+    """
+    Слот очереди допуска — на всех путях раньше аренды бэкенда (один порядок захвата, без взаимного ожидания).
+    Отдаёт срок (time.monotonic()), до которого нужно арендовать бэкенд: дольше LLM_QUEUE_TIMEOUT не ждём.
+    """
+    queue = get_admission_queue()
+    deadline = time.monotonic() + queue.max_wait
+    async with queue.slot(priority):
+        yield deadline
+
+
+def _remaining(deadline: float) -> float:
+    return max(0.0, deadline - time.monotonic())
+
+
+async def _call_backend(
+    backend: Backend,
+    prompt: str,
+    system: str,
+    timeout: int,
+    priority: int,
+    json_mode: bool,
+    prompt_version: str | None = None,
+    task: str = TASK_GENERAL,
+) -> str:
+    """Вызов на арендованном бэкенде; слот допуска уже занят вызывающим."""
+    started = time.perf_counter()
+    try:
+        result = await call_llm(
+            prompt,
+            system,
+            timeout=timeout,
+            priority=priority,
+            json_mode=json_mode,
+            base_url=backend.url,
+            prompt_version=prompt_version,
+            task=task,
+            admit=False,
+        )
+    except (LLMSaturated, CircuitOpen):
+        raise  # бэкенд тут ни при чём
+    except Exception:
+        backend.observe_failure()
+        raise
+    backend.observe((time.perf_counter() - started) * 1000)
+    return result
+
+
+async def _with_failover(pool: BackendPool, args: tuple, deadline: float, exclude: tuple[Backend, ...] = ()) -> str:
+    """
+    Вызов на лучшем доступном бэкенде (слот допуска уже занят). Недоступен (соединение не установлено) —
+    один повтор на другом; открыт circuit breaker выбранного бэкенда — пробуем следующий.
+    """
+    tried = exclude
+    failover = True
+    while True:
+        async with pool.lease(exclude=tried, timeout=_remaining(deadline)) as backend:
+            try:
+                return await _call_backend(backend, *args)
+            except CircuitOpen:
+                if not pool.usable(tried + (backend,)):
+                    raise
+            except FAILOVER_ERRORS as e:
+                if not failover or not pool.usable(tried + (backend,)):
+                    raise
+                failover = False
+                metrics.incr("llm.failover")
+                logger.warning("LLM backend %s unavailable (%s), retrying on another backend", backend.name, e)
+        tried += (backend,)
+
+
+async def _attempt(backend: Backend, *args) -> tuple[str, dict | None]:
+    """Вызов в отдельной задаче: статистику вызова возвращаем явно (contextvar задачи родителю не виден)."""
+    result = await _call_backend(backend, *args)
+    return result, get_last_call_stats()
+
+
+async def _hedged(
+    prompt: str,
+    system: str,
+    timeout: int,
+    priority: int,
+    json_mode: bool,
+    prompt_version: str | None = None,
+    task: str = TASK_GENERAL,
+) -> str:
+    """
+    Запрос на лучший бэкенд; если он не ответил за p90 — копия на другой свободный.
+    Берём первый успешный ответ, второй запрос отменяем. Слот очереди допуска — один на оба запроса.
+    """
+    pool = get_backend_pool()
+    args = (prompt, system, timeout, priority, json_mode, prompt_version, task)
+    async with _admitted(priority) as deadline, pool.lease(timeout=_remaining(deadline)) as primary:
+        first = asyncio.create_task(_attempt(primary, *args))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=pool.hedge_delay())
+            if done and isinstance(first.exception(), (CircuitOpen, *FAILOVER_ERRORS)) and pool.usable((primary,)):
+                # Основной бэкенд недоступен сразу — ждать hedge незачем
+                metrics.incr("llm.failover")
+                return await _with_failover(pool, args, deadline, exclude=(primary,))
+            secondary = None if done else pool.pick(exclude=(primary,))
+            if secondary is None:
+                result, stats = await first
+                set_last_call_stats(stats)
+                return result
+            metrics.incr("llm.hedge.fired")
+            async with pool.lease(secondary):
+                second = asyncio.create_task(_attempt(secondary, *args))
+                tasks.append(second)
+                pending = set(tasks)
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            if task is second:
+                                metrics.incr("llm.hedge.won")
+                            result, stats = task.result()
+                            set_last_call_stats(stats)
+                            return result
+                # Оба запроса упали — ошибка основного информативнее
+                return first.result()[0]
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def generate(
+    prompt: str,
+    system: str = "",
+    timeout: int = 45,
+    priority: int = PRIORITY_NEW_QUERY,
+    json_mode: bool = False,
+    prompt_version: str | None = None,
+    task: str = TASK_GENERAL,
+) -> str:
+    """
+    Вызов LLM — только Ollama. json_mode — структурированный ответ (один JSON-объект).
+    prompt_version попадает в статистику вызова (debug_logs, llm_call).
+    task — TASK_EXTRACTION / TASK_CLARIFICATION / TASK_GENERAL: модель и метрики llm.task.<task>.*.
+    """
+    pool = get_backend_pool()
+    if LLM_HEDGE and len(pool.backends) > 1:
+        return await _hedged(prompt, system, timeout, priority, json_mode, prompt_version, task)
+    async with _admitted(priority) as deadline:
+        return await _with_failover(pool, (prompt, system, timeout, priority, json_mode, prompt_version, task), deadline)
+
+
+async def _stream(
+    prompt: str, system: str, timeout: int, priority: int, prompt_version: str | None, task: str
+) -> AsyncIterator[str]:
+    pool = get_backend_pool()
+    async with _admitted(priority) as deadline, pool.lease(timeout=_remaining(deadline)) as backend:
+        try:
+            async for piece in stream_llm(
+                prompt,
+                system,
+                timeout=timeout,
+                priority=priority,
+                base_url=backend.url,
+                prompt_version=prompt_version,
+                task=task,
+                admit=False,
+            ):
+                yield piece
+        except (LLMSaturated, CircuitOpen):
+            raise
+        except Exception:
+            backend.observe_failure()
+            raise
+
 
-async def generate(prompt: str, system: str = "", timeout: int = 45) -> str:
-    """Вызов LLM — только Ollama."""
-    return await call_llm(prompt, system, timeout=timeout)
+def generate_stream(
+    prompt: str,
+    system: str = "",
+    timeout: int = 45,
+    priority: int = PRIORITY_NEW_QUERY,
+    prompt_version: str | None = None,
+    task: str = TASK_GENERAL,
+) -> AsyncIterator[str]:
+    """Потоковый вызов LLM: фрагменты ответа по мере генерации."""
+    return _stream(prompt, system, timeout, priority, prompt_version, task)
 
 
-__all__ = ["generate", "health_check"]
+__all__ = ["generate", "generate_stream", "health_check"]
@@ -6,6 +6,8 @@ from pathlib import Path
 
 import yaml
 
+from core import extraction_cache
+
 logger = logging.getLogger(__name__)
 
 _root = Path(__file__).resolve().parent.parent
@@ -135,5 +137,8 @@ async def apply_safe_adaptation(suggestions: list[dict]) -> str:
         data["version"] = new_ver
         data["change_source"] = "auto_feedback"
         _save_overlay(data)
+        from llm.prompt_manager import get_prompt_manager
+        get_prompt_manager().invalidate()
+        extraction_cache.invalidate(keep_version=new_ver)
         return new_ver
     return version
@@ -0,0 +1,84 @@
+"""Прогрев модели Ollama при старте и периодический пинг, чтобы модель не выгружалась в часы трафика."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from core import keep_warm, metrics
+from core.http_pool import get_http_client
+from core.keep_warm import LLM_WARMUP_TIMEOUT, stop_keep_warm  # noqa: F401 — stop_keep_warm для bot.py
+from core.llm_adapter import LLM_COLD_LOAD_MS, OLLAMA_KEEP_ALIVE, TASK_MODELS, last_used
+from core.logger import log_event_to_db
+
+from .backends import Backend, get_backend_pool
+
+logger = logging.getLogger(__name__)
+
+
+def _models() -> list[str]:
+    """Все модели из маршрутизации по задачам (малая и большая), без повторов."""
+    return list(dict.fromkeys(TASK_MODELS.values()))
+
+
+async def warm_up_backend(backend: Backend, model: str, reason: str = "startup") -> dict:
+    """
+    Загрузить модель на бэкенде пустым запросом (Ollama только загружает модель, без генерации)
+    и продлить её keep_alive. Долгий ответ — модель была выгружена: считаем холодную загрузку.
+    """
+    started = time.perf_counter()
+    event = {"base_url": backend.url, "model": model, "reason": reason}
+    try:
+        r = await get_http_client().post(
+            f"{backend.url}/api/generate",
+            json={"model": model, "prompt": "", "stream": False, "keep_alive": OLLAMA_KEEP_ALIVE},
+            timeout=LLM_WARMUP_TIMEOUT,
+        )
+        r.raise_for_status()
+    except Exception as e:
+        metrics.incr("llm.warmup.failed")
+        event["error"] = type(e).__name__
+        logger.warning("LLM warm-up of %s failed on %s: %s", model, backend.url, e)
+        await log_event_to_db("llm_warmup", event)
+        return event
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    event["latency_ms"] = elapsed_ms
+    event["cold_load"] = elapsed_ms >= LLM_COLD_LOAD_MS
+    metrics.incr("llm.warmup.ok")
+    metrics.observe("llm.warmup_ms", elapsed_ms)
+    if event["cold_load"]:
+        metrics.incr("llm.warmup.cold_load")
+        logger.info("LLM model %s loaded on %s in %.0f ms (%s)", model, backend.url, elapsed_ms, reason)
+    await log_event_to_db("llm_warmup", event, llm_backend=model, latency_ms=int(elapsed_ms))
+    return event
+
+
+async def warm_up(reason: str = "startup") -> list[dict]:
+    """Прогреть все модели на всех бэкендах (бэкенды параллельно, модели на бэкенде — по очереди)."""
+
+    async def one(backend: Backend) -> list[dict]:
+        return [await warm_up_backend(backend, model, reason) for model in _models()]
+
+    per_backend = await asyncio.gather(*(one(b) for b in get_backend_pool().backends))
+    return [event for events in per_backend for event in events]
+
+
+def _needs_ping(backend: Backend, model: str, interval: float) -> bool:
+    """Модель с недавним вызовом на бэкенде и так держится в памяти (keep_alive продлён) — пинг не нужен."""
+    if backend.outstanding:
+        return False
+    used = last_used(backend.url, model)
+    return used is None or time.monotonic() - used >= interval
+
+
+async def ping_idle(interval: float) -> None:
+    """Пинг пар (бэкенд, модель), к которым не обращались дольше interval."""
+    idle = [(b, m) for b in get_backend_pool().backends for m in _models() if _needs_ping(b, m, interval)]
+    if idle:
+        metrics.incr("llm.warmup.ping", len(idle))
+        await asyncio.gather(*(warm_up_backend(b, m, "ping") for b, m in idle))
+
+
+def start_keep_warm() -> asyncio.Task | None:
+    """Прогрев всех бэкендов при старте и пинг простаивающих в часы трафика (цикл — core.keep_warm)."""
+    return keep_warm.start_keep_warm(warm_up, ping_idle)
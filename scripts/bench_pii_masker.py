@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк маскирования PII: прежняя реализация (три re.sub по строковым шаблонам) против
+core.pii_masker (один скомпилированный шаблон + префильтр + пакетный API).
+
+    python scripts/bench_pii_masker.py                 # синтетический корпус
+    python scripts/bench_pii_masker.py --from-db       # сообщения из dialogue_cycles
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if sys.platform == "win32":
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception:
+        pass
+
+from core.pii_masker import mask_pii, mask_pii_batch
+
+_LEGACY_PATTERNS = [
+    (r"\b\+7[\s\-]?\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}\b", "[PHONE]"),
+    (r"\b8[\s\-]?\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}\b", "[PHONE]"),
+    (r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b", "[EMAIL]"),
+]
+
+
+def legacy_mask_pii(text: str) -> str:
+    if not text:
+        return text
+    for pattern, replacement in _LEGACY_PATTERNS:
+        text = re.sub(pattern, replacement, text)
+    return text
+
+
+_PLAIN = [
+    "нужны тормозные колодки передние",
+    "стук в подвеске при повороте",
+    "замена масла и фильтра",
+    "свечи зажигания на киа рио",
+    "сколько стоит ремень грм",
+]
+_WITH_DIGITS = [
+    "колодки на камри 50 2015 года",
+    "то на 60к пробега, солярис 2017",
+    "фильтр салона kia rio 2019",
+]
+_WITH_PII = [
+    "перезвоните 8 (999) 123-45-67, нужны колодки",
+    "мой номер +7 912 345 67 89",
+    "пришлите счёт на ivan.petrov@example.ru",
+]
+
+
+def synthetic_corpus(size: int, pii_share: float, seed: int = 7) -> list[str]:
+    """Типичный поток: большинство запросов без PII, часть с годом/пробегом, доля pii_share — с телефоном/email."""
+    rnd = random.Random(seed)
+    texts = []
+    for _ in range(size):
+        r = rnd.random()
+        pool = _WITH_PII if r < pii_share else _WITH_DIGITS if r < pii_share + 0.3 else _PLAIN
+        texts.append(rnd.choice(pool))
+    return texts
+
+
+def db_corpus(limit: int) -> list[str]:
+    from storage.feedback_repository import DB_PATH
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        rows = conn.execute(
+            "SELECT all_messages_json, all_bot_responses_json FROM dialogue_cycles ORDER BY started_at DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+    finally:
+        conn.close()
+    texts = []
+    for row in rows:
+        for raw in row:
+            try:
+                texts.extend(str(t) for t in json.loads(raw or "[]") if t)
+            except json.JSONDecodeError:
+                continue
+    return texts
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size", type=int, default=20000)
+    ap.add_argument("--pii-share", type=float, default=0.05, help="доля текстов с телефоном/email")
+    ap.add_argument("--from-db", action="store_true", help="корпус из dialogue_cycles вместо синтетического")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    texts = db_corpus(args.size) if args.from_db else synthetic_corpus(args.size, args.pii_share)
+    if not texts:
+        print("Корпус пуст")
+        return
+
+    results = {
+        "legacy": _timed(lambda: [legacy_mask_pii(t) for t in texts], args.repeat),
+        "mask_pii": _timed(lambda: [mask_pii(t) for t in texts], args.repeat),
+        "mask_pii_batch": _timed(lambda: list(mask_pii_batch(texts)), args.repeat),
+    }
+    print(f"Текстов: {len(texts)}, лучший из {args.repeat} прогонов")
+    for name, seconds in results.items():
+        print(
+            f"  {name:<15} {seconds * 1000:8.1f} мс  {seconds / len(texts) * 1e6:6.2f} мкс/текст"
+            f"  x{results['legacy'] / seconds:.1f}"
+        )
+
+    diffs = [(t, legacy_mask_pii(t), mask_pii(t)) for t in dict.fromkeys(texts) if legacy_mask_pii(t) != mask_pii(t)]
+    print(f"Расхождений с прежней реализацией: {len(diffs)} уникальных текстов")
+    for text, old, new in diffs[:5]:
+        print(f"  {text!r}\n    было:  {old!r}\n    стало: {new!r}")
+
+
+if __name__ == "__main__":
+    main()
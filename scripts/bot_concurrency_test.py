@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Тест конкурентной обработки сообщений бота без Telegram, Ollama и прайсов:
+коалесинг одинаковых запросов, inline-подсказки во время перестройки индекса,
+сериализация по чату, отбрасывание спекулятивного поиска.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if sys.platform == "win32":
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception:
+        pass
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bot_concurrency_test.db")
+
+from apps.telegram_bot.handlers import messages  # noqa: E402
+from core import metrics  # noqa: E402
+
+
+def check(ok: bool, message: str) -> bool:
+    print(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+
+class patched:
+    """Временно подменить атрибуты модуля messages."""
+
+    def __init__(self, **attrs) -> None:
+        self.attrs = attrs
+        self.saved: dict = {}
+
+    def __enter__(self) -> None:
+        for name, value in self.attrs.items():
+            self.saved[name] = getattr(messages, name)
+            setattr(messages, name, value)
+
+    def __exit__(self, *exc) -> None:
+        for name, value in self.saved.items():
+            setattr(messages, name, value)
+
+
+async def test_coalescing() -> list[bool]:
+    """Одинаковые одновременные сообщения — одно извлечение и один поиск; разные — по отдельности."""
+    extract_calls: list[str] = []
+    search_calls: list[dict] = []
+
+    async def fake_extract(query: str, car_context: dict, clarification_answers, priority: int) -> dict:
+        extract_calls.append(query)
+        await asyncio.sleep(0.1)
+        return {"intent": "parts_search", "part_type": "тормозные колодки", "query": query}
+
+    def fake_search(**params) -> list:
+        search_calls.append(params)
+        time.sleep(0.1)
+        return [{"article": "GDB3332", "query": params["query"]}]
+
+    car = {"brand": "Kia", "model": "Rio"}
+    with patched(extract_intent_and_slots=fake_extract, search=fake_search):
+        extracted = await asyncio.gather(
+            *(messages._coalesced_extract("колодки kia rio", car, None) for _ in range(5)),
+            messages._coalesced_extract("КОЛОДКИ kia rio ", {"brand": "kia", "model": "rio"}, None),
+            messages._coalesced_extract("фильтр салонный", car, None),
+        )
+        found = await asyncio.gather(
+            *(messages._coalesced_search(query="тормозные колодки", article="", oem="", brand="", max_results=50)
+              for _ in range(4)),
+        )
+    return [
+        check(len(extract_calls) == 2, f"7 сообщений, 2 разных запроса → {len(extract_calls)} извлечения"),
+        check(all(r["query"] == "колодки kia rio" for r in extracted[:6]), "регистр и пробелы не дробят ключ"),
+        check(extracted[0] is not extracted[1], "каждому сообщению своя копия результата"),
+        check(len(search_calls) == 1 and all(f == found[0] for f in found), f"4 поиска → {len(search_calls)} вызов search"),
+    ]
+
+
+async def test_inline_refresh() -> list[bool]:
+    """Inline-подсказки отвечают из текущего индекса, не дожидаясь перестройки; перестройка — одна за раз."""
+    from apps.telegram_bot.handlers import inline
+    from core.catalog_index import CatalogIndex, IndexEntry
+
+    index = CatalogIndex()
+    entry = IndexEntry(
+        id=1, is_defect=False, article="GDB3332", brand="TRW", nomenclature="Колодки тормозные передние",
+        price=2500.0, in_stock="да", article_key="GDB3332",
+    )
+    index._entries = [entry]
+    index._keys = sorted(["GDB3332", "trw", "колодки", "тормозные", "передние"])
+    index._postings = [0] * len(index._keys)
+    refreshes: list[float] = []
+
+    def slow_refresh() -> bool:
+        refreshes.append(time.monotonic())
+        time.sleep(0.3)
+        return False
+
+    index.needs_check = lambda: True
+    index.refresh_if_changed = slow_refresh
+    answers: list[tuple[list, float]] = []
+
+    def query(text: str) -> SimpleNamespace:
+        async def answer(results, **kwargs) -> None:
+            answers.append((results, time.monotonic()))
+        return SimpleNamespace(query=text, answer=answer)
+
+    saved = inline.get_catalog_index
+    inline.get_catalog_index = lambda: index
+    try:
+        began = time.monotonic()
+        await asyncio.gather(inline.handle_inline_query(query("gdb33")), inline.handle_inline_query(query("колод")))
+        answered = max(t for _, t in answers) - began
+        await inline._refresh_task
+    finally:
+        inline.get_catalog_index = saved
+    titles = [[r.title for r in results] for results, _ in answers]
+    return [
+        check(titles == [["TRW GDB3332"], ["TRW GDB3332"]], f"подсказки по артикулу и по слову: {titles}"),
+        check(answered < 0.15, f"ответ за {answered * 1000:.0f} мс, перестройка (300 мс) не ждали"),
+        check(len(refreshes) == 1, f"одновременные запросы запустили {len(refreshes)} перестройку"),
+    ]
+
+
+async def test_chat_serialization() -> list[bool]:
+    """Сообщения одного чата обрабатываются по очереди, другой чат в это время не ждёт."""
+    spans: dict[str, tuple[float, float]] = {}
+
+    async def fake_impl(message, state) -> None:
+        start = time.monotonic()
+        await asyncio.sleep(0.2)
+        spans[message.text] = (start, time.monotonic())
+
+    def msg(chat_id: int, text: str) -> SimpleNamespace:
+        return SimpleNamespace(chat=SimpleNamespace(id=chat_id), text=text)
+
+    with patched(_handle_message_impl=fake_impl):
+        began = time.monotonic()
+        await asyncio.gather(
+            messages.handle_message(msg(1, "a1"), None),
+            messages.handle_message(msg(1, "a2"), None),
+            messages.handle_message(msg(2, "b1"), None),
+        )
+        elapsed = time.monotonic() - began
+    a1, a2, b1 = spans["a1"], spans["a2"], spans["b1"]
+    return [
+        check(a2[0] >= a1[1], "второе сообщение чата 1 началось после окончания первого"),
+        check(b1[0] < a1[1], "чат 2 обработан параллельно с чатом 1"),
+        check(elapsed < 0.55, f"итого {elapsed:.2f} с (≈2 прогона, а не 3)"),
+    ]
+
+
+async def test_speculation_discarded() -> list[bool]:
+    """Итоговые слоты разошлись со спекулятивными — спекулятивный поиск отменяется, ищем по итоговым."""
+    searched: list[str] = []
+
+    def fake_search(**params) -> list:
+        searched.append(params["query"])
+        time.sleep(0.2)
+        return [{"query": params["query"]}]
+
+    with patched(search=fake_search, SPECULATIVE_SEARCH=True):
+        speculation = messages._start_speculative_search("колодки kia rio 2017", "колодки kia rio 2017", {}, None)
+        results = [check(speculation is not None, "по «колодки kia rio 2017» запущен спекулятивный поиск")]
+        if speculation is None:
+            return results
+        task, params = speculation
+        final = {"intent": "parts_search", "part_type": "тормозные диски", "part_query": "тормозные диски"}
+        final_params = messages._search_params(final, "колодки kia rio 2017", "колодки kia rio 2017", {})
+        results.append(check(final_params != params, f"слоты разошлись: {params['query']} ≠ {final_params['query']}"))
+
+        misses = metrics.get_counter("speculation.miss")
+        messages._discard_speculation(speculation)
+        items = await messages._coalesced_search(**final_params)
+        await asyncio.sleep(0)
+        results += [
+            check(task.cancelled(), "спекулятивная задача отменена"),
+            check(metrics.get_counter("speculation.miss") == misses + 1, "учтён speculation.miss"),
+            check(items == [{"query": "тормозные диски"}], "пользователь получил результат по итоговым слотам"),
+        ]
+        messages._discard_speculation(None)  # нечего отменять — без ошибок и метрик
+        results.append(check(metrics.get_counter("speculation.miss") == misses + 1, "None не считается промахом"))
+    return results
+
+
+async def run() -> list[bool]:
+    results = await test_coalescing() + await test_inline_refresh()
+    return results + await test_chat_serialization() + await test_speculation_discarded()
+
+
+def main() -> int:
+    print("=== BOT CONCURRENCY TEST ===\n")
+    results = asyncio.run(run())
+    print(f"\n{sum(results)}/{len(results)} OK")
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Тест кэша извлечения без Ollama: чтение не пишет в SQLite, попадания сохраняются со следующей записью."""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if sys.platform == "win32":
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception:
+        pass
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "extraction_cache_test.db")
+
+
+def check(ok: bool, message: str) -> bool:
+    print(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+
+def _db_digest() -> str:
+    with open(os.environ["DB_PATH"], "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _hits(key: str) -> int:
+    conn = sqlite3.connect(os.environ["DB_PATH"])
+    try:
+        return conn.execute("SELECT hits FROM llm_extraction_cache WHERE key = ?", (key,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+async def run() -> list[bool]:
+    from core import extraction_cache
+
+    result = {"intent": "parts_search", "part_type": "тормозные колодки"}
+    key = extraction_cache.make_cache_key("колодки kia rio", None, None, "v1", "small")
+    await extraction_cache.aput(key, result, "v1", "small")
+    extraction_cache._memory.clear()  # как после рестарта: в памяти пусто, запись только в SQLite
+
+    before = _db_digest()
+    first = await extraction_cache.aget(key)
+    second = extraction_cache.get(key)
+    results = [
+        check(first == result and second == result, "попадание с диска и затем из памяти"),
+        check(_db_digest() == before, "чтение не изменило файл SQLite (ни UPDATE, ни commit)"),
+        check(_hits(key) == 0 and extraction_cache._pending_hits.get(key) == 2, "попадания пока копятся в памяти"),
+    ]
+
+    other = extraction_cache.make_cache_key("фильтр масляный", None, None, "v1", "small")
+    await extraction_cache.aput(other, {"intent": "parts_search"}, "v1", "small")
+    results.append(check(
+        _hits(key) == 2 and not extraction_cache._pending_hits,
+        "следующая запись сохранила накопленные hits",
+    ))
+
+    saved = extraction_cache.EXTRACTION_CACHE_HITS_FLUSH
+    extraction_cache.EXTRACTION_CACHE_HITS_FLUSH = 3
+    try:
+        for _ in range(3):
+            await extraction_cache.aget(other)
+        await asyncio.sleep(0.2)  # сброс идёт в фоне
+        results.append(check(_hits(other) == 3, "набралось EXTRACTION_CACHE_HITS_FLUSH — сброс без записи"))
+    finally:
+        extraction_cache.EXTRACTION_CACHE_HITS_FLUSH = saved
+
+    missing = await extraction_cache.aget(extraction_cache.make_cache_key("нет", None, None, "v1", "small"))
+    results.append(check(missing is None, "промах → None"))
+    return results
+
+
+def main() -> int:
+    print("=== EXTRACTION CACHE TEST ===\n")
+    results = asyncio.run(run())
+    print(f"\n{sum(results)}/{len(results)} OK")
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
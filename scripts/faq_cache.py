@@ -0,0 +1,146 @@
+"""
+FAQ-кэш ответов на общие вопросы: просмотр, правка оператором, предзаполнение из debug_logs.
+
+    python scripts/faq_cache.py list
+    python scripts/faq_cache.py add "как часто менять масло" "Обычно каждые 10–15 тыс. км или раз в год…"
+    python scripts/faq_cache.py edit 12 "Исправленный ответ"
+    python scripts/faq_cache.py delete 12
+    python scripts/faq_cache.py purge                          # удалить истёкшие ответы LLM
+    python scripts/faq_cache.py prepopulate --days 30 --top 50  # частые общие вопросы → ответы LLM
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+from collections import Counter
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _root not in sys.path:
+    sys.path.insert(0, _root)
+if sys.platform == "win32":
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception:
+        pass
+
+from core.faq_cache import GENERAL_QUESTION_SYSTEM, SOURCE_PREPOPULATED, FaqCache, mentions_car, question_key
+from core.logger import DB_PATH
+
+
+def frequent_general_questions(days: int, top: int, min_count: int) -> list[tuple[str, int]]:
+    """
+    Самые частые общие вопросы из debug_logs: уже отвеченные (general_answer) и запросы (query_created),
+    которые rule-based разбор относит к general_question. Вопросы с маркой, моделью или годом пропускаются.
+    """
+    from core.intent import rule_extract
+
+    if not os.path.exists(DB_PATH):
+        return []
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        rows = conn.execute(
+            """SELECT event_type, payload_json FROM debug_logs
+               WHERE event_type IN ('general_answer', 'query_created') AND created_at >= datetime('now', ?)""",
+            (f"-{days} days",),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []  # таблицы ещё нет
+    finally:
+        conn.close()
+    answered: Counter = Counter()
+    queries: Counter = Counter()
+    for event_type, payload in rows:
+        try:
+            q = question_key(json.loads(payload or "{}").get("query") or "")
+        except (json.JSONDecodeError, AttributeError):
+            continue
+        if q and not mentions_car(q):
+            (answered if event_type == "general_answer" else queries)[q] += 1
+    counts = Counter(answered)
+    for q, n in queries.items():
+        if q not in answered and rule_extract(q)[0].get("intent") == "general_question":
+            counts[q] = n
+    return [(q, n) for q, n in counts.most_common(top) if n >= min_count]
+
+
+async def prepopulate(cache: FaqCache, args: argparse.Namespace) -> None:
+    from core.llm_adapter import TASK_GENERAL, call_llm
+
+    candidates = frequent_general_questions(args.days, args.top, args.min_count)
+    if not candidates:
+        print("В debug_logs нет частых общих вопросов")
+        return
+    added = 0
+    for question, count in candidates:
+        hit = cache.lookup(question, count_hit=False)
+        if hit is not None:
+            print(f"  = ({count}) {question}  → уже есть #{hit[0].id} ({hit[1]:.2f})")
+            continue
+        if args.dry_run:
+            print(f"  + ({count}) {question}")
+            continue
+        try:
+            answer = await call_llm(prompt=question, system=GENERAL_QUESTION_SYSTEM, timeout=90, task=TASK_GENERAL)
+        except Exception as e:
+            print(f"  ! ({count}) {question}: {e}")
+            continue
+        cache.store(question, str(answer or ""), source=SOURCE_PREPOPULATED)
+        added += 1
+        print(f"  + ({count}) {question}")
+    print(f"Добавлено ответов: {added} из {len(candidates)} вопросов")
+
+
+def print_entries(cache: FaqCache, include_expired: bool) -> None:
+    entries = cache.all_entries(include_expired=include_expired)
+    if not entries:
+        print("FAQ-кэш пуст")
+        return
+    for e in entries:
+        expires = e.expires_at or "без срока"
+        answer = e.answer.replace("\n", " ")
+        print(f"#{e.id} [{e.source}, {e.hits} попаданий, до {expires}] {e.question}\n    {answer[:150]}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("list")
+    p.add_argument("--all", action="store_true", help="вместе с истёкшими")
+    p = sub.add_parser("add", help="ответ оператора (без TTL)")
+    p.add_argument("question")
+    p.add_argument("answer")
+    p = sub.add_parser("edit", help="исправить ответ записи (станет записью оператора)")
+    p.add_argument("id", type=int)
+    p.add_argument("answer")
+    p = sub.add_parser("delete")
+    p.add_argument("id", type=int)
+    sub.add_parser("purge", help="удалить истёкшие ответы")
+    p = sub.add_parser("prepopulate", help="ответить на частые общие вопросы из debug_logs")
+    p.add_argument("--days", type=int, default=30)
+    p.add_argument("--top", type=int, default=50)
+    p.add_argument("--min-count", type=int, default=2)
+    p.add_argument("--dry-run", action="store_true", help="только показать вопросы, без вызова LLM")
+    args = ap.parse_args()
+
+    cache = FaqCache()
+    cache.load()
+    if args.command == "list":
+        print_entries(cache, args.all)
+    elif args.command == "add":
+        print(f"Сохранено: #{cache.put_operator(args.question, args.answer)}")
+    elif args.command == "edit":
+        print("Исправлено" if cache.edit(args.id, args.answer) else f"Нет записи #{args.id}")
+    elif args.command == "delete":
+        print("Удалено" if cache.delete(args.id) else f"Нет записи #{args.id}")
+    elif args.command == "purge":
+        print(f"Удалено истёкших: {cache.purge_expired()}")
+    elif args.command == "prepopulate":
+        asyncio.run(prepopulate(cache, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""Тест разбора intent без Ollama: быстрый путь по правилам, его границы и защита от вырожденного классификатора, дозаполнение слотов."""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if sys.platform == "win32":
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception:
+        pass
+
+# Разбор пишет события в debug_logs — не в рабочую БД
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "intent_test.db")
+
+
+def check(ok: bool, message: str) -> bool:
+    print(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+
+def test_greetings() -> list[bool]:
+    """Приветствие — быстрый путь, только если в сообщении нет детали и авто; «хай» — целым словом."""
+    from core.intent import RULE_FASTPATH_THRESHOLD, rule_extract
+
+    results = []
+    for query in ("привет", "здравствуйте", "спасибо большое", "хай"):
+        result, confidence = rule_extract(query)
+        results.append(check(
+            result["intent"] == "general_question" and confidence >= RULE_FASTPATH_THRESHOLD,
+            f"«{query}» → {result['intent']} ({confidence})",
+        ))
+    for query in ("привет нужны колодки", "салют, фильтр салонный", "хайлендер колодки"):
+        result, confidence = rule_extract(query)
+        results.append(check(
+            result["intent"] == "parts_search" and confidence < RULE_FASTPATH_THRESHOLD,
+            f"«{query}» → {result['intent']} ({confidence}), не приветствие",
+        ))
+    return results
+
+
+def test_generic_part_stems() -> list[bool]:
+    """Общая основа («тормоз», «масл») не даёт быстрого пути, однозначная деталь — даёт."""
+    from core.intent import RULE_FASTPATH_THRESHOLD, rule_extract
+
+    results = []
+    for query in ("тормозные диски kia rio 2017", "моторное масло для toyota camry 2015"):
+        _, confidence = rule_extract(query)
+        results.append(check(confidence < RULE_FASTPATH_THRESHOLD, f"«{query}»: {confidence} — ниже порога"))
+    result, confidence = rule_extract("колодки kia rio 2017")
+    results.append(check(
+        result["part_type"] == "тормозные колодки" and confidence >= RULE_FASTPATH_THRESHOLD,
+        f"«колодки kia rio 2017»: {result['part_type']} ({confidence})",
+    ))
+    return results
+
+
+def test_one_class_classifier() -> list[bool]:
+    """Классификатор, обученный на одном intent, не обучается, не загружается и не перехватывает разбор."""
+    import core.intent_classifier as intent_classifier
+    from core.intent import _classifier_extract, rule_extract
+    from core.intent_classifier import IntentClassifier, LinearHead, featurize, train
+
+    samples = [{"text": f"колодки kia rio {2010 + i}", "intent": "parts_search", "part_type": "тормозные колодки"}
+               for i in range(10)]
+    results = []
+    try:
+        train(samples)
+        results.append(check(False, "train() на одном intent должен отказать"))
+    except ValueError:
+        results.append(check(True, "train() на одном intent → ValueError"))
+
+    head = LinearHead.fit([featurize(s["text"]) for s in samples], [s["intent"] for s in samples])
+    clf = IntentClassifier({"intent": head})
+    results.append(check(clf.predict("как проехать к вам")["intent"][1] == 1.0, "одноклассовая голова уверена на 1.0"))
+    path = os.path.join(tempfile.mkdtemp(), "intent_classifier.json")
+    clf.save(path)
+    saved = (intent_classifier.INTENT_CLASSIFIER_PATH, intent_classifier._classifier, intent_classifier._loaded)
+    intent_classifier.INTENT_CLASSIFIER_PATH = path
+    intent_classifier._classifier, intent_classifier._loaded = None, False
+    try:
+        results.append(check(intent_classifier.get_intent_classifier() is None, "одноклассовый артефакт не загружен"))
+        query = "как проехать к вам"
+        results.append(check(_classifier_extract(query, rule_extract(query)[0]) is None, f"«{query}»: классификатор молчит"))
+        intent_classifier._classifier, intent_classifier._loaded = clf, True
+        results.append(check(
+            _classifier_extract(query, rule_extract(query)[0]) is None,
+            "уже загруженная одноклассовая голова тоже не решает за разбор",
+        ))
+    finally:
+        intent_classifier.INTENT_CLASSIFIER_PATH, intent_classifier._classifier, intent_classifier._loaded = saved
+    return results
+
+
+def test_slot_fill() -> list[bool]:
+    """Дозаполнение: LLM спрашивают только о пустых слотах, кривой ответ не ломает разбор, известное не затирается."""
+    import asyncio
+
+    import core.intent as intent
+    from core.intent import _unfilled_slots, fill_missing_slots
+
+    prompts: list[str] = []
+    replies: list[object] = []
+
+    async def fake_llm(prompt: str, **kwargs) -> str:
+        prompts.append(prompt)
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def run(last_result: dict, answer: str) -> dict | None:
+        return asyncio.run(fill_missing_slots(last_result, answer))
+
+    last = {
+        "intent": "parts_search",
+        "part_type": "тормозные колодки",
+        "car_context": {"brand": "Kia", "model": "Rio"},
+        "missing_critical": ["brand", "model", "year"],
+    }
+    results = [check(
+        _unfilled_slots(["brand", "model", "year"], {"brand": "Kia"}, None) == ["year"],
+        "_unfilled_slots: марки достаточно, остаётся только год",
+    )]
+    saved = intent.llm_generate
+    intent.llm_generate = fake_llm
+    try:
+        replies[:] = ['{"year": "2017", "brand": "Toyota", "model": "Camry"}']
+        result = run(last, "семнадцатого года")
+        fields = prompts[-1].split("Ответ пользователя")[0] if prompts else ""
+        results.append(check(
+            "- year:" in fields and "- brand:" not in fields and "- model:" not in fields,
+            "в промпте только незаполненный year",
+        ))
+        car = (result or {}).get("car_context") or {}
+        results.append(check(
+            car == {"brand": "Kia", "model": "Rio", "year": "2017"},
+            f"год дозаполнен, Kia Rio не затёрты лишними полями ответа: {car}",
+        ))
+
+        prompts.clear()
+        result = run({**last, "missing_critical": ["year"]}, "toyota 2015")
+        car = (result or {}).get("car_context") or {}
+        results.append(check(
+            not prompts and car.get("brand") == "Kia" and car.get("year") == "2015",
+            f"правила дозаполнили год без LLM, марка из прошлого разбора осталась: {car}",
+        ))
+
+        for reply in ("не JSON {{", '["2017"]', '{"year": {"value": 2017}}', '{"year": "давно"}',
+                      TimeoutError("llm timeout")):
+            replies[:] = [reply]
+            try:
+                result = run(last, "ну тот самый")
+                results.append(check(result is None, f"ответ LLM {reply!r} → нужен полный разбор"))
+            except Exception as e:
+                results.append(check(False, f"ответ LLM {reply!r} уронил дозаполнение: {e!r}"))
+        replies[:] = ['{"part_type": ["колодки", "диски"]}']
+        result = run({**last, "part_type": "", "missing_critical": ["part_type"]}, "ну ту штуку")
+        results.append(check(result is None, "список вместо названия детали не попадает в part_type"))
+    finally:
+        intent.llm_generate = saved
+    return results
+
+
+def main() -> int:
+    print("=== INTENT RULES TEST ===\n")
+    results = test_greetings() + test_generic_part_stems() + test_one_class_classifier() + test_slot_fill()
+    print(f"\n{sum(results)}/{len(results)} OK")
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Отчёт по вызовам LLM (debug_logs, llm_call): токены/с, холодные загрузки, перцентили латентности по версии промпта и модели."""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+from collections import defaultdict
+from datetime import datetime
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys_path = _root not in __import__("sys").path and _root or None
+if sys_path:
+    __import__("sys").path.insert(0, _root)
+
+from core.logger import DB_PATH
+from core.metrics import percentile
+
+
+def load_calls(days: int) -> list[dict]:
+    if not os.path.exists(DB_PATH):
+        return []
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        rows = conn.execute(
+            """SELECT payload_json, latency_ms FROM debug_logs
+               WHERE event_type = 'llm_call' AND created_at >= datetime('now', ?)""",
+            (f"-{days} days",),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []  # таблицы ещё нет
+    finally:
+        conn.close()
+    calls = []
+    for payload, latency_ms in rows:
+        try:
+            call = json.loads(payload or "{}")
+        except json.JSONDecodeError:
+            continue
+        if latency_ms is not None:
+            call.setdefault("latency_ms", latency_ms)
+        calls.append(call)
+    return calls
+
+
+def _values(calls: list[dict], key: str) -> list[float]:
+    return [c[key] for c in calls if isinstance(c.get(key), (int, float))]
+
+
+def _avg(values: list[float]) -> float | None:
+    return round(sum(values) / len(values), 1) if values else None
+
+
+def _p(values: list[float], q: float) -> float | None:
+    return round(percentile(values, q), 1) if values else None
+
+
+def build_report(calls: list[dict]) -> list[dict]:
+    groups: dict[tuple[str, str], list[dict]] = defaultdict(list)
+    for c in calls:
+        groups[(c.get("prompt_version") or "-", c.get("model") or "-")].append(c)
+    report = []
+    for (version, model), items in sorted(groups.items()):
+        ok = [c for c in items if not c.get("error")]
+        latency = _values(ok, "latency_ms")
+        tps = _values(ok, "tokens_per_s")
+        report.append({
+            "prompt_version": version,
+            "model": model,
+            "calls": len(items),
+            "errors": len(items) - len(ok),
+            "avg_prompt_tokens": _avg(_values(ok, "prompt_eval_count")),
+            "avg_output_tokens": _avg(_values(ok, "eval_count")),
+            "tokens_per_s_p50": _p(tps, 0.5),
+            "tokens_per_s_min": round(min(tps), 1) if tps else None,
+            "prompt_eval_ms_p50": _p(_values(ok, "prompt_eval_ms"), 0.5),
+            "first_token_ms_p50": _p(_values(ok, "first_token_ms"), 0.5),
+            "cold_loads": sum(1 for c in ok if c.get("cold_load")),
+            "load_ms_max": max(_values(ok, "load_ms"), default=None),
+            "latency_ms_p50": _p(latency, 0.5),
+            "latency_ms_p95": _p(latency, 0.95),
+            "latency_ms_p99": _p(latency, 0.99),
+        })
+    return report
+
+
+def _fmt(value) -> str:
+    return "-" if value is None else str(value)
+
+
+def print_report(report: list[dict], days: int) -> None:
+    print(f"Вызовы LLM за {days} дн.")
+    if not report:
+        print("  нет данных (события llm_call в debug_logs)")
+        return
+    columns = [
+        ("prompt_version", "промпт"),
+        ("model", "модель"),
+        ("calls", "вызовы"),
+        ("errors", "ошибки"),
+        ("avg_prompt_tokens", "вход ток."),
+        ("avg_output_tokens", "выход ток."),
+        ("tokens_per_s_p50", "ток/с p50"),
+        ("prompt_eval_ms_p50", "prefill p50"),
+        ("first_token_ms_p50", "TTFT p50"),
+        ("cold_loads", "cold"),
+        ("latency_ms_p50", "p50 мс"),
+        ("latency_ms_p95", "p95 мс"),
+        ("latency_ms_p99", "p99 мс"),
+    ]
+    table = [[title for _, title in columns]] + [[_fmt(r[key]) for key, _ in columns] for r in report]
+    widths = [max(len(row[i]) for row in table) for i in range(len(columns))]
+    for n, row in enumerate(table):
+        print("  " + "  ".join(cell.ljust(w) for cell, w in zip(row, widths)))
+        if n == 0:
+            print("  " + "  ".join("-" * w for w in widths))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, default=7)
+    ap.add_argument("--output", default="reports")
+    args = ap.parse_args()
+
+    report = build_report(load_calls(args.days))
+    print_report(report, args.days)
+
+    os.makedirs(args.output, exist_ok=True)
+    report_path = os.path.join(args.output, f"llm_{datetime.now().strftime('%Y%m%d')}.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nReport saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Тест роутера LLM на локальных заглушках Ollama: балансировка, EWMA, hedged-запросы, отказ бэкенда,
+очередь допуска (переполнение → LLMSaturated).
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if sys.platform == "win32":
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception:
+        pass
+
+
+class StubOllama(BaseHTTPRequestHandler):
+    """Заглушка /api/generate: отвечает своим именем через delay секунд."""
+
+    name = "stub"
+    delay = 0.0
+    hits = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        type(self).hits += 1
+        time.sleep(type(self).delay)
+        body = json.dumps({"response": type(self).name, "done": True}).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # клиент отменил запрос (проигравший hedged-запрос)
+
+
+def start_stub(name: str, delay: float) -> tuple[ThreadingHTTPServer, type]:
+    handler = type(f"Stub_{name}", (StubOllama,), {"name": name, "delay": delay, "hits": 0})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, handler
+
+
+def check(ok: bool, message: str) -> bool:
+    print(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+
+async def test_least_outstanding(pool, fast, slow) -> bool:
+    """Параллельные запросы распределяются по бэкендам с учётом лимитов."""
+    from llm import generate
+
+    fast.delay, slow.delay = 0.5, 0.5
+    fast.hits = slow.hits = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(generate(f"q{i}", timeout=10) for i in range(4)))
+    elapsed = time.perf_counter() - started
+    # Последовательно было бы 2.0s, на двух бэкендах — около 1.0s
+    return check(
+        fast.hits == 2 and slow.hits == 2 and elapsed < 1.6,
+        f"4 запроса на 2 бэкенда по 1 слоту: {fast.hits}/{slow.hits}, {elapsed:.2f}s",
+    )
+
+
+async def test_ewma_prefers_fast(pool, fast, slow) -> bool:
+    """Последовательные запросы уходят на бэкенд с меньшей EWMA."""
+    from llm import generate
+
+    fast.delay, slow.delay = 0.05, 0.4
+    for b in pool.backends:
+        b.ewma_ms = None
+    for i in range(4):
+        await generate(f"warm{i}", timeout=10)  # оба бэкенда получают статистику
+    fast.hits = slow.hits = 0
+    for i in range(5):
+        await generate(f"seq{i}", timeout=10)
+    ewma = {b.name: b.ewma_ms for b in pool.backends}
+    return check(fast.hits == 5, f"последовательные запросы на быстрый бэкенд: {fast.hits}/5, EWMA {ewma}")
+
+
+async def test_hedging(pool, fast, slow) -> bool:
+    """Если выбранный бэкенд завис, ответ приходит с другого после задержки hedge."""
+    from core import metrics
+    from llm import router
+
+    fast.delay, slow.delay = 0.05, 5.0
+    for b in pool.backends:
+        b.ewma_ms = None  # пусть первым выберется «зависший» (бэкенды без статистики идут первыми)
+    pool.backends.sort(key=lambda b: b.name != slow.name)
+    fired = metrics.get_counter("llm.hedge.fired")
+    started = time.perf_counter()
+    result = await router._hedged("hedge", "", 10, 1, False)
+    elapsed = time.perf_counter() - started
+    outstanding = sum(b.outstanding for b in pool.backends)
+    return check(
+        result == fast.name and elapsed < 1.5 and metrics.get_counter("llm.hedge.fired") == fired + 1 and not outstanding,
+        f"hedged: ответ «{result}» за {elapsed:.2f}s (медленный отменён, в работе {outstanding})",
+    )
+
+
+async def test_dead_backend(fast) -> bool:
+    """Недоступный бэкенд: вызов повторяется на живом, дальше мёртвый не выбирается; у живого свой breaker."""
+    from core.circuit_breaker import CircuitOpen
+    from llm import backends, generate
+
+    fast.delay = 0.05
+    fast_url = next(b.url for b in backends.get_backend_pool().backends if b.name == fast.name)
+    saved = backends._pool
+    dead = backends.Backend("http://127.0.0.1:1", 1)
+    backends._pool = backends.BackendPool([dead, backends.Backend(fast_url, 1)])
+    try:
+        results = [await generate(f"dead{i}", timeout=10) for i in range(5)]
+        ok = results == [fast.name] * 5 and dead.errors == 1 and dead.cooling
+        message = f"мёртвый бэкенд: ответы {results.count(fast.name)}/5 с живого, ошибок мёртвого {dead.errors}"
+        # Breaker живого бэкенда не затронут; открыты у всех — CircuitOpen без обращения к сети
+        ok = ok and backends._pool.backends[1].breaker.state == "closed"
+        for b in backends._pool.backends:
+            b.breaker._trip()
+        try:
+            await generate("all-open", timeout=10)
+            ok = False
+        except CircuitOpen:
+            pass
+        for b in backends._pool.backends:
+            b.breaker.record_success()
+            b.breaker._set_state("closed")
+    finally:
+        backends._pool = saved
+    return check(ok, message)
+
+
+async def test_saturation(pool, fast, slow) -> bool:
+    """Слот допуска берётся раньше бэкенда: переполненная очередь отказывает LLMSaturated, а не ждёт аренду."""
+    from core.llm_admission import LLMSaturated, get_admission_queue
+    from llm import generate
+
+    fast.delay = slow.delay = 1.0
+    queue = get_admission_queue()
+    saved = queue.max_queue, queue.max_wait
+    queue.max_queue, queue.max_wait = 1, 0.5
+    started = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(generate(f"sat{i}", timeout=10) for i in range(8)), return_exceptions=True)
+    finally:
+        queue.max_queue, queue.max_wait = saved
+    elapsed = time.perf_counter() - started
+    rejected = sum(isinstance(r, LLMSaturated) for r in results)
+    answered = sum(isinstance(r, str) for r in results)
+    outstanding = sum(b.outstanding for b in pool.backends)
+    return check(
+        answered == 2 and rejected == 6 and elapsed < 1.6 and not outstanding,
+        f"8 запросов при 2 слотах и очереди 1: ответов {answered}, LLMSaturated {rejected}, {elapsed:.2f}s",
+    )
+
+
+async def main() -> int:
+    print("=== LLM ROUTER TEST (stub servers) ===\n")
+    fast_srv, fast = start_stub("fast", 0.05)
+    slow_srv, slow = start_stub("slow", 0.4)
+    os.environ["OLLAMA_BASE_URLS"] = (
+        f"http://127.0.0.1:{fast_srv.server_address[1]}|1,http://127.0.0.1:{slow_srv.server_address[1]}|1"
+    )
+    os.environ["LLM_HEDGE_MIN_DELAY_MS"] = "300"
+    # Вызовы заглушек не должны попадать в debug_logs рабочей БД
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "llm_router_test.db")
+    os.environ.pop("LLM_MAX_CONCURRENCY", None)
+
+    from core.llm_admission import get_admission_queue
+    from llm.backends import get_backend_pool
+
+    pool = get_backend_pool()
+    for b in pool.backends:
+        b.name = fast.name if b.url.endswith(str(fast_srv.server_address[1])) else slow.name
+
+    results = [
+        check(
+            get_admission_queue().max_concurrency == pool.capacity == 2,
+            f"лимит очереди допуска = сумма лимитов бэкендов: {get_admission_queue().max_concurrency}",
+        ),
+        await test_least_outstanding(pool, fast, slow),
+        await test_ewma_prefers_fast(pool, fast, slow),
+        await test_hedging(pool, fast, slow),
+        await test_dead_backend(fast),
+        await test_saturation(pool, fast, slow),
+    ]
+    fast_srv.shutdown()
+    slow_srv.shutdown()
+    print(f"\n{sum(results)}/{len(results)} OK")
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Тест single-flight без внешних зависимостей: общий вызов переживает отмену первого вызывающего."""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if sys.platform == "win32":
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception:
+        pass
+
+
+def check(ok: bool, message: str) -> bool:
+    print(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+
+async def test_leader_cancelled() -> list[bool]:
+    """Отмена лидера не отменяет общий вызов: ведомые получают результат, работа выполняется один раз."""
+    from core.singleflight import SingleFlight
+
+    flight = SingleFlight("test")
+    started = 0
+    finished = asyncio.Event()
+
+    async def work() -> dict:
+        nonlocal started
+        started += 1
+        await asyncio.sleep(0.2)
+        finished.set()
+        return {"items": [1, 2, 3]}
+
+    leader = asyncio.create_task(flight.do("k", work))
+    await asyncio.sleep(0.05)
+    followers = [asyncio.create_task(flight.do("k", work)) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    leader.cancel()
+    results = await asyncio.gather(*followers, return_exceptions=True)
+    leader_cancelled = leader.cancelled()
+    return [
+        check(leader_cancelled, "лидер отменён"),
+        check(all(r == {"items": [1, 2, 3]} for r in results), f"ведомые получили результат: {results}"),
+        check(started == 1 and finished.is_set(), f"работа выполнена один раз ({started})"),
+        check(results[0] is not results[1], "у каждого своя копия результата"),
+        check(flight.stats() == {"calls": 4, "shared": 3, "inflight": 0}, f"stats: {flight.stats()}"),
+    ]
+
+
+async def test_all_cancelled() -> list[bool]:
+    """Если ждать некому — общий вызов отменяется, следующий вызов считает заново."""
+    from core.singleflight import SingleFlight
+
+    flight = SingleFlight("test")
+    cancelled = asyncio.Event()
+
+    async def slow() -> int:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return 0
+
+    waiters = [asyncio.create_task(flight.do("k", slow)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    for w in waiters:
+        w.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    async def fast() -> int:
+        return 42
+
+    again = await flight.do("k", fast)
+    return [
+        check(cancelled.is_set(), "без ожидающих общий вызов отменён"),
+        check(again == 42, "следующий вызов с тем же ключом выполнен заново"),
+    ]
+
+
+async def test_error_shared() -> list[bool]:
+    """Ошибка общего вызова достаётся всем ожидающим."""
+    from core.singleflight import SingleFlight
+
+    flight = SingleFlight("test")
+
+    async def failing() -> None:
+        await asyncio.sleep(0.05)
+        raise ValueError("backend down")
+
+    results = await asyncio.gather(*(flight.do("k", failing) for _ in range(3)), return_exceptions=True)
+    return [check(all(isinstance(r, ValueError) for r in results), f"все получили ValueError: {results}")]
+
+
+async def run() -> list[bool]:
+    return await test_leader_cancelled() + await test_all_cancelled() + await test_error_shared()
+
+
+def main() -> int:
+    print("=== SINGLEFLIGHT TEST ===\n")
+    results = asyncio.run(run())
+    print(f"\n{sum(results)}/{len(results)} OK")
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
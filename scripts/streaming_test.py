@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Тест потокового ответа в Telegram без бота: признак завершения потока и текст для пользователя."""
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if sys.platform == "win32":
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception:
+        pass
+
+
+def check(ok: bool, message: str) -> bool:
+    print(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+
+class FakeMessage:
+    """Достаточно для answer_streaming: answer() и bot.edit_message_text()."""
+
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+        self.bot = SimpleNamespace(edit_message_text=self._edit)
+
+    async def answer(self, text: str) -> SimpleNamespace:
+        self.sent.append(text)
+        return SimpleNamespace(chat=SimpleNamespace(id=1), message_id=len(self.sent))
+
+    async def _edit(self, text: str, chat_id: int, message_id: int) -> None:
+        self.sent[message_id - 1] = text
+
+
+async def _chunks(pieces: list[str], error: Exception | None = None):
+    for piece in pieces:
+        yield piece
+    if error is not None:
+        raise error
+
+
+async def run() -> list[bool]:
+    from apps.telegram_bot.streaming import answer_streaming
+
+    results = []
+    message = FakeMessage()
+    reply = await answer_streaming(message, _chunks(["Проверьте уровень масла ", "и ", "долейте до метки."]))
+    results.append(check(
+        reply.completed and reply.text == message.sent[-1] == "Проверьте уровень масла и долейте до метки.",
+        f"полный поток: completed={reply.completed}",
+    ))
+
+    message = FakeMessage()
+    reply = await answer_streaming(message, _chunks(["Зависит от пробега, условий эксплуатации и т.д…"]))
+    results.append(check(reply.completed, "ответ модели, сам оканчивающийся на «…», — завершён"))
+
+    message = FakeMessage()
+    reply = await answer_streaming(message, _chunks(["Колодки меняют обычно раз в ", "30–40 тыс. км, "], TimeoutError()))
+    results.append(check(
+        not reply.completed and reply.text.endswith(" …") and message.sent[-1] == reply.text,
+        f"оборванный поток: completed={reply.completed}, «{reply.text}»",
+    ))
+
+    try:
+        await answer_streaming(FakeMessage(), _chunks([], ConnectionError("backend down")))
+        results.append(check(False, "обрыв до первого фрагмента должен пробрасываться"))
+    except ConnectionError:
+        results.append(check(True, "обрыв до первого фрагмента → исключение вызывающему"))
+    return results
+
+
+def main() -> int:
+    print("=== STREAMING REPLY TEST ===\n")
+    results = asyncio.run(run())
+    print(f"\n{sum(results)}/{len(results)} OK")
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Обучение локального классификатора intent/part_type на dialogue_cycles (запросы деталей) и событиях
+general_answer из debug_logs (общие вопросы — в dialogue_cycles их нет).
+Текст примера — первое сообщение пользователя: при разборе классификатор видит только его.
+Оценка — на отложенных последних по времени примерах (модель не видела «будущих» запросов).
+
+    python scripts/train_intent_classifier.py --days 180 --holdout 0.2
+    python scripts/train_intent_classifier.py --full   # после оценки переобучить на всех циклах
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+from collections import Counter
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys_path = _root not in __import__("sys").path and _root or None
+if sys_path:
+    __import__("sys").path.insert(0, _root)
+
+from core.intent_classifier import INTENT_CLASSIFIER_PATH, INTENT_CLASSIFIER_THRESHOLD, evaluate, train
+from core.pii_masker import mask_pii
+from storage.feedback_repository import DB_PATH
+
+# Дизлайк с такими классами ошибок — разметка цикла (intent/слоты) неверна, в обучение не берём
+BAD_LABEL_ERROR_CLASSES = ("understanding", "extraction")
+
+
+def load_samples(days: int) -> list[dict[str, str]]:
+    """
+    Примеры по порядку времени: циклы с intent (текст — первое сообщение цикла) и общие вопросы
+    из debug_logs (general_answer). PII маскируется.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        rows = conn.execute(
+            f"""SELECT dc.intent, dc.slots_json, dc.all_messages_json, dc.started_at
+               FROM dialogue_cycles dc
+               WHERE dc.intent IS NOT NULL AND dc.intent != ''
+                 AND dc.started_at >= datetime('now', ?)
+                 AND NOT EXISTS (
+                     SELECT 1 FROM feedback f
+                     WHERE f.cycle_id = dc.id AND f.rating = 'dislike'
+                       AND f.error_class IN ({",".join("?" * len(BAD_LABEL_ERROR_CLASSES))})
+                 )
+               ORDER BY dc.started_at, dc.id""",
+            (f"-{days} days", *BAD_LABEL_ERROR_CLASSES),
+        ).fetchall()
+        try:
+            general_rows = conn.execute(
+                """SELECT payload_json, created_at FROM debug_logs
+                   WHERE event_type = 'general_answer' AND created_at >= datetime('now', ?)""",
+                (f"-{days} days",),
+            ).fetchall()
+        except sqlite3.OperationalError:
+            general_rows = []  # таблицы debug_logs ещё нет
+    finally:
+        conn.close()
+    samples = []
+    for intent, slots_json, messages_json, started_at in rows:
+        try:
+            messages = json.loads(messages_json or "[]")
+            slots = json.loads(slots_json or "{}")
+        except json.JSONDecodeError:
+            continue
+        text = str(messages[0] if messages else "").strip()
+        if not text:
+            continue
+        part_type = str(slots.get("part_type") or "").strip().lower() if isinstance(slots, dict) else ""
+        samples.append({"text": mask_pii(text), "intent": intent, "part_type": part_type, "at": str(started_at)})
+    for payload_json, created_at in general_rows:
+        try:
+            text = str(json.loads(payload_json or "{}").get("query") or "").strip()
+        except (json.JSONDecodeError, AttributeError):
+            continue
+        if text:
+            samples.append({"text": mask_pii(text), "intent": "general_question", "part_type": "", "at": str(created_at)})
+    samples.sort(key=lambda s: s["at"].replace("T", " "))
+    return samples
+
+
+def print_report(report: dict) -> None:
+    print(f"Отложено циклов: {report['samples']}, порог уверенности {report['threshold']:g}")
+    for head in ("intent", "part_type"):
+        r = report.get(head)
+        if not r:
+            continue
+        at = r["accuracy_at_threshold"]
+        print(
+            f"  {head}: accuracy {r['accuracy']:.1%} на {r['evaluated']}; "
+            f"без LLM {r['coverage_at_threshold']:.1%} запросов с точностью {'-' if at is None else f'{at:.1%}'}"
+        )
+        for label, c in sorted(r["per_class"].items(), key=lambda kv: -kv[1]["support"])[:10]:
+            print(f"    {label:<30} P {c['precision']:.2f}  R {c['recall']:.2f}  n={c['support']}")
+    if "latency_ms_p50" in report:
+        print(f"  латентность предсказания p50/p99: {report['latency_ms_p50']:.3f}/{report['latency_ms_p99']:.3f} мс")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--holdout", type=float, default=0.2, help="доля последних циклов для оценки")
+    ap.add_argument("--min-part-count", type=int, default=3)
+    ap.add_argument("--epochs", type=int, default=15)
+    ap.add_argument("--threshold", type=float, default=INTENT_CLASSIFIER_THRESHOLD)
+    ap.add_argument("--full", action="store_true", help="после оценки обучить на всех циклах")
+    ap.add_argument("--output", default=INTENT_CLASSIFIER_PATH)
+    args = ap.parse_args()
+
+    samples = load_samples(args.days)
+    if len(samples) < 20:
+        print(f"Мало размеченных циклов ({len(samples)}), нужно хотя бы 20")
+        return
+    intents = Counter(s["intent"] for s in samples)
+    print("Intent: " + ", ".join(f"{k} {v}" for k, v in intents.most_common()))
+    if len(intents) < 2:
+        print("Нужны примеры хотя бы двух intent (общие вопросы берутся из debug_logs, general_answer)")
+        return
+    split = max(1, int(len(samples) * (1 - args.holdout)))
+    train_set, test_set = samples[:split], samples[split:]
+    print(f"Циклов: {len(samples)} (обучение {len(train_set)}, отложено {len(test_set)})")
+
+    clf = train(train_set, min_part_count=args.min_part_count, epochs=args.epochs)
+    report = evaluate(clf, test_set, args.threshold) if test_set else {"samples": 0, "threshold": args.threshold}
+    print_report(report)
+
+    if args.full:
+        clf = train(samples, min_part_count=args.min_part_count, epochs=args.epochs)
+    clf.meta["holdout_report"] = report
+    clf.save(args.output)
+    print(f"\nModel saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Словарный матчер для rule-based NLU: автомат Ахо–Корасик над триггерами, синонимами деталей,
+марками и моделями авто. Сообщение проходится один раз, сколько бы терминов ни было в словаре.
+
+Каждый термин — (текст, вид, значение, режим границ):
+  SUBSTRING — где угодно (как `x in text`), PREFIX — с начала слова (основа: «колодк»),
+  WORD — целое слово («то», «kia»).
+Порядок добавления — приоритет: LexiconHits.best() возвращает термин, добавленный раньше.
+
+Модуль один на бота и сервисы, но сервисы собираются каждый из своего каталога, поэтому лежит в трёх
+местах: core/lexicon.py — оригинал, services/agent-orchestrator/app/lexicon.py и
+services/model-server/app/lexicon.py — копии (make sync-lexicon). Расхождение ловит тест
+services/agent-orchestrator/tests/test_lexicon.py.
+"""
+from __future__ import annotations
+
+import csv
+import logging
+import os
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+SUBSTRING = "substring"
+PREFIX = "prefix"
+WORD = "word"
+
+KIND_BRAND = "brand"
+KIND_MODEL = "model"
+
+# Марки, которые узнаются и без каталога; значение — каноническое написание
+BUILTIN_MAKES = {
+    "kia": "Kia", "toyota": "Toyota", "hyundai": "Hyundai", "honda": "Honda", "nissan": "Nissan",
+    "mazda": "Mazda", "ford": "Ford", "vw": "Volkswagen", "volkswagen": "Volkswagen", "bmw": "BMW",
+    "mercedes": "Mercedes", "audi": "Audi", "skoda": "Skoda", "renault": "Renault", "chevrolet": "Chevrolet",
+    "mitsubishi": "Mitsubishi", "suzuki": "Suzuki", "lexus": "Lexus", "infiniti": "Infiniti", "opel": "Opel",
+    "peugeot": "Peugeot", "citroen": "Citroen", "fiat": "Fiat", "lada": "Lada", "daewoo": "Daewoo",
+}
+# Распространённые модели (марка, модель) — тоже без каталога
+BUILTIN_MODELS = {
+    "rio": ("Kia", "Rio"), "sportage": ("Kia", "Sportage"), "camry": ("Toyota", "Camry"),
+    "rav4": ("Toyota", "RAV4"), "solaris": ("Hyundai", "Solaris"), "creta": ("Hyundai", "Creta"),
+    "vesta": ("Lada", "Vesta"), "granta": ("Lada", "Granta"), "qashqai": ("Nissan", "Qashqai"),
+    "x-trail": ("Nissan", "X-Trail"), "octavia": ("Skoda", "Octavia"), "rapid": ("Skoda", "Rapid"),
+    "polo": ("Volkswagen", "Polo"), "tiguan": ("Volkswagen", "Tiguan"),
+}
+# Русские написания марок и моделей
+CAR_ALIASES = {
+    KIND_BRAND: {
+        "киа": "Kia", "тойота": "Toyota", "хендай": "Hyundai", "хундай": "Hyundai", "хёндэ": "Hyundai",
+        "ниссан": "Nissan", "шкода": "Skoda", "фольксваген": "Volkswagen", "лада": "Lada",
+    },
+    KIND_MODEL: {
+        "рио": ("Kia", "Rio"), "спортейдж": ("Kia", "Sportage"), "камри": ("Toyota", "Camry"),
+        "солярис": ("Hyundai", "Solaris"), "крета": ("Hyundai", "Creta"), "веста": ("Lada", "Vesta"),
+        "гранта": ("Lada", "Granta"), "кашкай": ("Nissan", "Qashqai"), "октавия": ("Skoda", "Octavia"),
+        "рапид": ("Skoda", "Rapid"), "поло": ("Volkswagen", "Polo"), "тигуан": ("Volkswagen", "Tiguan"),
+    },
+}
+
+
+def _is_word_char(ch: str) -> bool:
+    # Дефис — часть слова: «то» не должно находиться в «что-то»
+    return ch.isalnum() or ch in "_-"
+
+
+@dataclass(frozen=True)
+class Term:
+    text: str
+    kind: str
+    value: Any
+    mode: str
+    order: int
+
+
+@dataclass(frozen=True)
+class Match:
+    start: int
+    end: int
+    term: Term
+
+    @property
+    def kind(self) -> str:
+        return self.term.kind
+
+    @property
+    def value(self) -> Any:
+        return self.term.value
+
+
+class LexiconHits:
+    """Результат одного прохода: совпадения по позиции и выборки по виду термина."""
+
+    def __init__(self, text: str, matches: list[Match]) -> None:
+        self.text = text
+        self.matches = matches
+        self._by_kind: dict[str, list[Match]] = {}
+        for m in matches:
+            self._by_kind.setdefault(m.kind, []).append(m)
+
+    def has(self, kind: str) -> bool:
+        return kind in self._by_kind
+
+    def all(self, kind: str) -> list[Match]:
+        return self._by_kind.get(kind, [])
+
+    def first(self, kind: str) -> Match | None:
+        """Самое левое совпадение (при равном начале — самое длинное)."""
+        hits = self._by_kind.get(kind)
+        return min(hits, key=lambda m: (m.start, -m.end)) if hits else None
+
+    def best(self, kind: str) -> Match | None:
+        """Совпадение с самым приоритетным термином (добавленным раньше)."""
+        hits = self._by_kind.get(kind)
+        return min(hits, key=lambda m: (m.term.order, m.start)) if hits else None
+
+    def surface(self, match: Match) -> str:
+        """Совпавший фрагмент в исходном написании."""
+        return self.text[match.start:match.end]
+
+
+class Lexicon:
+    """Автомат Ахо–Корасик; термины и текст сравниваются в нижнем регистре."""
+
+    def __init__(self) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._own: list[tuple[Term, ...]] = [()]  # термины, оканчивающиеся в узле
+        self._out: list[tuple[Term, ...]] = [()]  # плюс унаследованные по ссылкам неудач
+        self._size = 0
+        self._built = True
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, text: str, kind: str, value: Any = None, mode: str = SUBSTRING) -> None:
+        text = (text or "").lower()
+        if not text:
+            return
+        node = 0
+        for ch in text:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append(())
+                self._goto[node][ch] = nxt
+            node = nxt
+        self._own[node] += (Term(text, kind, text if value is None else value, mode, self._size),)
+        self._size += 1
+        self._built = False
+
+    def add_many(self, texts: Iterable[str], kind: str, mode: str = SUBSTRING) -> None:
+        for text in texts:
+            self.add(text, kind, mode=mode)
+
+    def build(self) -> None:
+        """Ссылки неудач (обход в ширину); вызывается сам перед первым scan после add."""
+        goto, fail = self._goto, self._fail
+        out = list(self._own)
+        queue: deque[int] = deque()
+        for nxt in goto[0].values():
+            fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+                queue.append(nxt)
+        self._out = out
+        self._built = True
+
+    def scan(self, text: str) -> LexiconHits:
+        """Один линейный проход по тексту: все совпадения с учётом режимов границ слова."""
+        if not self._built:
+            self.build()
+        text = text or ""
+        t = text.lower()
+        if len(t) != len(text):  # редкие символы меняют длину при lower() — позиции должны совпадать
+            t = "".join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+        goto, fail, out = self._goto, self._fail, self._out
+        n = len(t)
+        matches: list[Match] = []
+        node = 0
+        for i, ch in enumerate(t):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for term in out[node]:
+                start = i + 1 - len(term.text)
+                if term.mode != SUBSTRING and start > 0 and _is_word_char(t[start - 1]):
+                    continue
+                if term.mode == WORD and i + 1 < n and _is_word_char(t[i + 1]):
+                    continue
+                matches.append(Match(start, i + 1, term))
+        matches.sort(key=lambda m: (m.start, -m.end))
+        return LexiconHits(text, matches)
+
+
+def load_vehicle_catalog(path: str) -> list[tuple[str, str]]:
+    """Пары (марка, модель) из CSV каталога (demo-data/vehicle_catalog.csv); нет файла — пусто."""
+    if not path or not os.path.exists(path):
+        logger.debug("vehicle catalog not found: %s", path)
+        return []
+    pairs: dict[tuple[str, str], None] = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                make, model = (row.get("make") or "").strip(), (row.get("model") or "").strip()
+                if make and model:
+                    pairs[(make, model)] = None
+    except (OSError, csv.Error) as e:
+        logger.warning("vehicle catalog load failed (%s): %s", path, e)
+        return []
+    return list(pairs)
+
+
+def add_vehicle_terms(lexicon: Lexicon, catalog: Iterable[tuple[str, str]] = ()) -> None:
+    """
+    Марки (KIND_BRAND, значение — каноническое имя) и модели (KIND_MODEL, значение — (марка, модель))
+    целыми словами: встроенные марки и модели, каталог и русские написания.
+    """
+    makes = dict(BUILTIN_MAKES)
+    models = dict(BUILTIN_MODELS)
+    for make, model in catalog:
+        makes.setdefault(make.lower(), make)
+        models.setdefault(model.lower(), (make, model))
+    for alias, make in CAR_ALIASES[KIND_BRAND].items():
+        makes.setdefault(alias, make)
+    for alias, pair in CAR_ALIASES[KIND_MODEL].items():
+        models.setdefault(alias, pair)
+    for text, make in makes.items():
+        lexicon.add(text, KIND_BRAND, make, WORD)
+    for text, pair in models.items():
+        lexicon.add(text, KIND_MODEL, pair, WORD)
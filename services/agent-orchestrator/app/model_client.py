@@ -23,7 +23,7 @@ class ModelClient:
     async def nlu(self, message: str) -> NluResult:
         url = f"{self.base}/v1/chat/completions"
         payload = {
-            "model": "mvp",
+            "model": settings.nlu_model,
             "messages": [
                 {"role": "system", "content": SYSTEM_NLU_PROMPT},
                 {"role": "user", "content": message},
@@ -31,7 +31,8 @@ class ModelClient:
             "temperature": 0.0,
         }
         async with httpx.AsyncClient(timeout=15) as client:
-            r = await client.post(url, json=payload)
+            # X-Caller — очередь model-server делит слоты между вызывающими по кругу
+            r = await client.post(url, json=payload, headers={"X-Caller": "agent-nlu"})
         if r.status_code >= 400:
             raise RuntimeError(f"model-server HTTP {r.status_code}: {r.text}")
         data: dict[str, Any] = r.json()
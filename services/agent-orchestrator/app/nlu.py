@@ -3,21 +3,44 @@ from __future__ import annotations
 import re
 from typing import Any
 
+from app.lexicon import KIND_BRAND, KIND_MODEL, SUBSTRING, WORD, Lexicon, add_vehicle_terms, load_vehicle_catalog
 from app.schemas import NluResult
+from app.settings import settings
 
 
-_BRANDS = ["kia", "hyundai", "toyota", "vw", "volkswagen", "bmw", "mercedes", "audi", "skoda", "renault", "nissan", "ford", "lada"]
+# Триггеры интентов: (текст, режим границ). «то» — только целым словом, иначе совпадает в «что-то», «стойка»
+_INTENT_TRIGGERS: dict[str, list[tuple[str, str]]] = {
+    "to_service": [("то", WORD), ("техобслуж", SUBSTRING), ("замена масла", SUBSTRING), ("масло", SUBSTRING),
+                   ("oil service", SUBSTRING)],
+    "problem_symptom": [("стук", SUBSTRING), ("скрип", SUBSTRING), ("вибра", SUBSTRING), ("шум", SUBSTRING),
+                        ("тянет", SUBSTRING), ("люфт", SUBSTRING)],
+    "parts_search": [("колодк", SUBSTRING), ("запчаст", SUBSTRING), ("нужн", SUBSTRING), ("тормоз", SUBSTRING),
+                     ("фильтр", SUBSTRING), ("свеч", SUBSTRING), ("ремень", SUBSTRING)],
+}
+# При нескольких совпавших интентах побеждает первый по этому порядку
+_INTENT_ORDER = ("to_service", "problem_symptom", "parts_search")
+
+_lexicon: Lexicon | None = None
+
+
+def get_lexicon() -> Lexicon:
+    global _lexicon
+    if _lexicon is None:
+        lexicon = Lexicon()
+        for intent in _INTENT_ORDER:
+            for text, mode in _INTENT_TRIGGERS[intent]:
+                lexicon.add(text, "intent", intent, mode)
+        add_vehicle_terms(lexicon, load_vehicle_catalog(settings.vehicle_catalog_path))
+        lexicon.build()
+        _lexicon = lexicon
+    return _lexicon
 
 
 def rule_based_nlu(message: str) -> NluResult:
     m = message.lower()
-    intent = "unknown"
-    if any(x in m for x in ["то", "техобслуж", "замена масла", "масло", "oil service"]):
-        intent = "to_service"
-    if any(x in m for x in ["стук", "скрип", "вибра", "шум", "тянет", "люфт"]):
-        intent = "problem_symptom" if intent == "unknown" else intent
-    if any(x in m for x in ["колодк", "запчаст", "нужн", "тормоз", "фильтр", "свеч", "ремень"]):
-        intent = "parts_search" if intent == "unknown" else intent
+    hits = get_lexicon().scan(m)
+    intent_hit = hits.best("intent")
+    intent = intent_hit.value if intent_hit else "unknown"
 
     slots: dict[str, Any] = {}
 
@@ -40,16 +63,13 @@ def rule_based_nlu(message: str) -> NluResult:
         if mil2:
             slots["mileage"] = int(mil2.group(1))
 
-    # brand/model heuristic
-    for b in _BRANDS:
-        if re.search(rf"\b{re.escape(b)}\b", m):
-            slots["brand"] = b.title() if b != "vw" else "VW"
-            break
-
-    # model: word right after brand (simple)
-    if slots.get("brand"):
-        b = slots["brand"].lower()
-        mo = re.search(rf"\b{re.escape(b)}\s+([a-z0-9\-]+)\b", m)
+    # brand/model: по словарю; модель не из каталога — слово сразу после марки
+    brand, model = hits.first(KIND_BRAND), hits.first(KIND_MODEL)
+    if model and (not brand or model.value[0] == brand.value):
+        slots["brand"], slots["model"] = model.value
+    elif brand:
+        slots["brand"] = brand.value
+        mo = re.match(r"\s+([a-z0-9\-]+)\b", m[brand.end:])
         if mo:
             slots["model"] = mo.group(1).title()
 
@@ -64,4 +84,3 @@ def rule_based_nlu(message: str) -> NluResult:
         slots["part_query"] = message.strip()
 
     return NluResult(intent=intent, slots=slots)
-
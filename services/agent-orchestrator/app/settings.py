@@ -11,7 +11,11 @@ class Settings(BaseSettings):
     rag_url: str = "http://rag-service:8003"
     log_level: str = "info"
     use_model_nlu: bool = False
+    # NLU — короткий структурированный разбор: model-server отправляет его на малую модель
+    nlu_model: str = "small"
     require_approval: bool = True
+    # Марки/модели для словаря rule-based NLU; нет файла — только встроенные марки
+    vehicle_catalog_path: str = "/demo-data/vehicle_catalog.csv"
 
 
 settings = Settings()
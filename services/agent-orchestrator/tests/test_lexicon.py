@@ -0,0 +1,66 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from app.lexicon import KIND_BRAND, KIND_MODEL, PREFIX, WORD, Lexicon, add_vehicle_terms, load_vehicle_catalog
+from app.nlu import rule_based_nlu
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+LEXICON_COPIES = (
+    "core/lexicon.py",
+    "services/agent-orchestrator/app/lexicon.py",
+    "services/model-server/app/lexicon.py",
+)
+
+
+def test_overlapping_terms_found_in_one_pass():
+    lexicon = Lexicon()
+    for word in ("he", "she", "his", "hers"):
+        lexicon.add(word, "w")
+    hits = lexicon.scan("ushers")
+    assert [hits.surface(m) for m in hits.matches] == ["she", "hers", "he"]
+
+
+def test_word_boundary_modes():
+    lexicon = Lexicon()
+    lexicon.add("то", "intent", "to_service", WORD)
+    lexicon.add("колодк", "part", mode=PREFIX)
+    assert lexicon.scan("Нужно ТО").has("intent")
+    assert not lexicon.scan("что-то стучит, стойка").has("intent")
+    assert lexicon.scan("колодки").has("part")
+    assert not lexicon.scan("подколодки").has("part")
+
+
+def test_best_prefers_earlier_added_term():
+    lexicon = Lexicon()
+    lexicon.add("фильтр масл", "part_type", "масляный фильтр")
+    lexicon.add("масл", "part_type", "масло")
+    hits = lexicon.scan("нужен фильтр масляный")
+    assert hits.best("part_type").value == "масляный фильтр"
+
+
+def test_vehicle_terms_from_catalog(tmp_path):
+    csv_path = tmp_path / "vehicle_catalog.csv"
+    csv_path.write_text("make,make_slug,model,model_slug\nGeely,geely,Coolray,coolray\n", encoding="utf-8")
+    lexicon = Lexicon()
+    add_vehicle_terms(lexicon, load_vehicle_catalog(str(csv_path)))
+    hits = lexicon.scan("фильтр на Geely Coolray и камри")
+    assert hits.first(KIND_BRAND).value == "Geely"
+    assert [m.value for m in hits.all(KIND_MODEL)] == [("Geely", "Coolray"), ("Toyota", "Camry")]
+    assert load_vehicle_catalog(str(tmp_path / "missing.csv")) == []
+
+
+def test_vw_alias_resolves_to_volkswagen():
+    # Раньше «vw» давало марку "VW"; теперь — каноническое имя, как и «volkswagen», «фольксваген»
+    lexicon = Lexicon()
+    add_vehicle_terms(lexicon)
+    assert lexicon.scan("колодки на vw").first(KIND_BRAND).value == "Volkswagen"
+    assert rule_based_nlu("нужны колодки vw polo 2015").slots["brand"] == "Volkswagen"
+
+
+def test_lexicon_copies_are_identical():
+    if not all((REPO_ROOT / p).exists() for p in LEXICON_COPIES):
+        pytest.skip("нет полного репозитория (тесты внутри образа сервиса)")
+    digests = {p: hashlib.sha256((REPO_ROOT / p).read_bytes()).hexdigest() for p in LEXICON_COPIES}
+    assert len(set(digests.values())) == 1, f"копии lexicon.py разошлись, выполните make sync-lexicon: {digests}"
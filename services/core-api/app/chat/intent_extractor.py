@@ -6,7 +6,7 @@ import os
 import re
 from typing import Any
 
-from app.llm.llm_adapter import call_llm
+from app.llm.llm_adapter import TASK_EXTRACTION, call_llm
 
 logger = logging.getLogger(__name__)
 
@@ -126,7 +126,7 @@ def extract_intent_and_slots(message: str, car_context: dict[str, Any]) -> dict[
 
     raw = ""
     try:
-        raw = call_llm(prompt, system=SYSTEM_PROMPT)
+        raw = call_llm(prompt, system=SYSTEM_PROMPT, json_mode=True, task=TASK_EXTRACTION)
         raw = raw.strip()
         raw = re.sub(r"^```json\s*", "", raw)
         raw = re.sub(r"^```\s*", "", raw)
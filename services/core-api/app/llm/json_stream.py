@@ -0,0 +1,56 @@
+"""
+Инкрементальный разбор потока LLM: определить момент, когда закрылся верхнеуровневый JSON-объект.
+Копия в services/core-api (app/llm) — `make sync-llm-shared`.
+"""
+from __future__ import annotations
+
+
+class JsonObjectScanner:
+    """
+    Скармливаем фрагменты потока; feed() вернёт текст объекта, как только закроется его внешняя «}».
+    Учитывает строки и экранирование — скобки внутри значений не считаются. Текст до первой «{» пропускается.
+    """
+
+    def __init__(self) -> None:
+        self._parts: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.started = False
+        self.done = False
+
+    def feed(self, chunk: str) -> str | None:
+        if self.done:
+            return None
+        start = 0
+        if not self.started:
+            start = chunk.find("{")
+            if start < 0:
+                return None
+            self.started = True
+        for i in range(start, len(chunk)):
+            ch = chunk[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(chunk[start : i + 1])
+                    self.done = True
+                    return "".join(self._parts)
+        self._parts.append(chunk[start:])
+        return None
+
+    @property
+    def partial(self) -> str:
+        """Накопленный текст (объект ещё не закрыт) — для логов при обрыве потока."""
+        return "".join(self._parts)
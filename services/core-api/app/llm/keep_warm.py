@@ -0,0 +1,72 @@
+"""
+Общее для прогрева LLM (бот и core-api): настройки, часы трафика и фоновый цикл «прогрев → пинг».
+Как грузить модель и кого пинговать, решает вызывающий. Копия в services/core-api (app/llm) —
+`make sync-llm-shared`; только стандартная библиотека.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+LLM_WARMUP = os.getenv("LLM_WARMUP", "true").lower() in ("1", "true", "yes")
+LLM_WARMUP_TIMEOUT = float(os.getenv("LLM_WARMUP_TIMEOUT", "180"))
+# Пинг реже keep_alive, но достаточно часто, чтобы модель не успела выгрузиться
+LLM_KEEPALIVE_PING_SECONDS = float(os.getenv("LLM_KEEPALIVE_PING_SECONDS", "600"))
+# Часы ожидаемого трафика (локальное время), "8-23"; ночью модель может выгрузиться. Пусто — всегда
+LLM_KEEP_WARM_HOURS = os.getenv("LLM_KEEP_WARM_HOURS", "8-23")
+
+
+def in_traffic_hours(hours: str = LLM_KEEP_WARM_HOURS, now: datetime | None = None) -> bool:
+    """Попадает ли текущий час в интервал "start-end" (end не включается, "20-2" — через полночь)."""
+    start, sep, end = (hours or "").partition("-")
+    if not sep or not start.strip().isdigit() or not end.strip().isdigit():
+        return True
+    hour = (now or datetime.now()).hour
+    start_h, end_h = int(start) % 24, int(end) % 24
+    if start_h == end_h:
+        return True
+    if start_h < end_h:
+        return start_h <= hour < end_h
+    return hour >= start_h or hour < end_h
+
+
+async def keep_warm_loop(
+    warm_up: Callable[[], Awaitable[object]],
+    ping_idle: Callable[[float], Awaitable[object]],
+    interval: float = LLM_KEEPALIVE_PING_SECONDS,
+) -> None:
+    """Прогрев при старте, затем раз в interval — ping_idle(interval) в часы трафика."""
+    await warm_up()
+    while True:
+        await asyncio.sleep(interval)
+        if in_traffic_hours():
+            await ping_idle(interval)
+
+
+_task: asyncio.Task | None = None
+
+
+def start_keep_warm(
+    warm_up: Callable[[], Awaitable[object]],
+    ping_idle: Callable[[float], Awaitable[object]],
+) -> asyncio.Task | None:
+    """Запустить прогрев в фоне (не задерживает старт сервиса). LLM_WARMUP=false — выключено."""
+    global _task
+    if not LLM_WARMUP:
+        return None
+    if _task is None or _task.done():
+        _task = asyncio.create_task(keep_warm_loop(warm_up, ping_idle), name="llm-keep-warm")
+    return _task
+
+
+async def stop_keep_warm() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
@@ -1,54 +1,222 @@
 """LLM-адаптер: только Ollama (sync)."""
 from __future__ import annotations
 
+import json
 import logging
 import os
-import re
+import threading
+import time
+from collections import deque
 
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+from app.llm.circuit_breaker import get_circuit_breaker
+from app.llm.json_stream import JsonObjectScanner
 
 logger = logging.getLogger(__name__)
 
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5:7b")
 OLLAMA_TIMEOUT = int(os.getenv("OLLAMA_TIMEOUT", "60"))
+OLLAMA_JSON_NUM_PREDICT = int(os.getenv("OLLAMA_JSON_NUM_PREDICT", "512"))
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Маршрутизация по типу задачи: разбор запроса — малая модель, свободный ответ — большая (пусто — OLLAMA_MODEL)
+TASK_EXTRACTION = "extraction"
+TASK_GENERAL = "general"
+OLLAMA_MODEL_SMALL = os.getenv("OLLAMA_MODEL_SMALL", "") or OLLAMA_MODEL
+TASK_MODELS = {
+    TASK_EXTRACTION: os.getenv("LLM_MODEL_EXTRACTION", "") or OLLAMA_MODEL_SMALL,
+    TASK_GENERAL: os.getenv("LLM_MODEL_GENERAL", "") or OLLAMA_MODEL,
+}
+OLLAMA_POOL_MAX_CONNECTIONS = int(os.getenv("OLLAMA_POOL_MAX_CONNECTIONS", "10"))
+OLLAMA_POOL_MAX_KEEPALIVE = int(os.getenv("OLLAMA_POOL_MAX_KEEPALIVE", "5"))
+OLLAMA_POOL_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_POOL_KEEPALIVE_EXPIRY", "120"))
 
-_PII_PATTERNS = [
-    (r"\b\+7[\s\-]?\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}\b", "[PHONE]"),
-    (r"\b8[\s\-]?\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}\b", "[PHONE]"),
-    (r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b", "[EMAIL]"),
-]
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
 
 
-def mask_pii(text: str) -> str:
-    """Маскировать PII в тексте."""
-    if not text:
-        return text
-    for pattern, replacement in _PII_PATTERNS:
-        text = re.sub(pattern, replacement, text)
-    return text
+def get_client() -> httpx.Client:
+    """Общий на процесс клиент с keep-alive (httpx.Client потокобезопасен, вызовы идут из threadpool)."""
+    global _client
+    with _client_lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(
+                timeout=OLLAMA_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=OLLAMA_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=OLLAMA_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=OLLAMA_POOL_KEEPALIVE_EXPIRY,
+                ),
+            )
+        return _client
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=5))
-def call_llm(prompt: str, system: str = "", timeout: int | None = None) -> str:
-    """Sync вызов Ollama."""
-    full_prompt = f"{system}\n\n{prompt}" if system else prompt
-    t = timeout if timeout is not None else OLLAMA_TIMEOUT
-
-    with httpx.Client(timeout=t) as client:
-        r = client.post(
-            f"{OLLAMA_BASE_URL.rstrip('/')}/api/generate",
-            json={
-                "model": OLLAMA_MODEL,
-                "prompt": full_prompt,
-                "stream": False,
-                "options": {"temperature": 0.1, "top_p": 0.9, "num_predict": 1024},
-            },
+def close_client() -> None:
+    """Закрыть пул (shutdown приложения)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+def model_for_task(task: str) -> str:
+    return TASK_MODELS.get(task) or OLLAMA_MODEL
+
+
+_task_latencies: dict[str, deque[float]] = {}
+_task_lock = threading.Lock()
+
+
+def _observe_task(task: str, latency_ms: float) -> None:
+    with _task_lock:
+        _task_latencies.setdefault(task, deque(maxlen=500)).append(latency_ms)
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)] if ordered else 0.0
+
+
+def task_stats() -> dict:
+    """Латентность успешных вызовов по задачам (для /health): модель, число вызовов, p50/p95."""
+    with _task_lock:
+        samples = {task: sorted(values) for task, values in _task_latencies.items()}
+    return {
+        task: {
+            "model": model_for_task(task),
+            "calls": len(values),
+            "p50_ms": round(_percentile(values, 0.5), 1),
+            "p95_ms": round(_percentile(values, 0.95), 1),
+        }
+        for task, values in samples.items()
+    }
+
+
+_last_call_at: float | None = None  # time.monotonic() последнего вызова — прогрев не пингует занятую модель
+
+
+def last_call_at() -> float | None:
+    return _last_call_at
+
+
+def load_model(timeout: float, model: str | None = None) -> None:
+    """
+    Загрузить модель в память пустым запросом (без генерации) и продлить keep_alive.
+    По умолчанию — модель извлечения: других вызовов LLM в core-api нет.
+    """
+    r = get_client().post(
+        f"{OLLAMA_BASE_URL.rstrip('/')}/api/generate",
+        json={"model": model or model_for_task(TASK_EXTRACTION), "prompt": "", "stream": False, "keep_alive": OLLAMA_KEEP_ALIVE},
+        timeout=timeout,
+    )
+    r.raise_for_status()
+
+
+def call_llm(
+    prompt: str,
+    system: str = "",
+    timeout: int | None = None,
+    json_mode: bool = False,
+    task: str = TASK_GENERAL,
+) -> str:
+    """
+    Sync вызов Ollama через circuit breaker: при открытой цепи сразу CircuitOpen,
+    таймаут адаптивный (p95 недавних вызовов), не больше timeout.
+    json_mode — format: "json", поток читается до закрытия объекта.
+    task — тип задачи: по нему выбирается модель (TASK_MODELS), латентность — в task_stats().
+    """
+    global _last_call_at
+    breaker = get_circuit_breaker()
+    breaker.before_call()
+    call = _call_llm_json if json_mode else _call_llm
+    started = time.perf_counter()
+    try:
+        result = call(
+            prompt,
+            system,
+            breaker.timeout_for(timeout if timeout is not None else OLLAMA_TIMEOUT),
+            model_for_task(task),
         )
-        r.raise_for_status()
-        result = r.json().get("response", "")
-        logger.debug("Ollama response length: %d", len(result))
-        return result
+    except Exception:
+        breaker.record_failure()
+        raise
+    finally:
+        _last_call_at = time.monotonic()
+    latency_ms = (time.perf_counter() - started) * 1000
+    breaker.record_success(latency_ms)
+    _observe_task(task, latency_ms)
+    return result
 
 
+# Повтор только при обрыве соединения: таймаут на перегруженной модели повторять бессмысленно
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(min=1, max=5),
+    retry=retry_if_exception_type((httpx.ConnectError, httpx.RemoteProtocolError)),
+    reraise=True,
+)
+def _call_llm(prompt: str, system: str, timeout: float, model: str = OLLAMA_MODEL) -> str:
+    full_prompt = f"{system}\n\n{prompt}" if system else prompt
+
+    r = get_client().post(
+        f"{OLLAMA_BASE_URL.rstrip('/')}/api/generate",
+        json={
+            "model": model,
+            "prompt": full_prompt,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "stream": False,
+            "options": {"temperature": 0.1, "top_p": 0.9, "num_predict": 1024},
+        },
+        timeout=timeout,
+    )
+    r.raise_for_status()
+    result = r.json().get("response", "")
+    logger.debug("Ollama response length: %d", len(result))
+    return result
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(min=1, max=5),
+    retry=retry_if_exception_type((httpx.ConnectError, httpx.RemoteProtocolError)),
+    reraise=True,
+)
+def _call_llm_json(prompt: str, system: str, timeout: float, model: str = OLLAMA_MODEL) -> str:
+    """Структурированный ответ: поток закрывается на «}» верхнего объекта — Ollama прекращает генерацию."""
+    full_prompt = f"{system}\n\n{prompt}" if system else prompt
+    deadline = time.monotonic() + timeout
+    scanner = JsonObjectScanner()
+
+    with get_client().stream(
+        "POST",
+        f"{OLLAMA_BASE_URL.rstrip('/')}/api/generate",
+        json={
+            "model": model,
+            "prompt": full_prompt,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "stream": True,
+            "format": "json",
+            "options": {"temperature": 0.1, "top_p": 0.9, "num_predict": OLLAMA_JSON_NUM_PREDICT},
+        },
+        timeout=httpx.Timeout(timeout, connect=10),
+    ) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Ollama JSON response exceeded {timeout:g}s")
+            if not line.strip():
+                continue
+            try:
+                chunk = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if chunk.get("error"):
+                raise RuntimeError(f"Ollama error: {chunk['error']}")
+            obj = scanner.feed(chunk.get("response", ""))
+            if obj is not None:
+                return obj
+            if chunk.get("done"):
+                break
+    return scanner.partial
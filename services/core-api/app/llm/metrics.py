@@ -0,0 +1,74 @@
+"""
+Метрики процесса в памяти: счётчики, текущие значения и распределения (p50/p95).
+Копия в services/core-api (app/llm, нужна circuit_breaker) — `make sync-llm-shared`.
+"""
+from __future__ import annotations
+
+import threading
+from collections import defaultdict, deque
+
+# Сколько последних наблюдений хранить на метрику для перцентилей
+WINDOW = 1000
+
+_lock = threading.Lock()
+_counters: dict[str, int] = defaultdict(int)
+_gauges: dict[str, float] = {}
+_observations: dict[str, deque] = defaultdict(lambda: deque(maxlen=WINDOW))
+
+
+def incr(name: str, n: int = 1) -> None:
+    with _lock:
+        _counters[name] += n
+
+
+def set_gauge(name: str, value: float) -> None:
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, value: float) -> None:
+    """Добавить наблюдение (обычно latency в мс)."""
+    with _lock:
+        _observations[name].append(value)
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[idx]
+
+
+def get_counter(name: str) -> int:
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def ratio(numerator: str, *denominator: str) -> float:
+    """Доля счётчика numerator от суммы счётчиков denominator (0.0, если данных нет)."""
+    with _lock:
+        total = sum(_counters.get(d, 0) for d in denominator)
+        return _counters.get(numerator, 0) / total if total else 0.0
+
+
+def snapshot() -> dict:
+    """Срез всех метрик для /debug и health."""
+    with _lock:
+        dists = {
+            name: {
+                "count": len(vals),
+                "p50": round(percentile(list(vals), 0.5), 1),
+                "p95": round(percentile(list(vals), 0.95), 1),
+                "max": round(max(vals), 1) if vals else 0.0,
+            }
+            for name, vals in _observations.items()
+        }
+        return {"counters": dict(_counters), "gauges": dict(_gauges), "distributions": dists}
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _observations.clear()
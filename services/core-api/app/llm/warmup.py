@@ -0,0 +1,100 @@
+"""Прогрев модели Ollama при старте core-api и пинг в часы трафика, чтобы модель не выгружалась."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Callable
+
+from app.llm import keep_warm, llm_adapter
+from app.llm.keep_warm import LLM_WARMUP_TIMEOUT, stop_keep_warm  # noqa: F401 — stop_keep_warm для main.py
+
+logger = logging.getLogger(__name__)
+
+LLM_COLD_LOAD_MS = float(os.getenv("LLM_COLD_LOAD_MS", "1000"))
+
+
+class ModelWarmer:
+    """Загрузка модели пустым запросом; долгий ответ — модель была выгружена (холодная загрузка)."""
+
+    def __init__(
+        self,
+        load: Callable[[float], None] | None = None,
+        cold_load_ms: float = LLM_COLD_LOAD_MS,
+        timeout: float = LLM_WARMUP_TIMEOUT,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self._load = load or llm_adapter.load_model
+        self.cold_load_ms = cold_load_ms
+        self.timeout = timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.cold_loads = 0
+        self.failures = 0
+        self.last_ms: float | None = None
+
+    def warm_up(self, reason: str = "startup") -> dict:
+        started = self._clock()
+        try:
+            self._load(self.timeout)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+            logger.warning("LLM warm-up failed (%s): %s", reason, e)
+            return {"reason": reason, "error": type(e).__name__}
+        elapsed_ms = round((self._clock() - started) * 1000, 1)
+        cold = elapsed_ms >= self.cold_load_ms
+        with self._lock:
+            self.runs += 1
+            self.last_ms = elapsed_ms
+            if cold:
+                self.cold_loads += 1
+        if cold:
+            logger.info("LLM model %s loaded in %.0f ms (%s)", llm_adapter.OLLAMA_MODEL, elapsed_ms, reason)
+        return {"reason": reason, "latency_ms": elapsed_ms, "cold_load": cold}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "cold_loads": self.cold_loads,
+                "failures": self.failures,
+                "last_ms": self.last_ms,
+            }
+
+
+def needs_ping(last_call_at: float | None, interval: float, now: float | None = None) -> bool:
+    """Недавний вызов LLM и так продлил keep_alive — пинг не нужен."""
+    if last_call_at is None:
+        return True
+    return (now if now is not None else time.monotonic()) - last_call_at >= interval
+
+
+_warmer: ModelWarmer | None = None
+_warmer_lock = threading.Lock()
+
+
+def get_model_warmer() -> ModelWarmer:
+    global _warmer
+    with _warmer_lock:
+        if _warmer is None:
+            _warmer = ModelWarmer()
+        return _warmer
+
+
+async def _warm_up() -> None:
+    await asyncio.to_thread(get_model_warmer().warm_up, "startup")
+
+
+async def _ping_idle(interval: float) -> None:
+    """Пинг простаивающей модели (sync-вызов — в threadpool)."""
+    if needs_ping(llm_adapter.last_call_at(), interval):
+        await asyncio.to_thread(get_model_warmer().warm_up, "ping")
+
+
+def start_keep_warm() -> asyncio.Task | None:
+    """Прогрев при старте и пинг в часы трафика в фоне, не задерживая старт приложения (цикл — keep_warm)."""
+    return keep_warm.start_keep_warm(_warm_up, _ping_idle)
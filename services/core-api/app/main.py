@@ -6,6 +6,9 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api import admin, agent_proxy, agent_runs, catalog, chat, documents, estimates, events, internal_tools, leads, parts, suppliers, vehicle
+from app.llm.circuit_breaker import get_circuit_breaker
+from app.llm.llm_adapter import close_client as close_llm_client, task_stats as llm_task_stats
+from app.llm.warmup import get_model_warmer, start_keep_warm, stop_keep_warm
 from app.logging_config import setup_logging
 from app.seed import ensure_seed
 
@@ -46,10 +49,29 @@ app.include_router(events.router)
 
 @app.get("/health")
 def health() -> dict:
-    return {"ok": True}
+    return {
+        "ok": True,
+        "llm_circuit": get_circuit_breaker().snapshot(),
+        "llm_warmup": get_model_warmer().snapshot(),
+        "llm_tasks": llm_task_stats(),
+    }
 
 
 @app.on_event("startup")
 async def _startup_seed() -> None:
     await ensure_seed()
 
+
+@app.on_event("startup")
+async def _startup_llm_warmup() -> None:
+    start_keep_warm()
+
+
+@app.on_event("shutdown")
+async def _shutdown_llm_warmup() -> None:
+    await stop_keep_warm()
+
+
+@app.on_event("shutdown")
+def _shutdown_llm_client() -> None:
+    close_llm_client()
@@ -1,6 +1,6 @@
 """PII-маскирование для запросов и логов."""
 from __future__ import annotations
 
-from app.llm.llm_adapter import mask_pii
+from app.llm.pii_masker import mask_pii, mask_pii_batch
 
-__all__ = ["mask_pii"]
+__all__ = ["mask_pii", "mask_pii_batch"]
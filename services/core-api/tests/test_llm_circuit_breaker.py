@@ -0,0 +1,80 @@
+import pytest
+
+from app.llm.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock, **kwargs):
+    params = dict(min_calls=4, error_rate=0.5, consecutive_failures=3, open_seconds=30, timeout_min=5, timeout_factor=3)
+    params.update(kwargs)
+    return CircuitBreaker(clock=clock, **params)
+
+
+def test_consecutive_failures_open_circuit_and_short_circuit_calls():
+    breaker = make_breaker(FakeClock())
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+
+def test_error_rate_in_window_opens_circuit():
+    breaker = make_breaker(FakeClock(), consecutive_failures=100)
+    for ok in [True, False, True, False]:
+        breaker.record_success(100) if ok else breaker.record_failure()
+
+    assert breaker.state == OPEN
+
+
+def test_half_open_allows_single_probe_and_closes_on_success():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(3):
+        breaker.record_failure()
+
+    clock.now += 31
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    breaker.record_success(200)
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_circuit():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 31
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["opened_total"] == 2
+
+
+def test_adaptive_timeout_follows_p95_within_bounds():
+    breaker = make_breaker(FakeClock())
+    assert breaker.timeout_for(60) == 60
+
+    for _ in range(10):
+        breaker.record_success(4000)
+    assert breaker.timeout_for(60) == pytest.approx(12.0)
+
+    for _ in range(100):
+        breaker.record_success(100)
+    assert breaker.timeout_for(60) == 5
+    assert breaker.timeout_for(3) == 3
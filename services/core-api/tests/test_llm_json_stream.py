@@ -0,0 +1,28 @@
+from app.llm.json_stream import JsonObjectScanner
+
+
+def test_scanner_returns_object_as_soon_as_it_closes():
+    scanner = JsonObjectScanner()
+
+    assert scanner.feed('Ответ: {"intent": "parts') is None
+    assert scanner.feed('_search", "questions": [{"id": "q1"}]') is None
+    obj = scanner.feed('} и ещё немного текста')
+
+    assert obj == '{"intent": "parts_search", "questions": [{"id": "q1"}]}'
+    assert scanner.done
+    assert scanner.feed("{}") is None
+
+
+def test_scanner_ignores_braces_inside_strings():
+    scanner = JsonObjectScanner()
+
+    assert scanner.feed('{"part_type": "фильтр {масляный}", "note": "a \\"}\\" b"') is None
+    assert scanner.feed("}") == '{"part_type": "фильтр {масляный}", "note": "a \\"}\\" b"}'
+
+
+def test_partial_keeps_unfinished_object():
+    scanner = JsonObjectScanner()
+    scanner.feed('{"intent": "parts_search", "part_ty')
+
+    assert scanner.partial == '{"intent": "parts_search", "part_ty'
+    assert not scanner.done
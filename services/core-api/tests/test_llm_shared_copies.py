@@ -0,0 +1,16 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+SHARED_MODULES = ("circuit_breaker.py", "json_stream.py", "keep_warm.py", "metrics.py")
+
+
+@pytest.mark.parametrize("name", SHARED_MODULES)
+def test_llm_shared_copies_are_identical(name):
+    original, copy = REPO_ROOT / "core" / name, REPO_ROOT / "services/core-api/app/llm" / name
+    if not original.exists():
+        pytest.skip("нет полного репозитория (тесты внутри образа сервиса)")
+    digests = {p: hashlib.sha256(p.read_bytes()).hexdigest() for p in (original, copy)}
+    assert len(set(digests.values())) == 1, f"копии {name} разошлись, выполните make sync-llm-shared: {digests}"
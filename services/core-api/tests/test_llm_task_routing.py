@@ -0,0 +1,27 @@
+from app.llm import llm_adapter
+from app.llm.llm_adapter import TASK_EXTRACTION, TASK_GENERAL
+
+
+def test_task_picks_its_model_and_records_latency(monkeypatch):
+    monkeypatch.setitem(llm_adapter.TASK_MODELS, TASK_EXTRACTION, "small:1.5b")
+    monkeypatch.setitem(llm_adapter.TASK_MODELS, TASK_GENERAL, "large:7b")
+    monkeypatch.setattr(llm_adapter, "_task_latencies", {})
+    seen = []
+
+    def fake_call(prompt, system, timeout, model):
+        seen.append(model)
+        return "{}"
+
+    monkeypatch.setattr(llm_adapter, "_call_llm", fake_call)
+
+    llm_adapter.call_llm("Kia Rio колодки", task=TASK_EXTRACTION)
+    llm_adapter.call_llm("Почему стучит подвеска?")
+
+    assert seen == ["small:1.5b", "large:7b"]
+    stats = llm_adapter.task_stats()
+    assert stats[TASK_EXTRACTION]["model"] == "small:1.5b"
+    assert stats[TASK_EXTRACTION]["calls"] == 1 and stats[TASK_GENERAL]["calls"] == 1
+
+
+def test_unknown_task_falls_back_to_default_model():
+    assert llm_adapter.model_for_task("unknown") == llm_adapter.OLLAMA_MODEL
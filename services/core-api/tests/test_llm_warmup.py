@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime
+
+from app.llm import keep_warm
+from app.llm.keep_warm import in_traffic_hours
+from app.llm.warmup import ModelWarmer, needs_ping
+
+
+class StepClock:
+    """Каждый вызов сдвигает время на step секунд — длительность загрузки без sleep."""
+
+    def __init__(self, step: float):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+def test_traffic_hours_plain_and_overnight_ranges():
+    assert in_traffic_hours("8-23", datetime(2026, 1, 1, 8))
+    assert not in_traffic_hours("8-23", datetime(2026, 1, 1, 23))
+    assert in_traffic_hours("20-2", datetime(2026, 1, 1, 1))
+    assert not in_traffic_hours("20-2", datetime(2026, 1, 1, 12))
+    assert in_traffic_hours("", datetime(2026, 1, 1, 3))
+
+
+def test_slow_load_is_counted_as_cold_load():
+    timeouts = []
+    warmer = ModelWarmer(load=timeouts.append, cold_load_ms=1000, timeout=60, clock=StepClock(2.5))
+
+    event = warmer.warm_up("startup")
+
+    assert timeouts == [60]
+    assert event["cold_load"] and event["latency_ms"] == 2500
+    assert warmer.snapshot()["cold_loads"] == 1
+
+
+def test_fast_ping_is_warm_and_failures_are_counted():
+    warmer = ModelWarmer(load=lambda timeout: None, cold_load_ms=1000, clock=StepClock(0.05))
+    assert warmer.warm_up("ping")["cold_load"] is False
+
+    def broken(timeout):
+        raise ConnectionError("ollama down")
+
+    failing = ModelWarmer(load=broken)
+    assert failing.warm_up()["error"] == "ConnectionError"
+    assert failing.snapshot()["failures"] == 1
+
+
+def test_recent_call_skips_ping():
+    assert needs_ping(None, 600, now=100.0)
+    assert not needs_ping(50.0, 600, now=100.0)
+    assert needs_ping(50.0, 600, now=700.0)
+
+
+def test_keep_warm_loop_warms_once_then_pings_only_in_traffic_hours(monkeypatch):
+    calls = []
+    traffic = iter([True, False, True])
+    monkeypatch.setattr(keep_warm, "in_traffic_hours", lambda: next(traffic))
+
+    async def warm_up():
+        calls.append("startup")
+
+    async def ping_idle(interval):
+        calls.append(("ping", interval))
+        if len(calls) == 3:
+            raise asyncio.CancelledError
+
+    async def run():
+        try:
+            await keep_warm.keep_warm_loop(warm_up, ping_idle, interval=0.001)
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    assert calls == ["startup", ("ping", 0.001), ("ping", 0.001)]
@@ -0,0 +1,22 @@
+from app.llm.pii_masker import mask_pii, mask_pii_batch
+
+
+def test_phones_and_emails_are_masked_in_one_pass():
+    text = "звоните 8 (999) 123-45-67 или +7 912 345 67 89, почта ivan.petrov@example.ru"
+    assert mask_pii(text) == "звоните [PHONE] или [PHONE], почта [EMAIL]"
+
+
+def test_text_without_digits_or_at_is_returned_as_is():
+    text = "нужны тормозные колодки"
+    assert mask_pii(text) is text
+    assert mask_pii("") == "" and mask_pii(None) is None
+
+
+def test_numbers_that_are_not_phones_stay():
+    assert mask_pii("колодки на камри 50 2015 года, 60000 км") == "колодки на камри 50 2015 года, 60000 км"
+    assert mask_pii("артикул 189991234567") == "артикул 189991234567"
+
+
+def test_batch_matches_single_calls():
+    texts = ["без пд", "тел 89991234567", None, "a@b.co", ""]
+    assert list(mask_pii_batch(texts)) == [mask_pii(t) for t in texts]
@@ -0,0 +1,192 @@
+"""
+Очередь запросов к бэкенду (Ollama): ограничение параллелизма, честная очередь между вызывающими,
+объединение одинаковых детерминированных запросов и метрики для /metrics.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class QueueFull(RuntimeError):
+    """Очередь переполнена или ожидание слота превысило таймаут — клиенту 503."""
+
+
+# Поля, не влияющие на текст ответа: способ доставки и идентификация клиента
+_KEY_IGNORED_FIELDS = ("stream", "user")
+
+
+def coalesce_key(payload: dict[str, Any], backend_model: str | None = None) -> str | None:
+    """
+    Content-addressed ключ запроса: хэш всех полей (model, messages, temperature, прочие опции)
+    и модели бэкенда, в которую разрешился алиас. Только для детерминированных запросов
+    (temperature 0) — иначе None. Общий для объединения в очереди и кэша ответов.
+    """
+    temperature = float(payload.get("temperature", 0.0) or 0.0)
+    if temperature != 0.0:
+        return None
+    fields = {k: v for k, v in payload.items() if k not in _KEY_IGNORED_FIELDS}
+    fields["temperature"] = temperature
+    fields["backend_model"] = backend_model
+    raw = json.dumps(fields, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+class InferenceQueue:
+    """
+    Не больше max_concurrency запросов к бэкенду одновременно. Ожидающие стоят в очередях по вызывающим
+    (NLU агента, форматирование, …): освободившийся слот отдаётся по кругу, поэтому поток запросов
+    одного клиента не задерживает другого. Одинаковый детерминированный запрос, пока он выполняется,
+    не ставится в очередь повторно — ожидающие получают тот же ответ.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 2,
+        max_queue: int = 32,
+        queue_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._clock = clock
+        self.active = 0
+        self._waiting: OrderedDict[str, deque[asyncio.Future]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.counters: dict[str, int] = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "coalesced": 0,
+            "rejected": 0,
+            "timeout": 0,
+        }
+        self._wait_ms: deque[float] = deque(maxlen=500)
+        self._latency_ms: deque[float] = deque(maxlen=500)
+
+    @property
+    def depth(self) -> int:
+        return sum(len(q) for q in self._waiting.values())
+
+    async def _acquire(self, caller: str) -> None:
+        if self.active < self.max_concurrency and not self.depth:
+            self.active += 1
+            return
+        if self.depth >= self.max_queue:
+            self.counters["rejected"] += 1
+            raise QueueFull(f"queue is full ({self.depth} waiting)")
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(caller, deque()).append(fut)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                self._release()  # слот уже передан нам — вернуть следующему
+            else:
+                fut.cancel()
+                self._discard(caller, fut)
+            if isinstance(e, asyncio.TimeoutError):
+                self.counters["timeout"] += 1
+                raise QueueFull(f"no backend slot within {self.queue_timeout:g}s") from e
+            raise
+
+    def _discard(self, caller: str, fut: asyncio.Future) -> None:
+        q = self._waiting.get(caller)
+        if q is not None:
+            try:
+                q.remove(fut)
+            except ValueError:
+                pass
+            if not q:
+                del self._waiting[caller]
+
+    def _release(self) -> None:
+        """Передать слот первому ожидающему следующего по кругу вызывающего (active не меняется)."""
+        while self._waiting:
+            caller, q = next(iter(self._waiting.items()))
+            del self._waiting[caller]
+            fut = q.popleft() if q else None
+            if q:
+                self._waiting[caller] = q  # вызывающий уходит в конец круга
+            if fut is not None and not fut.done():
+                fut.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, caller: str) -> AsyncIterator[None]:
+        """Слот бэкенда на время блока (потоковый ответ держит слот, пока клиент читает поток)."""
+        queued = self._clock()
+        await self._acquire(caller or "default")
+        started = self._clock()
+        self._wait_ms.append((started - queued) * 1000)
+        try:
+            yield
+        except BaseException:
+            self.counters["failed"] += 1
+            raise
+        finally:
+            self._release()
+        self._latency_ms.append((self._clock() - started) * 1000)
+        self.counters["completed"] += 1
+
+    async def submit(self, caller: str, key: str | None, fn: Callable[[], Awaitable[T]]) -> T:
+        """Выполнить fn в слоте бэкенда. key — ключ объединения (None — запрос выполняется отдельно)."""
+        self.counters["submitted"] += 1
+        if key is not None and key in self._inflight:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(self._inflight[key])
+
+        shared: asyncio.Future | None = None
+        if key is not None:
+            shared = asyncio.get_running_loop().create_future()
+            self._inflight[key] = shared
+        try:
+            async with self.slot(caller):
+                result = await fn()
+        except BaseException as e:
+            if shared is not None:
+                if isinstance(e, Exception):
+                    shared.set_exception(e)
+                    shared.exception()  # ожидающих может не быть — не логировать «never retrieved»
+                else:
+                    shared.cancel()
+            raise
+        else:
+            if shared is not None:
+                shared.set_result(result)
+            return result
+        finally:
+            if key is not None and self._inflight.get(key) is shared:
+                del self._inflight[key]
+
+    def snapshot(self) -> dict[str, Any]:
+        wait, latency = list(self._wait_ms), list(self._latency_ms)
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.depth,
+            "queue_by_caller": {caller: len(q) for caller, q in self._waiting.items()},
+            "inflight_keys": len(self._inflight),
+            **self.counters,
+            "wait_ms": {"p50": round(_percentile(wait, 0.5), 1), "p95": round(_percentile(wait, 0.95), 1)},
+            "latency_ms": {"p50": round(_percentile(latency, 0.5), 1), "p95": round(_percentile(latency, 0.95), 1)},
+        }
@@ -2,11 +2,17 @@ from __future__ import annotations
 
 import json
 import re
-from typing import Any
+from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator
 
 import httpx
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 
+from app.inference_queue import InferenceQueue, QueueFull, coalesce_key
+from app.lexicon import KIND_BRAND, KIND_MODEL, WORD, Lexicon, add_vehicle_terms, load_vehicle_catalog
+from app.response_cache import ResponseCache
+from app.streaming import ollama_pieces, stub_pieces, to_sse
 from app.settings import settings
 from app.logging_config import setup_logging
 
@@ -14,16 +20,66 @@ from app.logging_config import setup_logging
 setup_logging()
 app = FastAPI(title="autoshop model-server (stub)", version="0.1.0")
 
+queue = InferenceQueue(
+    max_concurrency=settings.backend_max_concurrency,
+    max_queue=settings.queue_max_size,
+    queue_timeout=settings.queue_timeout,
+)
+cache = ResponseCache(
+    max_items=settings.cache_max_items,
+    ttl=settings.cache_ttl_seconds,
+    db_path=settings.cache_db_path,
+    max_disk_items=settings.cache_max_disk_items,
+)
+_client: httpx.AsyncClient | None = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Один клиент с keep-alive на процесс: соединения к Ollama переиспользуются."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=settings.ollama_timeout,
+            limits=httpx.Limits(max_connections=max(settings.backend_max_concurrency * 2, 4)),
+        )
+    return _client
+
+
+@app.on_event("shutdown")
+async def _close_client() -> None:
+    if _client is not None:
+        await _client.aclose()
+    cache.close()
+
+
+# Триггеры интентов заглушки по приоритету; «то» — только целым словом
+_STUB_TRIGGERS = (
+    ("maintenance", ["техобслуж", "замена масла", "масло"]),
+    ("symptom", ["стук", "скрип", "вибра", "шум", "поворот"]),
+    ("part", ["колодк", "запчаст", "нужн", "тормоз", "фильтр"]),
+)
+_lexicon: Lexicon | None = None
+
+
+def _get_lexicon() -> Lexicon:
+    global _lexicon
+    if _lexicon is None:
+        lexicon = Lexicon()
+        lexicon.add("то", "intent", "maintenance", WORD)
+        for intent, triggers in _STUB_TRIGGERS:
+            for text in triggers:
+                lexicon.add(text, "intent", intent)
+        add_vehicle_terms(lexicon, load_vehicle_catalog(settings.vehicle_catalog_path))
+        lexicon.build()
+        _lexicon = lexicon
+    return _lexicon
+
 
 def _stub_nlu(text: str) -> dict[str, Any]:
     t = (text or "").lower()
-    intent = "unknown"
-    if any(x in t for x in ["то", "техобслуж", "замена масла", "масло"]):
-        intent = "maintenance"
-    elif any(x in t for x in ["стук", "скрип", "вибра", "шум", "поворот"]):
-        intent = "symptom"
-    elif any(x in t for x in ["колодк", "запчаст", "нужн", "тормоз", "фильтр"]):
-        intent = "part"
+    hits = _get_lexicon().scan(t)
+    intent_hit = hits.best("intent")
+    intent = intent_hit.value if intent_hit else "unknown"
 
     slots: dict[str, Any] = {}
     year = re.search(r"\b(19[8-9]\d|20[0-2]\d)\b", t)
@@ -32,61 +88,183 @@ def _stub_nlu(text: str) -> dict[str, Any]:
     mil = re.search(r"\b(\d{1,3})(\s?)(к|k)\b", t)
     if mil:
         slots["mileage"] = int(mil.group(1)) * 1000
-    if "kia" in t:
-        slots["brand"] = "Kia"
-    if "rio" in t:
-        slots["model"] = "Rio"
-    if "camry" in t:
-        slots["brand"] = "Toyota"
-        slots["model"] = "Camry 50" if "50" in t else "Camry"
+    brand, model = hits.first(KIND_BRAND), hits.first(KIND_MODEL)
+    if brand:
+        slots["brand"] = brand.value
+    if model:
+        slots["brand"], slots["model"] = model.value
+        if model.value[1] == "Camry" and "50" in t:
+            slots["model"] = "Camry 50"
     if intent == "part":
         slots["part_query"] = text
 
     return {"intent": intent, "slots": slots}
 
 
+def _resolve_model(requested: str | None) -> str | None:
+    """Алиас из запроса → модель Ollama: "small" — малая (если задана), иначе основная."""
+    if requested == "small" and settings.ollama_model_small:
+        return settings.ollama_model_small
+    return settings.ollama_model
+
+
 @app.get("/health")
 def health() -> dict:
     return {"ok": True, "mode": "stub" if not settings.ollama_url else "ollama_proxy"}
 
 
+@app.get("/metrics")
+def metrics() -> dict:
+    """Очередь к бэкенду (в работе, глубина по вызывающим, объединённые, ожидание, латентность) и кэш ответов."""
+    return {"queue": queue.snapshot(), "cache": cache.snapshot()}
+
+
+def _caller(request: Request, payload: dict) -> str:
+    """Кто вызывает (для честной очереди): заголовок X-Caller, иначе поле user из OpenAI API."""
+    return (request.headers.get("X-Caller") or str(payload.get("user") or "") or "default")[:64]
+
+
+def _ollama_body(payload: dict, stream: bool) -> dict:
+    return {
+        "model": _resolve_model(payload.get("model")),
+        "messages": payload.get("messages", []),
+        "stream": stream,
+        "options": {"temperature": payload.get("temperature", 0.0)},
+    }
+
+
+def _stub_content(payload: dict) -> str:
+    # stub: last user message
+    msgs = payload.get("messages") or []
+    user_text = ""
+    for m in reversed(msgs):
+        if m.get("role") == "user":
+            user_text = m.get("content") or ""
+            break
+    return json.dumps(_stub_nlu(user_text), ensure_ascii=False)
+
+
+async def _ollama_chat(payload: dict) -> str:
+    r = await _get_client().post(f"{settings.ollama_url.rstrip('/')}/api/chat", json=_ollama_body(payload, False))
+    if r.status_code >= 400:
+        raise HTTPException(status_code=502, detail=f"Ollama error: {r.status_code} {r.text}")
+    data = r.json()
+    return (data.get("message") or {}).get("content") or "{}"
+
+
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _cache_key(payload: dict) -> str | None:
+    """
+    Ключ объединения одинаковых запросов и кэша; None — запрос недетерминированный.
+    Не зависит от настроек кэша: с выключенным кэшем объединение в очереди продолжает работать.
+    """
+    return coalesce_key(payload, _resolve_model(payload.get("model")))
+
+
+async def _caching(pieces: AsyncIterator[str], key: str) -> AsyncIterator[str]:
+    """Сохранить ответ в кэш, только если поток дошёл до конца (обрыв и ошибки не кэшируются)."""
+    parts: list[str] = []
+    async for piece in pieces:
+        parts.append(piece)
+        yield piece
+    await cache.aput(key, "".join(parts))
+
+
+async def _stream_completion(payload: dict, request: Request) -> StreamingResponse:
+    """
+    stream: true — SSE-чанки chat.completion.chunk. Слот очереди держится, пока клиент читает поток;
+    NDJSON Ollama читается по мере отправки клиенту (медленный клиент притормаживает чтение — backpressure).
+    Ошибки до первого байта (очередь, статус Ollama) — обычным HTTP-статусом.
+    """
+    model = str(payload.get("model") or "mvp")
+    if not (settings.ollama_url and settings.ollama_model):
+        return StreamingResponse(
+            to_sse(stub_pieces(_stub_content(payload)), model),
+            media_type="text/event-stream",
+            headers={**_SSE_HEADERS, "X-Cache": "BYPASS"},
+        )
+    key = _cache_key(payload) if cache.enabled else None
+    if key is not None:
+        cached, _ = await cache.aget(key)
+        if cached is not None:
+            return StreamingResponse(
+                to_sse(stub_pieces(cached), model), media_type="text/event-stream", headers={**_SSE_HEADERS, "X-Cache": "HIT"}
+            )
+
+    stack = AsyncExitStack()
+    try:
+        await stack.enter_async_context(queue.slot(_caller(request, payload)))
+        r = await stack.enter_async_context(
+            _get_client().stream("POST", f"{settings.ollama_url.rstrip('/')}/api/chat", json=_ollama_body(payload, True))
+        )
+        if r.status_code >= 400:
+            detail = (await r.aread()).decode("utf-8", "replace")
+            raise HTTPException(status_code=502, detail=f"Ollama error: {r.status_code} {detail}")
+    except QueueFull as e:
+        await stack.__aexit__(type(e), e, e.__traceback__)
+        raise HTTPException(status_code=503, detail=f"model-server busy: {e}", headers={"Retry-After": "1"}) from e
+    except HTTPException as e:
+        await stack.__aexit__(type(e), e, e.__traceback__)
+        raise
+    except Exception as e:
+        await stack.__aexit__(type(e), e, e.__traceback__)
+        raise HTTPException(status_code=502, detail=f"Ollama unavailable: {e}") from e
+
+    pieces = ollama_pieces(r.aiter_lines())
+    if key is not None:
+        pieces = _caching(pieces, key)
+
+    async def body():
+        try:
+            async for event in to_sse(pieces, model):
+                yield event
+        finally:
+            await stack.aclose()
+
+    return StreamingResponse(
+        body(), media_type="text/event-stream", headers={**_SSE_HEADERS, "X-Cache": "MISS" if key else "BYPASS"}
+    )
+
+
 @app.post("/v1/chat/completions")
-async def chat_completions(payload: dict) -> dict:
+async def chat_completions(payload: dict, request: Request, response: Response):
     """
     Minimal OpenAI-compatible endpoint for agent's NLU/formatting.
     MVP: returns JSON in choices[0].message.content.
+    Запросы к Ollama идут через очередь (InferenceQueue); одинаковые при temperature 0 — объединяются
+    и кэшируются (ResponseCache). X-Cache: HIT / MISS / BYPASS (недетерминированный запрос, заглушка).
+    stream: true — ответ потоком (SSE), в том числе в режиме заглушки.
     """
+    if payload.get("stream"):
+        return await _stream_completion(payload, request)
+    response.headers["X-Cache"] = "BYPASS"
     # optional: proxy to Ollama if configured
     if settings.ollama_url and settings.ollama_model:
+        key = _cache_key(payload)
+        cached = (await cache.aget(key))[0] if key is not None and cache.enabled else None
+        if cached is not None:
+            response.headers["X-Cache"] = "HIT"
+            return _completion(cached)
         try:
-            async with httpx.AsyncClient(timeout=60) as client:
-                r = await client.post(
-                    f"{settings.ollama_url.rstrip('/')}/api/chat",
-                    json={
-                        "model": settings.ollama_model,
-                        "messages": payload.get("messages", []),
-                        "stream": False,
-                        "options": {"temperature": payload.get("temperature", 0.0)},
-                    },
-                )
-            if r.status_code >= 400:
-                raise HTTPException(status_code=502, detail=f"Ollama error: {r.status_code} {r.text}")
-            data = r.json()
-            content = (data.get("message") or {}).get("content") or "{}"
+            content = await queue.submit(_caller(request, payload), key, lambda: _ollama_chat(payload))
+        except QueueFull as e:
+            raise HTTPException(status_code=503, detail=f"model-server busy: {e}", headers={"Retry-After": "1"}) from e
         except HTTPException:
             raise
         except Exception as e:
             raise HTTPException(status_code=502, detail=f"Ollama unavailable: {e}") from e
+        if key is not None and cache.enabled:
+            await cache.aput(key, content)
+            response.headers["X-Cache"] = "MISS"
     else:
-        # stub: last user message
-        msgs = payload.get("messages") or []
-        user_text = ""
-        for m in reversed(msgs):
-            if m.get("role") == "user":
-                user_text = m.get("content") or ""
-                break
-        content = json.dumps(_stub_nlu(user_text), ensure_ascii=False)
+        content = _stub_content(payload)
+
+    return _completion(content)
+
 
+def _completion(content: str) -> dict:
     return {
         "id": "chatcmpl-mvp",
         "object": "chat.completion",
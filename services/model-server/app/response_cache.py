@@ -0,0 +1,195 @@
+"""
+Кэш детерминированных ответов (temperature 0): LRU в памяти и необязательный уровень SQLite на диске.
+Ключ — content-addressed хэш запроса (inference_queue.coalesce_key), значение — текст ответа.
+Из обработчиков — aget/aput: память проверяется сразу, SQLite — в отдельном потоке (asyncio.to_thread).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Память: не больше max_items записей, вытесняется давно не использованная.
+    Диск (db_path): переживает рестарт, не больше max_disk_items записей; попадание поднимается в память.
+    Чтение с диска ничего не пишет: время попадания (last_hit, по нему чистится диск) копится в памяти
+    и сохраняется вместе со следующей записью.
+    Запись старше ttl секунд считается отсутствующей на обоих уровнях.
+    """
+
+    def __init__(
+        self,
+        max_items: int = 1000,
+        ttl: float = 3600.0,
+        db_path: str | None = None,
+        max_disk_items: int = 50000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_disk_items = max_disk_items
+        self._clock = clock
+        self._lock = threading.Lock()  # память и счётчики
+        self._disk_lock = threading.Lock()  # соединение SQLite и _touched
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._conn: sqlite3.Connection | None = None
+        self._touched: dict[str, float] = {}
+        self._puts = 0
+        self.counters = {"hits_memory": 0, "hits_disk": 0, "misses": 0, "stores": 0, "evicted": 0}
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_hit REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_last_hit ON response_cache(last_hit)")
+            self._conn.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_items > 0 or self._conn is not None
+
+    def get(self, key: str) -> tuple[str | None, str]:
+        """(значение, уровень): уровень "memory" / "disk" при попадании, "miss" — иначе."""
+        now = self._clock()
+        value = self._get_memory(key, now)
+        if value is not None:
+            return value, "memory"
+        return self._get_disk(key, now)
+
+    async def aget(self, key: str) -> tuple[str | None, str]:
+        """Как get, но SQLite читается в отдельном потоке — event loop не блокируется."""
+        now = self._clock()
+        value = self._get_memory(key, now)
+        if value is not None:
+            return value, "memory"
+        if self._conn is None:
+            return self._get_disk(key, now)
+        return await asyncio.to_thread(self._get_disk, key, now)
+
+    def put(self, key: str, value: str) -> None:
+        now = self._clock()
+        self._put_memory(key, value, now)
+        self._put_disk(key, value, now)
+
+    async def aput(self, key: str, value: str) -> None:
+        """Как put: в память сразу, на диск — в отдельном потоке."""
+        now = self._clock()
+        self._put_memory(key, value, now)
+        if self._conn is not None:
+            await asyncio.to_thread(self._put_disk, key, value, now)
+
+    def _get_memory(self, key: str, now: float) -> str | None:
+        with self._lock:
+            item = self._memory.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.counters["hits_memory"] += 1
+                return value
+            del self._memory[key]
+            return None
+
+    def _get_disk(self, key: str, now: float) -> tuple[str | None, str]:
+        row = None
+        with self._disk_lock:
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM response_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    self._touched[key] = now
+        with self._lock:
+            if row is None:
+                self.counters["misses"] += 1
+                return None, "miss"
+            self._remember(key, row[1], row[0])
+            self.counters["hits_disk"] += 1
+            return row[0], "disk"
+
+    def _put_memory(self, key: str, value: str, now: float) -> None:
+        with self._lock:
+            self._remember(key, now + self.ttl, value)
+            self.counters["stores"] += 1
+
+    def _put_disk(self, key: str, value: str, now: float) -> None:
+        with self._disk_lock:
+            if self._conn is None:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_hit) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            self._flush_touched()
+            self._puts += 1
+            if self._puts % 100 == 0:
+                self._prune_disk(now)
+            self._conn.commit()
+
+    def _flush_touched(self) -> None:
+        """Записать накопленные времена попаданий с диска (без commit, под _disk_lock)."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE response_cache SET last_hit = MAX(last_hit, ?) WHERE key = ?",
+                [(ts, k) for k, ts in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _remember(self, key: str, expires_at: float, value: str) -> None:
+        if self.max_items <= 0:
+            return
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+            self.counters["evicted"] += 1
+
+    def _prune_disk(self, now: float) -> None:
+        """Удалить просроченные и самые давно не использованные сверх max_disk_items."""
+        self._conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+        self._conn.execute(
+            """DELETE FROM response_cache WHERE key IN (
+                   SELECT key FROM response_cache ORDER BY last_hit DESC LIMIT -1 OFFSET ?
+               )""",
+            (self.max_disk_items,),
+        )
+
+    def snapshot(self) -> dict[str, Any]:
+        disk_items = None
+        with self._disk_lock:
+            if self._conn is not None:
+                disk_items = self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        with self._lock:
+            hits = self.counters["hits_memory"] + self.counters["hits_disk"]
+            total = hits + self.counters["misses"]
+            return {
+                "memory_items": len(self._memory),
+                "disk_items": disk_items,
+                **self.counters,
+                "hit_rate": round(hits / total, 3) if total else 0.0,
+            }
+
+    def close(self) -> None:
+        """Сохранить накопленные last_hit и закрыть соединение."""
+        with self._disk_lock:
+            if self._conn is not None:
+                self._flush_touched()
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
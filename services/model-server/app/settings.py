@@ -8,6 +8,20 @@ class Settings(BaseSettings):
 
     ollama_url: str | None = None
     ollama_model: str | None = None
+    # Малая модель для запросов с model="small" (NLU агента); пусто — ollama_model
+    ollama_model_small: str | None = None
+    ollama_timeout: float = 60.0
+    # Очередь к бэкенду: одновременных запросов, ожидающих всего, ожидание слота (сек)
+    backend_max_concurrency: int = 2
+    queue_max_size: int = 32
+    queue_timeout: float = 30.0
+    # Кэш ответов при temperature 0: записей в памяти, TTL (сек), файл SQLite (пусто — только память)
+    cache_max_items: int = 1000
+    cache_ttl_seconds: float = 3600.0
+    cache_db_path: str | None = None
+    cache_max_disk_items: int = 50000
+    # Марки/модели для словаря NLU-заглушки; нет файла — только встроенные марки
+    vehicle_catalog_path: str = "/demo-data/vehicle_catalog.csv"
 
 
 settings = Settings()
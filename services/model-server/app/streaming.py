@@ -0,0 +1,81 @@
+"""Потоковые ответы в формате OpenAI (chat.completion.chunk) поверх server-sent events."""
+from __future__ import annotations
+
+import json
+import logging
+import re
+import time
+import uuid
+from typing import Any, AsyncIterator
+
+logger = logging.getLogger(__name__)
+
+
+def sse_event(data: dict[str, Any] | str) -> bytes:
+    body = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+    return f"data: {body}\n\n".encode("utf-8")
+
+
+SSE_DONE = sse_event("[DONE]")
+
+
+class ChunkBuilder:
+    """Чанки одного ответа: общий id/created/model, первый чанк несёт role."""
+
+    def __init__(self, model: str) -> None:
+        self.id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        self.created = int(time.time())
+        self.model = model
+
+    def chunk(self, delta: dict[str, Any], finish_reason: str | None = None) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "object": "chat.completion.chunk",
+            "created": self.created,
+            "model": self.model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+
+async def to_sse(pieces: AsyncIterator[str], model: str) -> AsyncIterator[bytes]:
+    """
+    Фрагменты текста → SSE-чанки OpenAI: role, content…, finish_reason "stop", [DONE].
+    Ошибка посреди потока (статус уже отправлен) — отдельным событием error, затем [DONE].
+    """
+    builder = ChunkBuilder(model)
+    yield sse_event(builder.chunk({"role": "assistant", "content": ""}))
+    try:
+        async for piece in pieces:
+            if piece:
+                yield sse_event(builder.chunk({"content": piece}))
+    except Exception as e:
+        logger.warning("stream aborted: %s", e)
+        yield sse_event({"error": {"message": str(e), "type": "upstream_error"}})
+        yield SSE_DONE
+        return
+    yield sse_event(builder.chunk({}, finish_reason="stop"))
+    yield SSE_DONE
+
+
+async def ollama_pieces(lines: AsyncIterator[str]) -> AsyncIterator[str]:
+    """NDJSON-поток Ollama /api/chat → фрагменты message.content до done."""
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            chunk = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if chunk.get("error"):
+            raise RuntimeError(f"Ollama error: {chunk['error']}")
+        piece = (chunk.get("message") or {}).get("content") or ""
+        if piece:
+            yield piece
+        if chunk.get("done"):
+            return
+
+
+async def stub_pieces(content: str) -> AsyncIterator[str]:
+    """Заглушка: готовый ответ по словам (с пробелами), как если бы он генерировался."""
+    for piece in re.findall(r"\S+\s*|\s+", content):
+        yield piece
@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from app.inference_queue import InferenceQueue, QueueFull, coalesce_key
+
+
+def test_concurrency_is_bounded():
+    async def scenario():
+        queue = InferenceQueue(max_concurrency=2, max_queue=10)
+        running = peak = 0
+
+        async def work():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return "ok"
+
+        results = await asyncio.gather(*(queue.submit("a", None, work) for _ in range(6)))
+        return results, peak, queue.snapshot()
+
+    results, peak, snap = asyncio.run(scenario())
+    assert results == ["ok"] * 6
+    assert peak == 2
+    assert snap["completed"] == 6 and snap["active"] == 0 and snap["queue_depth"] == 0
+
+
+def test_free_slot_alternates_between_callers():
+    async def scenario():
+        queue = InferenceQueue(max_concurrency=1, max_queue=10)
+        order = []
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        def job(name):
+            async def run():
+                order.append(name)
+            return run
+
+        first = asyncio.create_task(queue.submit("nlu", None, blocker))
+        await asyncio.sleep(0)
+        # NLU агента поставил пачку запросов раньше, чем пришёл один запрос форматирования
+        tasks = [asyncio.create_task(queue.submit("nlu", None, job(f"nlu{i}"))) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(queue.submit("format", None, job("format"))))
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(first, *tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["nlu0", "format", "nlu1", "nlu2"]
+
+
+def test_identical_deterministic_requests_are_coalesced():
+    async def scenario():
+        queue = InferenceQueue(max_concurrency=4)
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return '{"intent": "part"}'
+
+        payload = {"model": "small", "messages": [{"role": "user", "content": "колодки"}], "temperature": 0}
+        key = coalesce_key(payload)
+        results = await asyncio.gather(*(queue.submit("a", key, work) for _ in range(5)))
+        return results, calls, queue.snapshot()
+
+    results, calls, snap = asyncio.run(scenario())
+    assert calls == 1
+    assert set(results) == {'{"intent": "part"}'}
+    assert snap["coalesced"] == 4 and snap["inflight_keys"] == 0
+
+
+def test_sampling_requests_are_not_coalesced():
+    assert coalesce_key({"messages": [], "temperature": 0.7}) is None
+    assert coalesce_key({"messages": []}) == coalesce_key({"messages": [], "temperature": 0.0})
+
+
+def test_full_queue_rejects_and_waiting_times_out():
+    async def scenario():
+        queue = InferenceQueue(max_concurrency=1, max_queue=1, queue_timeout=0.05)
+        gate = asyncio.Event()
+        busy = asyncio.create_task(queue.submit("a", None, gate.wait))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(queue.submit("a", None, gate.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFull):
+            await queue.submit("b", None, gate.wait)
+        with pytest.raises(QueueFull):
+            await waiting
+        gate.set()
+        await busy
+        return queue.snapshot()
+
+    snap = asyncio.run(scenario())
+    assert snap["rejected"] == 1 and snap["timeout"] == 1
+    assert snap["active"] == 0 and snap["queue_depth"] == 0
@@ -0,0 +1,114 @@
+import asyncio
+
+import httpx
+
+from app.inference_queue import coalesce_key
+from app.response_cache import ResponseCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResponseCache(max_items=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == ("A", "memory")  # "a" свежее, чем "b"
+    cache.put("c", "C")
+    assert cache.get("b") == (None, "miss")
+    assert cache.get("a")[0] == "A" and cache.get("c")[0] == "C"
+    assert cache.snapshot()["evicted"] == 1
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = ResponseCache(ttl=60, clock=clock)
+    cache.put("k", "v")
+    clock.now += 59
+    assert cache.get("k")[0] == "v"
+    clock.now += 2
+    assert cache.get("k") == (None, "miss")
+
+
+def test_disk_tier_survives_restart_and_promotes_to_memory(tmp_path):
+    db = str(tmp_path / "cache.db")
+    first = ResponseCache(db_path=db)
+    first.put("k", "ответ")
+    first.close()
+
+    second = ResponseCache(db_path=db)
+    assert second.get("k") == ("ответ", "disk")
+    assert second.get("k") == ("ответ", "memory")
+    snap = second.snapshot()
+    assert snap["hits_disk"] == 1 and snap["hits_memory"] == 1 and snap["disk_items"] == 1
+    second.close()
+
+
+def test_disk_tier_is_pruned_to_size_limit(tmp_path):
+    clock = FakeClock()
+    cache = ResponseCache(max_items=0, db_path=str(tmp_path / "cache.db"), max_disk_items=10, clock=clock)
+    for i in range(100):
+        clock.now += 1
+        cache.put(f"k{i}", str(i))
+    assert cache.snapshot()["disk_items"] == 10
+    assert cache.get("k99")[0] == "99" and cache.get("k0")[0] is None
+    cache.close()
+
+
+def test_key_covers_model_and_options_and_skips_sampling():
+    base = {"model": "small", "messages": [{"role": "user", "content": "колодки"}], "temperature": 0}
+    key = coalesce_key(base, "qwen2.5:1.5b")
+    assert key == coalesce_key({**base, "stream": True, "user": "agent"}, "qwen2.5:1.5b")
+    assert key != coalesce_key(base, "qwen2.5:7b")
+    assert key != coalesce_key({**base, "max_tokens": 64}, "qwen2.5:1.5b")
+    assert coalesce_key({**base, "temperature": 0.7}, "qwen2.5:1.5b") is None
+
+
+def test_async_api_and_reads_do_not_write_to_disk(tmp_path):
+    db = str(tmp_path / "cache.db")
+    clock = FakeClock()
+    first = ResponseCache(db_path=db, clock=clock)
+    asyncio.run(first.aput("k", "ответ"))
+    first.close()
+
+    second = ResponseCache(max_items=0, db_path=db, clock=clock)
+    clock.now += 10
+    assert asyncio.run(second.aget("k")) == ("ответ", "disk")
+    assert not second._conn.in_transaction  # чтение ничего не записало и не коммитило
+    assert second._conn.execute("SELECT last_hit FROM response_cache").fetchone()[0] == 1000.0
+    second.put("other", "x")  # время попадания сохраняется вместе со следующей записью
+    assert second._conn.execute("SELECT last_hit FROM response_cache WHERE key = 'k'").fetchone()[0] == 1010.0
+    second.close()
+
+
+def test_identical_requests_coalesce_with_cache_disabled(monkeypatch):
+    from app import main
+
+    calls = 0
+
+    async def fake_chat(payload):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "{}"
+
+    monkeypatch.setattr(main, "cache", ResponseCache(max_items=0))
+    monkeypatch.setattr(main, "_ollama_chat", fake_chat)
+    monkeypatch.setattr(main.settings, "ollama_url", "http://ollama:11434")
+    monkeypatch.setattr(main.settings, "ollama_model", "qwen2.5:7b")
+    payload = {"messages": [{"role": "user", "content": "колодки"}], "temperature": 0}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.post("/v1/chat/completions", json=payload) for _ in range(3)))
+
+    responses = asyncio.run(scenario())
+    assert [r.status_code for r in responses] == [200] * 3
+    assert calls == 1
+    assert {r.headers["X-Cache"] for r in responses} == {"BYPASS"}
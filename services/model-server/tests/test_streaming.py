@@ -0,0 +1,29 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def _events(text: str) -> list[str]:
+    return [line[len("data: "):] for line in text.split("\n\n") if line.startswith("data: ")]
+
+
+def test_stub_streams_openai_chunks_that_add_up_to_the_full_answer():
+    client = TestClient(app)
+    messages = [{"role": "user", "content": "Нужны колодки на Kia Rio 2017"}]
+    full = client.post("/v1/chat/completions", json={"messages": messages}).json()
+    r = client.post("/v1/chat/completions", json={"messages": messages, "stream": True})
+
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = _events(r.text)
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(e) for e in events[:-1]]
+    assert all(c["object"] == "chat.completion.chunk" for c in chunks)
+    assert len({c["id"] for c in chunks}) == 1
+    assert chunks[0]["choices"][0]["delta"]["role"] == "assistant"
+    assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+    content = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks)
+    assert content == full["choices"][0]["message"]["content"]
+    assert len(chunks) > 3  # ответ пришёл частями, а не одним чанком
@@ -102,6 +102,9 @@ async def update_dialogue_cycle(
     tier_selected: str | None = None,
     llm_model: str | None = None,
     prompt_version: str | None = None,
+    llm_input_safe: str | None = None,
+    llm_output_raw: str | None = None,
+    total_latency_ms: int | None = None,
 ) -> None:
     """Обновить поля цикла диалога."""
     updates = []
@@ -139,6 +142,15 @@ async def update_dialogue_cycle(
     if prompt_version is not None:
         updates.append("prompt_version = ?")
         values.append(prompt_version)
+    if llm_input_safe is not None:
+        updates.append("llm_input_safe = ?")
+        values.append(llm_input_safe)
+    if llm_output_raw is not None:
+        updates.append("llm_output_raw = ?")
+        values.append(llm_output_raw)
+    if total_latency_ms is not None:
+        updates.append("total_latency_ms = ?")
+        values.append(total_latency_ms)
 
     if not updates:
         return
@@ -295,7 +307,7 @@ async def mark_for_review(cycle_id: str) -> None:
 
 
 async def export_dataset(output_path: str, days: int = 90) -> None:
-    """Экспорт feedback для анализа/дообучения."""
+    """Экспорт feedback для анализа/дообучения (тексты пользователя и бота — с маскированием PII)."""
     os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
     conn = _get_conn()
     try:
@@ -309,6 +321,7 @@ async def export_dataset(output_path: str, days: int = 90) -> None:
             (f"-{days} days",),
         ).fetchall()
         import csv
+        from core.pii_masker import mask_pii_batch
         with open(output_path, "w", newline="", encoding="utf-8") as f:
             w = csv.writer(f)
             w.writerow([
@@ -321,9 +334,12 @@ async def export_dataset(output_path: str, days: int = 90) -> None:
                 resp = json.loads(r[4]) if r[4] else []
                 user_query = msgs[-1] if msgs else ""
                 bot_response = resp[-1] if resp else ""
+                slots, user_query, bot_response, dislike_reason, user_comment = mask_pii_batch(
+                    (r[2], user_query, bot_response, r[6] or "", r[7] or "")
+                )
                 w.writerow([
-                    r[0], r[1], r[2], user_query, bot_response, r[5] or "", r[6] or "",
-                    r[7] or "", r[8] or "", r[9] or "", r[10] or 0, r[11] or 0, r[12] or "", r[13] or "",
+                    r[0], r[1], slots, user_query, bot_response, r[5] or "", dislike_reason,
+                    user_comment, r[8] or "", r[9] or "", r[10] or 0, r[11] or 0, r[12] or "", r[13] or "",
                 ])
     finally:
         conn.close()